@@ -11,12 +11,30 @@ django.setup()
 
 from django.core.asgi import get_asgi_application
 from tasks.notifications import sio
+from tasks.dispatch import dispatcher
+from tasks.deadlines import DeadlineScheduler
 
 django_app = get_asgi_application()
+deadline_scheduler = DeadlineScheduler(dispatcher)
 
-# Create ASGI application with Socket.IO mounted at /socket.io
+
+async def on_startup():
+    await dispatcher.start()
+    await deadline_scheduler.start()
+
+
+async def on_shutdown():
+    await deadline_scheduler.stop()
+    await dispatcher.stop()
+
+
+# Create ASGI application with Socket.IO mounted at /socket.io.
+# The notification dispatcher (and the deadline scanner, when enabled) run on
+# the server's event loop for its lifetime.
 application = socketio.ASGIApp(
     socketio_server=sio,
     other_asgi_app=django_app,
-    socketio_path='socket.io'
+    socketio_path='socket.io',
+    on_startup=on_startup,
+    on_shutdown=on_shutdown
 )
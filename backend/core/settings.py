@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -33,6 +34,38 @@ SOCKETIO_PORT = 8001
 SOCKETIO_CORS_ALLOWED_ORIGINS = ['http://localhost:5173']  # Vite's default port
 SOCKETIO_MOUNT_LOCATION = '/socket.io/'
 SOCKETIO_ASYNC_MODE = 'asgi'
+# Pub/sub backend shared by all workers ('' = single process, or a
+# redis://, amqp:// or sqlite:/// URL; see tasks/socket_managers.py)
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', '')
+# Per-socket outbound queues (see tasks/outbound.py): packets a slow client
+# may have waiting before the oldest are dropped, and seconds it may go
+# without reading before it is disconnected
+SOCKETIO_OUTBOUND_QUEUE_SIZE = int(os.environ.get('SOCKETIO_OUTBOUND_QUEUE_SIZE', '100'))
+SOCKETIO_SEND_TIMEOUT = float(os.environ.get('SOCKETIO_SEND_TIMEOUT', '15'))
+
+# Deadline reminders: windows before due_date, and how often (seconds) the
+# ASGI server scans for them itself (0 = only via `manage.py scan_deadlines`)
+DEADLINE_WINDOWS_MINUTES = [24 * 60, 60]
+DEADLINE_SCAN_INTERVAL = int(os.environ.get('DEADLINE_SCAN_INTERVAL', '0'))
+
+# Caches. 'default' holds the per-user/per-project version counters (see
+# tasks/cache.py); with several worker processes point it at a backend they
+# share (e.g. CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# and CACHE_LOCATION=/var/tmp/taskmanager-cache) so a bump reaches them all.
+# 'responses' holds cached list bodies; LocMemCache evicts least recently
+# used entries once MAX_ENTRIES is reached.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'default'),
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '300')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '2000'))},
+    },
+}
 
 # Application definition
 
@@ -45,11 +78,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
+    # Makes BLACKLIST_AFTER_ROTATION below take effect.
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'tasks',
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole stack (tasks/metrics.py).
+    'tasks.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -85,12 +122,64 @@ ASGI_APPLICATION = 'core.asgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# DB_ENGINE=sqlite (default) or postgres; the rest of the DB_* variables tune
+# the chosen profile. Under ASGI Django opens a connection per request thread,
+# so persistent connections (DB_CONN_MAX_AGE) only pay off for WSGI workers;
+# for PostgreSQL prefer the psycopg pool (DB_POOL=1, the default there; the
+# psycopg[binary,pool] requirement provides it).
+# Compare profiles with `manage.py load_test_writes`.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0'))
+
+if DB_ENGINE == 'postgres':
+    DB_POOL = os.environ.get('DB_POOL', '1').lower() in ('1', 'true', 'yes')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'taskmanager'),
+            'USER': os.environ.get('DB_USER', 'taskmanager'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # A pool replaces persistent connections; Django rejects both at once.
+            'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '20')),
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_MAX_AGE > 0,
+            'OPTIONS': {
+                # Run on every new connection: WAL lets readers proceed while a
+                # write is in flight, NORMAL syncs only at checkpoints (safe in
+                # WAL mode), and mmap/cache keep hot pages out of read() calls.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA mmap_size={int(os.environ.get('DB_SQLITE_MMAP_SIZE', 256 * 1024 * 1024))};"
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+                # Busy timeout in seconds while waiting for the write lock.
+                'timeout': int(os.environ.get('DB_SQLITE_TIMEOUT', '20')),
+                # Take the write lock at BEGIN so concurrent atomic() blocks
+                # queue on the busy timeout instead of failing on lock upgrade.
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -137,13 +226,45 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Rest Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication with a verified-token cache (tasks/auth.py).
+        'tasks.auth.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+# List and retrieve responses for tasks and projects are built from values()
+# rows and rendered with orjson when installed (tasks/fast_serializers.py);
+# 0 serves them through the DRF serializers instead. The bytes are the same.
+FAST_SERIALIZATION = os.environ.get('FAST_SERIALIZATION', '1').lower() in ('1', 'true', 'yes')
+
+# Request metrics (tasks/metrics.py): a Server-Timing header on every
+# response, a warning with the SQL for requests slower than SLOW_REQUEST_MS
+# (0 = never), and /metrics for Prometheus, which requires
+# `Authorization: Bearer <METRICS_TOKEN>` when the token is set and otherwise
+# only answers loopback and private network addresses. Set the token when
+# a reverse proxy sits in front, since every request then comes from it.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1').lower() in ('1', 'true', 'yes')
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'tasks.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('PERFORMANCE_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -172,7 +293,12 @@ CORS_ALLOWED_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
 ]
+# django-cors-headers reads CORS_ALLOW_HEADERS; clients need If-None-Match
+# through the preflight and the ETag header exposed to revalidate lists.
+CORS_ALLOW_HEADERS = CORS_ALLOWED_HEADERS
+CORS_EXPOSE_HEADERS = ['etag', 'server-timing']
 
 CORS_ALLOWED_METHODS = [
     'DELETE',
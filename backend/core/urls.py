@@ -18,21 +18,29 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from tasks.views import TaskViewSet, ProjectViewSet, RegisterView
+from tasks.views import TaskViewSet, ProjectViewSet, RegisterView, SearchView, SyncView
+from tasks import async_views
+from tasks.metrics import metrics_view
 from django.contrib.auth.models import User
 from rest_framework import generics, permissions
 from rest_framework.response import Response
+from tasks.pagination import UserKeysetPagination
 
 class UserList(generics.ListAPIView):
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated]
-    
+    pagination_class = UserKeysetPagination
+
     def get_queryset(self):
-        return User.objects.filter(is_active=True).exclude(id=self.request.user.id)
-    
+        return User.objects.filter(is_active=True).exclude(id=self.request.user.id).only('id', 'username', 'email')
+
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
-        data = [{'id': user.id, 'username': user.username, 'email': user.email} for user in queryset]
+        page = self.paginate_queryset(queryset)
+        rows = queryset if page is None else page
+        data = [{'id': user.id, 'username': user.username, 'email': user.email} for user in rows]
+        if page is not None:
+            return self.get_paginated_response(data)
         return Response(data)
 
 router = DefaultRouter()
@@ -41,10 +49,20 @@ router.register(r'projects', ProjectViewSet, basename='project')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Async versions of the hot read paths (see tasks/async_views.py).
+    path('api/async/tasks/', async_views.task_list, name='async-task-list'),
+    path('api/async/tasks/my_tasks/', async_views.my_tasks, name='async-my-tasks'),
+    path('api/async/projects/', async_views.project_list, name='async-project-list'),
+    path('api/async/projects/<int:pk>/members/', async_views.project_members, name='async-project-members'),
+    path('api/async/users/', async_views.user_list, name='async-user-list'),
     path('api/', include(router.urls)),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/register/', RegisterView.as_view(), name='register'),
     path('api/users/', UserList.as_view(), name='user-list'),
+    path('api/sync/', SyncView.as_view(), name='sync'),
+    path('api/search/', SearchView.as_view(), name='search'),
     path('api-auth/', include('rest_framework.urls')),
+    # Prometheus scrape endpoint (see tasks/metrics.py).
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,148 @@
+"""
+Async read endpoints.
+
+DRF views are sync, so under ASGI each request runs start to finish inside
+Django's sync_to_async adapter, holding a thread for authentication,
+queries, serialization and rendering alike. These plain async views serve
+the hot read paths under /api/async/ with the same bodies, pagination,
+sparse fieldsets and response caching as their DRF counterparts. Requests
+wait on the event loop and only the ORM and cache calls hop to a thread:
+ORM calls to the request's thread-sensitive one, cache-only work (token
+cache hits, version and response cache reads) to any pooled worker, so it
+never waits behind a query.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+from .auth import CachedJWTAuthentication
+from .cache import auser_cache_key
+from .fast_serializers import FAST_SERIALIZERS, FastJSONRenderer, fast_serialization_enabled
+from .metrics import timed
+from .models import Task
+from .pagination import KeysetPagination, UserKeysetPagination
+from .response_cache import acached_response
+from .serializers import ProjectSerializer, TaskSerializer, UserSerializer, requested_fields
+from .views import filter_tasks
+from .visibility import visible_projects, visible_tasks
+
+# Unpaginated lists are read and serialized this many rows at a time.
+LIST_CHUNK_SIZE = 2000
+
+
+authentication = CachedJWTAuthentication()
+renderer = FastJSONRenderer()
+
+
+def _render(response):
+    response.accepted_renderer = renderer
+    response.accepted_media_type = renderer.media_type
+    response.renderer_context = {}
+    with timed('render'):
+        return response.render()
+
+
+def async_api_view(view):
+    """
+    Run `view(request, ...)` as an authenticated, JSON-only, read-only API view.
+
+    The view gets a DRF Request (for query_params and the helpers built on it)
+    and returns a DRF Response; API exceptions become the same error bodies
+    and status codes DRF's own views send.
+    """
+    @functools.wraps(view)
+    async def wrapper(http_request, *args, **kwargs):
+        request = Request(http_request)
+        try:
+            if http_request.method not in ('GET', 'HEAD'):
+                raise exceptions.MethodNotAllowed(http_request.method)
+            credentials = await authentication.aauthenticate(http_request)
+            if credentials is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = credentials
+            # JSON is the only rendering; response_etag() keys on it.
+            request.accepted_media_type = renderer.media_type
+            response = await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                # As APIView.handle_exception() does for a header-based scheme.
+                exc.status_code = 401
+                exc.auth_header = authentication.authenticate_header(request)
+            response = exception_handler(exc, {})
+        return _render(response)
+    return wrapper
+
+
+async def paginated_data(request, queryset, serializer_class, paginator_class=KeysetPagination):
+    """
+    Body of FastReadMixin.list_response() in views.py, read with the async
+    ORM. `queryset` is not for_list()-ed yet.
+    """
+    paginator = paginator_class()
+    if fast_serialization_enabled():
+        serializer = FAST_SERIALIZERS[serializer_class](request)
+        rows = serializer.values(queryset)
+        page = await paginator.apaginate_queryset(rows, request)
+        # serialize() reads the many-to-many rows: one hop for the batch.
+        if page is not None:
+            return paginator.get_paginated_response(await sync_to_async(serializer.serialize)(page)).data
+        return await sync_to_async(serializer.serialize)([row async for row in rows])
+
+    context = {'request': request}
+    queryset = queryset.for_list(requested_fields(request))
+    page = await paginator.apaginate_queryset(queryset, request)
+    if page is not None:
+        return paginator.get_paginated_response(serializer_class(page, many=True, context=context).data).data
+    data, chunk = [], []
+    async for row in queryset.aiterator(chunk_size=LIST_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == LIST_CHUNK_SIZE:
+            data += serializer_class(chunk, many=True, context=context).data
+            chunk = []
+    data += serializer_class(chunk, many=True, context=context).data
+    return data
+
+
+@async_api_view
+async def task_list(request):
+    scope = await auser_cache_key('task-list', request.user.pk)
+    tasks = filter_tasks(visible_tasks(request.user), request.query_params)
+    return await acached_response(request, scope, lambda: paginated_data(request, tasks, TaskSerializer))
+
+
+@async_api_view
+async def my_tasks(request):
+    tasks = Task.objects.filter(assignees=request.user)
+    return Response(await paginated_data(request, tasks, TaskSerializer))
+
+
+@async_api_view
+async def project_list(request):
+    scope = await auser_cache_key('project-list', request.user.pk)
+    projects = visible_projects(request.user)
+    return await acached_response(request, scope, lambda: paginated_data(request, projects, ProjectSerializer))
+
+
+@async_api_view
+async def project_members(request, pk):
+    if not await visible_projects(request.user).filter(pk=pk).aexists():
+        raise exceptions.NotFound('No Project matches the given query.')
+    members = User.objects.filter(projects=pk).only('id', 'username', 'email', 'first_name', 'last_name')
+    return Response(UserSerializer([user async for user in members], many=True).data)
+
+
+@async_api_view
+async def user_list(request):
+    users = User.objects.filter(is_active=True).exclude(id=request.user.id).only('id', 'username', 'email')
+    paginator = UserKeysetPagination()
+    page = await paginator.apaginate_queryset(users, request)
+    rows = page if page is not None else [user async for user in users]
+    data = [{'id': user.id, 'username': user.username, 'email': user.email} for user in rows]
+    if page is not None:
+        return paginator.get_paginated_response(data)
+    return Response(data)
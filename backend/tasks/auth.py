@@ -0,0 +1,143 @@
+"""
+JWT authentication shared by the API and the Socket.IO server.
+
+Verified access tokens are kept in a small in-process LRU, so a repeat
+request with the same token skips both the signature check and the user
+query. An entry lives until the token expires or AUTH_CACHE_TTL seconds
+pass, whichever comes first. It is also dropped as soon as the user's auth
+version (cache.py) moves: signals.py bumps it when the user is saved
+(deactivated, password changed, ...) or deleted, or one of their tokens is
+blacklisted. With a cache backend shared between processes the bump reaches
+every worker; with the per-process default only the TTL bounds staleness in
+other workers.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import auth_version
+
+AUTH_CACHE_SIZE = 10000
+AUTH_CACHE_TTL = 60
+
+
+class TokenCache:
+    """Bounded LRU of raw token -> (user, validated token, auth version, expiry)."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, raw_token):
+        with self._lock:
+            entry = self._entries.get(raw_token)
+            if entry is None:
+                return None
+            if entry[3] <= time.time():
+                del self._entries[raw_token]
+                return None
+            self._entries.move_to_end(raw_token)
+            return entry
+
+    def set(self, raw_token, user, token, version):
+        expires = min(time.time() + self.ttl, token.get('exp', 0))
+        if self.size <= 0 or expires <= time.time():
+            return
+        with self._lock:
+            self._entries[raw_token] = (user, token, version, expires)
+            self._entries.move_to_end(raw_token)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    getattr(settings, 'AUTH_CACHE_SIZE', AUTH_CACHE_SIZE),
+    getattr(settings, 'AUTH_CACHE_TTL', AUTH_CACHE_TTL),
+)
+
+_verifier = JWTAuthentication()
+
+
+def authenticate_token(raw_token):
+    """
+    (user, validated token) for a raw access token.
+
+    Raises simplejwt's InvalidToken or AuthenticationFailed like
+    JWTAuthentication does. The user is a copy, so callers may modify it.
+    """
+    if isinstance(raw_token, bytes):
+        raw_token = raw_token.decode('latin-1')
+    hit = _cached(raw_token)
+    if hit is not None:
+        return hit
+
+    token = _verifier.get_validated_token(raw_token)
+    # Read before the user row: a bump committed in between then leaves the
+    # entry stale instead of caching the old row under the new version.
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    version = auth_version(user_id) if user_id is not None else None
+    user = _verifier.get_user(token)
+    token_cache.set(raw_token, user, token, version)
+    return copy.copy(user), token
+
+
+def _cached(raw_token):
+    """(user, token) from the verified-token cache if still current, else None."""
+    entry = token_cache.get(raw_token)
+    if entry is not None:
+        user, token, version, _ = entry
+        if version == auth_version(user.pk):
+            return copy.copy(user), token
+    return None
+
+
+async def aauthenticate_token(raw_token):
+    """
+    authenticate_token() for async callers. A cache hit only reads caches, so
+    it runs on any worker thread; only a miss, which loads the user, waits for
+    the request's thread-sensitive one like the rest of the ORM.
+    """
+    if isinstance(raw_token, bytes):
+        raw_token = raw_token.decode('latin-1')
+    hit = await sync_to_async(_cached, thread_sensitive=False)(raw_token)
+    if hit is not None:
+        return hit
+    return await sync_to_async(authenticate_token)(raw_token)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication backed by the verified-token cache."""
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return authenticate_token(raw_token)
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views (see async_views.py)."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return await aauthenticate_token(raw_token)
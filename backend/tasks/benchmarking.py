@@ -0,0 +1,146 @@
+"""
+Plumbing shared by the benchmark commands: a throwaway SQLite database file
+that a server process can open too, a uvicorn server running
+core.asgi.application against it, sample identities, latency statistics and
+the server process's memory and CPU use.
+"""
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import Project
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+@contextmanager
+def throwaway_database():
+    """Create the test database as a file and yield its path; it is destroyed on exit."""
+    if connection.vendor != 'sqlite':
+        raise CommandError('The benchmark builds its own SQLite database; run it with DB_ENGINE=sqlite')
+    settings_dict = connection.settings_dict
+    old_name = settings_dict['NAME']
+    old_test_name = settings_dict['TEST'].get('NAME')
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'benchmark.sqlite3')
+    settings_dict['TEST']['NAME'] = path
+
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield path
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        settings_dict['TEST']['NAME'] = old_test_name
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+@contextmanager
+def running_server(path, **env):
+    """
+    Serve core.asgi.application with uvicorn on a free local port, against
+    the SQLite database at `path`; yields (process, base URL). `env` adds
+    environment settings, e.g. RESPONSE_CACHE_TIMEOUT='0'.
+    """
+    connections.close_all()
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    # Slow-request logging would time the benchmark's own output.
+    env = dict(os.environ, DB_ENGINE='sqlite', DB_NAME=path, SLOW_REQUEST_MS='0', **env)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'core.asgi:application', '--port', str(port),
+         '--log-level', 'warning', '--no-access-log', '--backlog', '4096'],
+        cwd=settings.BASE_DIR, env=env,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise CommandError('The benchmark server did not start')
+                time.sleep(0.2)
+        yield server, f'http://127.0.0.1:{port}'
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def auth_header(user):
+    return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+
+def member_identities(seed, count=200):
+    """(Authorization header, one of the user's projects) for a sample of project members."""
+    rng = random.Random(seed)
+    memberships = list(Project.members.through.objects.values_list('user_id', 'project_id'))
+    sample = dict(rng.sample(memberships, min(count, len(memberships))))
+    users = User.objects.in_bulk(sample)
+    return [(auth_header(users[user_id]), project_id) for user_id, project_id in sample.items()]
+
+
+def queries_from_server_timing(header):
+    """The query count RequestMetricsMiddleware put in a Server-Timing header, or None."""
+    match = _SERVER_TIMING_QUERIES.search(header or '')
+    return int(match.group(1)) if match else None
+
+
+def process_rss(pid):
+    """Resident memory of process `pid` in bytes, from /proc (Linux); None elsewhere."""
+    try:
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def process_cpu_seconds(pid):
+    """User plus system CPU time of process `pid`, from /proc (Linux); None elsewhere."""
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            # Fields after the parenthesised command name; utime and stime are the 12th and 13th.
+            fields = file.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of the sorted `values`."""
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+def summarize(latencies, errors, elapsed, queries=()):
+    """
+    Percentiles (ms) of `latencies` (ms), throughput over `elapsed` seconds
+    and mean `queries` per request, as a JSON-ready dict.
+    """
+    latencies = sorted(latencies)
+    queries = list(queries)
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'per_second': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+    for name, fraction in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+        summary[name] = round(percentile(latencies, fraction), 2) if latencies else None
+    return summary
@@ -0,0 +1,154 @@
+"""
+Bulk task writes.
+
+Each operation validates the whole batch up front (related ids are checked
+with one query per model), writes with bulk_create/bulk_update and batched
+through-table inserts inside a single transaction, then invalidates caches
+and queues the batch's notifications as one submission, so each recipient
+gets one digest. Model signals are bypassed, so cache invalidation and the
+sync change log are handled here explicitly.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .cache import bump_project_versions, bump_user_versions
+from .dispatch import enqueue_many
+from .models import Task, Project
+from .notifications import TASK_ASSIGNED, TASK_UPDATED
+from .signals import cache_signals_suppressed
+from .sync import record_changes
+from .visibility import tasks_audience, visible_tasks
+
+MAX_BATCH = 1000
+
+
+def _check_batch_size(items):
+    if not items:
+        raise ValidationError({'error': 'No tasks given'})
+    if len(items) > MAX_BATCH:
+        raise ValidationError({'error': f'At most {MAX_BATCH} tasks per request'})
+
+
+def _check_related(items):
+    """Reject unknown project or user ids across the whole batch."""
+    project_ids = {item['project'] for item in items if item.get('project') is not None}
+    user_ids = {user_id for item in items for user_id in item.get('assignees', ())}
+    missing_projects = project_ids - set(Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True))
+    missing_users = user_ids - set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    errors = {}
+    if missing_projects:
+        errors['project'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing_projects)]
+    if missing_users:
+        errors['assignees'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing_users)]
+    if errors:
+        raise ValidationError(errors)
+
+
+def _set_assignees(assignments, replace=True):
+    """`assignments` maps task id -> iterable of user ids; replaces those tasks' assignees."""
+    Assignment = Task.assignees.through
+    if replace:
+        Assignment.objects.filter(task_id__in=assignments).delete()
+    Assignment.objects.bulk_create(
+        Assignment(task_id=task_id, user_id=user_id)
+        for task_id, user_ids in assignments.items()
+        for user_id in set(user_ids)
+    )
+
+
+def bump_on_commit(user_ids, project_ids, events=()):
+    """
+    Once the transaction commits, bump the cache versions of `user_ids` and
+    `project_ids` and queue the notification `events`; for writes that
+    bypass the model signals.
+    """
+    def bump():
+        bump_user_versions(user_ids)
+        bump_project_versions(project_ids)
+    transaction.on_commit(bump)
+    enqueue_many(events)
+
+
+def bulk_create_tasks(user, items):
+    _check_batch_size(items)
+    _check_related(items)
+    with transaction.atomic():
+        tasks = Task.objects.bulk_create([
+            Task(created_by=user, project_id=item.get('project'), **{
+                field: value for field, value in item.items() if field not in ('project', 'assignees')
+            })
+            for item in items
+        ])
+        _set_assignees({
+            task.pk: item['assignees'] for task, item in zip(tasks, items) if item.get('assignees')
+        }, replace=False)
+        task_ids = [task.pk for task in tasks]
+        record_changes('task', task_ids)
+        bump_on_commit(
+            tasks_audience(task_ids),
+            {task.project_id for task in tasks},
+            [(TASK_ASSIGNED, task.pk, user.pk) for task, item in zip(tasks, items) if item.get('assignees')],
+        )
+    return task_ids
+
+
+def bulk_update_tasks(user, items):
+    _check_batch_size(items)
+    _check_related(items)
+    with transaction.atomic():
+        ids = [item['id'] for item in items]
+        tasks = visible_tasks(user).select_for_update().in_bulk(ids)
+        missing = sorted(set(ids) - set(tasks))
+        if missing:
+            raise ValidationError({'id': [f'Task {pk} not found.' for pk in missing]})
+
+        audience = tasks_audience(ids)
+        project_ids = {task.project_id for task in tasks.values()}
+        now = timezone.now()
+        fields = {'updated_at'}
+        assignments = {}
+        for item in items:
+            task = tasks[item['id']]
+            for field in ('status', 'priority'):
+                if field in item:
+                    setattr(task, field, item[field])
+                    fields.add(field)
+            if 'project' in item:
+                task.project_id = item['project']
+                project_ids.add(task.project_id)
+                fields.add('project')
+            if 'assignees' in item:
+                assignments[task.pk] = item['assignees']
+            task.updated_at = now
+        Task.objects.bulk_update(tasks.values(), sorted(fields), batch_size=500)
+
+        previous = {}
+        for task_id, user_id in Task.assignees.through.objects.filter(
+                task_id__in=assignments).values_list('task_id', 'user_id'):
+            previous.setdefault(task_id, set()).add(user_id)
+        _set_assignees(assignments)
+        record_changes('task', ids)
+
+        events = [(TASK_UPDATED, task_id, user.pk) for task_id in tasks]
+        events += [
+            (TASK_ASSIGNED, task_id, user.pk)
+            for task_id, user_ids in assignments.items() if set(user_ids) - previous.get(task_id, set())
+        ]
+        bump_on_commit(audience | tasks_audience(ids), project_ids, events)
+    return len(tasks)
+
+
+def bulk_delete_tasks(user, ids):
+    _check_batch_size(ids)
+    with transaction.atomic():
+        queryset = visible_tasks(user).filter(pk__in=ids)
+        rows = list(queryset.values_list('pk', 'project_id'))
+        task_ids = [pk for pk, _ in rows]
+        audience = tasks_audience(task_ids)
+        with cache_signals_suppressed():
+            Task.objects.filter(pk__in=task_ids).delete()
+        record_changes('task', task_ids, 'delete')
+        bump_on_commit(audience, {project_id for _, project_id in rows})
+    return len(task_ids)
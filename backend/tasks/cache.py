@@ -0,0 +1,80 @@
+"""
+Per-user and per-project cache versioning.
+
+Every user and every project has a version counter in the cache. Anything
+cached on behalf of one embeds that counter in its key, and writes that
+change what it covers bump the counter, so stale entries are simply never
+read again and age out of the cache on their own.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+VERSION_KEY = 'tasks:user-version:{}'
+PROJECT_VERSION_KEY = 'tasks:project-version:{}'
+# Guards the verified-token cache in auth.py rather than cached data.
+AUTH_VERSION_KEY = 'tasks:auth-version:{}'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock rather than 1 so a counter that was evicted can
+        # never restart at a value an older, still-cached entry was keyed on.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+
+def user_version(user_id):
+    return _version(VERSION_KEY.format(user_id))
+
+
+def project_version(project_id):
+    return _version(PROJECT_VERSION_KEY.format(project_id))
+
+
+def auth_version(user_id):
+    return _version(AUTH_VERSION_KEY.format(user_id))
+
+
+def bump_user_versions(user_ids):
+    for user_id in set(user_ids):
+        _bump(VERSION_KEY.format(user_id))
+
+
+def bump_project_versions(project_ids):
+    for project_id in set(project_ids) - {None}:
+        _bump(PROJECT_VERSION_KEY.format(project_id))
+
+
+def bump_auth_versions(user_ids):
+    for user_id in set(user_ids):
+        _bump(AUTH_VERSION_KEY.format(user_id))
+
+
+def user_cache_key(prefix, user_id, *parts):
+    return ':'.join(str(part) for part in ('tasks', prefix, user_id, user_version(user_id), *parts))
+
+
+def project_cache_key(prefix, project_id, *parts):
+    return ':'.join(
+        str(part) for part in ('tasks', prefix, 'project', project_id, project_version(project_id), *parts)
+    )
+
+
+async def auser_cache_key(prefix, user_id, *parts):
+    """
+    user_cache_key() for async views. Django's async cache methods wrap the
+    sync ones in thread-sensitive sync_to_async; version reads touch no
+    database connection, so they run on any worker thread instead.
+    """
+    return await sync_to_async(user_cache_key, thread_sensitive=False)(prefix, user_id, *parts)
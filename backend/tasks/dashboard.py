@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cache import user_cache_key
+from .models import Task
+from .visibility import visible_tasks
+
+STATS_TIMEOUT = 300
+
+
+def _completion_rate(done, total):
+    return round(done * 100 / total) if total else 0
+
+
+def compute_task_stats(user):
+    """
+    Dashboard counters over the tasks visible to `user`.
+
+    A single GROUP BY project query yields every counter per project; the
+    overall totals are the sums of those rows.
+    """
+    aggregates = {'total': Count('id')}
+    for value, _ in Task.STATUS_CHOICES:
+        aggregates[f'status_{value}'] = Count('id', filter=Q(status=value))
+    for value, _ in Task.PRIORITY_CHOICES:
+        aggregates[f'priority_{value}'] = Count('id', filter=Q(priority=value))
+    aggregates['overdue'] = Count('id', filter=Q(due_date__lt=timezone.now()) & ~Q(status='DONE'))
+
+    rows = (
+        visible_tasks(user)
+        .order_by()
+        .values('project_id', 'project__name')
+        .annotate(**aggregates)
+    )
+
+    stats = {
+        'total': 0,
+        'by_status': {value: 0 for value, _ in Task.STATUS_CHOICES},
+        'by_priority': {value: 0 for value, _ in Task.PRIORITY_CHOICES},
+        'overdue': 0,
+        'projects': [],
+    }
+    for row in rows:
+        stats['total'] += row['total']
+        stats['overdue'] += row['overdue']
+        for value in stats['by_status']:
+            stats['by_status'][value] += row[f'status_{value}']
+        for value in stats['by_priority']:
+            stats['by_priority'][value] += row[f'priority_{value}']
+        if row['project_id'] is not None:
+            stats['projects'].append({
+                'id': row['project_id'],
+                'name': row['project__name'],
+                'total': row['total'],
+                'done': row['status_DONE'],
+                'overdue': row['overdue'],
+                'completion_rate': _completion_rate(row['status_DONE'], row['total']),
+            })
+    stats['completion_rate'] = _completion_rate(stats['by_status']['DONE'], stats['total'])
+    return stats
+
+
+def task_stats(user):
+    """Cached `compute_task_stats`, invalidated through the user's cache version."""
+    key = user_cache_key('dashboard', user.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_task_stats(user)
+        cache.set(key, stats, STATS_TIMEOUT)
+    return stats
@@ -0,0 +1,147 @@
+"""
+Deadline reminders.
+
+`scan_deadlines` finds open tasks whose due date falls inside one of the
+configured windows (e.g. "due within 24 hours") and that have not been
+reminded for that window and due date yet. It walks the candidates with a
+server-side cursor in fixed-size chunks, records each chunk in
+DeadlineReminder and hands the chunk's events to a sender, so memory stays
+flat however many tasks are due. Moving a task's due date makes it eligible
+again.
+
+Scans may overlap (every worker with DEADLINE_SCAN_INTERVAL runs one, and
+so can cron). DeadlineReminder's unique constraint decides between them:
+a scan only sends the reminders whose rows it inserted itself.
+
+The scan runs from the `scan_deadlines` management command (e.g. from cron)
+or, when DEADLINE_SCAN_INTERVAL is set, periodically inside the ASGI server.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .inserts import insert_rows
+from .models import DeadlineReminder, Task
+from .notifications import DEADLINE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOWS_MINUTES = [24 * 60, 60]
+
+
+def deadline_windows():
+    return getattr(settings, 'DEADLINE_WINDOWS_MINUTES', DEFAULT_WINDOWS_MINUTES)
+
+
+def due_tasks(window_minutes, now, after_minutes=0):
+    """
+    Open tasks due between `after_minutes` and `window_minutes` from `now`
+    that have not been reminded for this window and due date yet.
+    """
+    already_sent = DeadlineReminder.objects.filter(
+        task=OuterRef('pk'), window_minutes=window_minutes, due_date=OuterRef('due_date'),
+    )
+    return Task.objects.filter(
+        ~Q(status='DONE'),
+        due_date__gt=now + timedelta(minutes=after_minutes),
+        due_date__lte=now + timedelta(minutes=window_minutes),
+    ).filter(~Exists(already_sent))
+
+
+def scan_deadlines(send, now=None, windows=None, chunk_size=2000):
+    """
+    Record and send reminders for every due task; returns the number sent.
+
+    `send` receives a list of (DEADLINE, task_id, None) events per chunk and
+    should return once they are delivered, so a large scan goes no faster
+    than its notifications.
+    """
+    now = now or timezone.now()
+    sent = 0
+    # Windows are scanned as disjoint bands (0-60m, 60m-24h, ...) so a task
+    # due in 30 minutes is only announced for the narrowest window it is in.
+    after_minutes = 0
+    for window_minutes in sorted(windows or deadline_windows()):
+        rows = (
+            due_tasks(window_minutes, now, after_minutes)
+            .order_by('due_date', 'id')
+            .values_list('id', 'due_date')
+        )
+        chunk = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                sent += _flush(chunk, window_minutes, send)
+                chunk = []
+        if chunk:
+            sent += _flush(chunk, window_minutes, send)
+        after_minutes = window_minutes
+    return sent
+
+
+def _flush(chunk, window_minutes, send):
+    adapt = connection.ops.adapt_datetimefield_value
+    now = adapt(timezone.now())
+    with transaction.atomic():
+        # Rows another scan inserted since this one's query ran are skipped,
+        # and so are not returned.
+        task_ids = insert_rows(
+            DeadlineReminder, ['task', 'window_minutes', 'due_date', 'sent_at'],
+            [(task_id, window_minutes, adapt(due_date), now) for task_id, due_date in chunk],
+            returning='task', ignore_conflicts=True,
+        )
+    if task_ids:
+        send([(DEADLINE, task_id, None) for task_id in task_ids])
+    return len(task_ids)
+
+
+class DeadlineScheduler:
+    """
+    Runs `scan_deadlines` every `interval` seconds on the server's event loop,
+    delivering each chunk through the dispatcher before scanning the next.
+    """
+
+    def __init__(self, dispatcher, interval=None):
+        self.dispatcher = dispatcher
+        self.interval = interval if interval is not None else getattr(settings, 'DEADLINE_SCAN_INTERVAL', 0)
+        self._task = None
+
+    async def start(self):
+        if self.interval:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _scan(self):
+        close_old_connections()
+        try:
+            return scan_deadlines(send=self._submit)
+        finally:
+            close_old_connections()
+
+    def _submit(self, events):
+        # Not dispatcher.submit(): its queue is bounded and drops events.
+        async_to_sync(self.dispatcher.deliver)(events)
+
+    async def _run(self):
+        while True:
+            try:
+                sent = await sync_to_async(self._scan, thread_sensitive=False)()
+                if sent:
+                    logger.info('Sent %d deadline reminders', sent)
+            except Exception:
+                logger.exception('Deadline scan failed')
+            await asyncio.sleep(self.interval)
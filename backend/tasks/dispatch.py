@@ -0,0 +1,113 @@
+"""
+Background delivery of notifications.
+
+Views call `enqueue()` from the request thread. Once the surrounding
+transaction commits, the event is handed to an asyncio worker running on the
+ASGI event loop, which groups whatever has queued up within a short window,
+resolves recipients for the whole batch at once, folds bursts into per-user
+digests and emits through Socket.IO. The request never waits on recipient
+lookups or socket writes. A batch is only ever cut between submissions, so
+the events of one bulk operation (`enqueue_many()`) share one digest.
+
+Outside an ASGI server (management commands, WSGI, tests) no worker is
+running and events are dropped.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from . import notifications
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    def __init__(self, batch_size=None, flush_interval=None, max_queue=None):
+        self.batch_size = batch_size or getattr(settings, 'NOTIFICATION_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or getattr(settings, 'NOTIFICATION_FLUSH_INTERVAL', 0.25)
+        self.max_queue = max_queue or getattr(settings, 'NOTIFICATION_MAX_QUEUE', 10000)
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    @property
+    def running(self):
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        # Deliver whatever was accepted before shutdown.
+        pending = []
+        while not self._queue.empty():
+            pending.extend(self._queue.get_nowait())
+        if pending:
+            await self.deliver(pending)
+        self._worker = None
+        self._loop = None
+
+    def submit(self, event):
+        """Hand an event to the worker; safe to call from any thread."""
+        self.submit_many([event])
+
+    def submit_many(self, events):
+        """Hand `events` to the worker, to be delivered in the same batch."""
+        if not self.running:
+            logger.debug('Notification dispatcher not running, dropping %d events', len(events))
+            return
+        self._loop.call_soon_threadsafe(self._put, list(events))
+
+    def _put(self, events):
+        try:
+            self._queue.put_nowait(events)
+        except asyncio.QueueFull:
+            logger.warning('Notification queue full, dropping %d events', len(events))
+
+    async def _run(self):
+        while True:
+            batch = await self._queue.get()
+            deadline = self._loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.extend(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.deliver(batch)
+            except Exception:
+                logger.exception('Failed to deliver %d notification events', len(batch))
+
+    async def deliver(self, events):
+        """Send `events` now, without queueing; returns once they are emitted."""
+        await notifications.notify_events(events, coalesce=True)
+
+
+dispatcher = NotificationDispatcher()
+
+
+def enqueue(event_type, object_id, actor_id):
+    """Queue a notification to be sent once the current transaction commits."""
+    event = (event_type, object_id, actor_id)
+    transaction.on_commit(lambda: dispatcher.submit(event))
+
+
+def enqueue_many(events):
+    """enqueue() for several events, delivered together (one digest per user)."""
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: dispatcher.submit_many(events))
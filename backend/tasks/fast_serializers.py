@@ -0,0 +1,244 @@
+"""
+Fast serialization for the hot read paths.
+
+TaskSerializer and ProjectSerializer build every row field by field through
+DRF's field objects (and a nested UserSerializer per assignee), which costs
+far more CPU on a long list than the queries behind it. The classes here
+produce the same dicts, key for key and in the same order, from values()
+rows plus one query per many-to-many relation for the whole batch, and
+FastJSONRenderer writes them with orjson when it is installed. The bytes on
+the wire are the ones DRF would send; tests.FastSerializationTests holds the
+two paths to that and `manage.py benchmark_serializers` measures the
+per-row cost of each.
+
+The fast path serves list and retrieve responses only; writes still go
+through the DRF serializers for validation. settings.FAST_SERIALIZATION
+switches it off.
+"""
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework.fields import DateTimeField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from .metrics import timed
+from .models import Project, Task
+from .serializers import ProjectSerializer, TaskSerializer, UserSerializer, requested_fields
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Many-to-many rows are read for at most this many parents per query.
+RELATION_BATCH_SIZE = 2000
+
+
+def fast_serialization_enabled():
+    return getattr(settings, 'FAST_SERIALIZATION', True)
+
+
+def _datetime_formatter():
+    """DateTimeField.to_representation(), minus the per-call settings lookups."""
+    if (api_settings.DATETIME_FORMAT or '').lower() != ISO_8601:
+        return DateTimeField().to_representation
+    zone = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def format_datetime(value):
+        if value is None:
+            return None
+        if zone is not None and timezone.is_aware(value):
+            value = value.astimezone(zone)
+        text = value.isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return format_datetime
+
+
+def _related(through, parent_field, parent_ids, *columns):
+    """parent id -> list of `columns` tuples of its through rows, ordered by user id."""
+    related = {}
+    parent_ids = list(parent_ids)
+    for start in range(0, len(parent_ids), RELATION_BATCH_SIZE):
+        rows = (
+            through.objects
+            .filter(**{f'{parent_field}__in': parent_ids[start:start + RELATION_BATCH_SIZE]})
+            .order_by(parent_field, 'user_id')
+            .values_list(parent_field, *columns)
+        )
+        for parent_id, *values in rows:
+            related.setdefault(parent_id, []).append(values)
+    return related
+
+
+class FastSerializer(ABC):
+    """
+    `serializer_class`'s read output for values() rows.
+
+    values() picks the columns for the requested fields (`?fields=`, as
+    SparseFieldsetMixin does) and serialize() turns a batch of its rows into
+    the dicts the DRF serializer would have returned.
+    """
+    serializer_class = None
+    model = None
+
+    def __init__(self, request=None):
+        requested = requested_fields(request)
+        all_fields = self.serializer_class.Meta.fields
+        self.fields = [name for name in all_fields if requested is None or name in requested]
+        self.sparse = len(self.fields) != len(all_fields)
+
+    def wants(self, *names):
+        return any(name in self.fields for name in names)
+
+    def values(self, queryset):
+        # id and created_at are always read: KeysetPagination orders on them.
+        return queryset.values(*self.columns())
+
+    @abstractmethod
+    def columns(self):
+        """The values() columns serialize() needs for the requested fields."""
+
+    @abstractmethod
+    def serialize(self, rows):
+        """The DRF serializer's output for values() `rows`."""
+
+    def _select(self, data):
+        """Trim full rows to the requested fields."""
+        if not self.sparse:
+            return data
+        return [{name: item[name] for name in self.fields if name in item} for item in data]
+
+
+class FastTaskSerializer(FastSerializer):
+    serializer_class = TaskSerializer
+    model = Task
+
+    def columns(self):
+        columns = [
+            'id', 'title', 'description', 'status', 'priority', 'created_at', 'updated_at',
+            'due_date', 'created_by_id', 'project_id',
+        ]
+        if self.wants('created_by_username'):
+            columns.append('created_by__username')
+        if self.wants('project_name'):
+            columns.append('project__name')
+        return columns
+
+    @timed('serialize')
+    def serialize(self, rows):
+        format_datetime = _datetime_formatter()
+        assignees = {}
+        if self.wants('assignees', 'assignee_details'):
+            user_fields = [f'user__{name}' for name in UserSerializer.Meta.fields]
+            assignees = _related(Task.assignees.through, 'task_id', (row['id'] for row in rows), *user_fields)
+        users = {}
+        data = []
+        for row in rows:
+            details = []
+            for values in assignees.get(row['id'], ()):
+                # One dict per user, shared by every task it is assigned to.
+                user = users.get(values[0])
+                if user is None:
+                    user = users[values[0]] = dict(zip(UserSerializer.Meta.fields, values))
+                details.append(user)
+            item = {
+                'id': row['id'],
+                'title': row['title'],
+                'description': row['description'],
+                'status': row['status'],
+                'priority': row['priority'],
+                'created_at': format_datetime(row['created_at']),
+                'updated_at': format_datetime(row['updated_at']),
+                'due_date': format_datetime(row['due_date']),
+                'assignees': [user['id'] for user in details],
+                'created_by': row['created_by_id'],
+                'created_by_username': row.get('created_by__username'),
+                'project': row['project_id'],
+            }
+            # DRF skips a dotted source through a null relation altogether.
+            if row['project_id'] is not None:
+                item['project_name'] = row.get('project__name')
+            item['assignee_details'] = details
+            data.append(item)
+        return self._select(data)
+
+
+class FastProjectSerializer(FastSerializer):
+    serializer_class = ProjectSerializer
+    model = Project
+
+    def columns(self):
+        columns = [
+            'id', 'name', 'description', 'status', 'priority', 'start_date', 'due_date',
+            'created_at', 'updated_at', 'created_by_id',
+        ]
+        if self.wants('created_by_username'):
+            columns.append('created_by__username')
+        columns += [name for name in ('member_count', 'task_count') if self.wants(name)]
+        return columns
+
+    def values(self, queryset):
+        return queryset.with_counts(self.fields).values(*self.columns())
+
+    @timed('serialize')
+    def serialize(self, rows):
+        format_datetime = _datetime_formatter()
+        members = {}
+        if self.wants('members'):
+            members = _related(Project.members.through, 'project_id', (row['id'] for row in rows), 'user_id')
+        data = []
+        for row in rows:
+            data.append({
+                'id': row['id'],
+                'name': row['name'],
+                'description': row['description'],
+                'status': row['status'],
+                'priority': row['priority'],
+                'start_date': format_datetime(row['start_date']),
+                'due_date': format_datetime(row['due_date']),
+                'created_at': format_datetime(row['created_at']),
+                'updated_at': format_datetime(row['updated_at']),
+                'created_by': row['created_by_id'],
+                'created_by_username': row.get('created_by__username'),
+                'members': [user_id for user_id, in members.get(row['id'], ())],
+                'member_count': row.get('member_count'),
+                'task_count': row.get('task_count'),
+            })
+        return self._select(data)
+
+
+FAST_SERIALIZERS = {
+    TaskSerializer: FastTaskSerializer,
+    ProjectSerializer: FastProjectSerializer,
+}
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that writes compact output with orjson when it is installed.
+
+    orjson's compact, non-ASCII-escaping output matches json.dumps() with
+    DRF's settings byte for byte, except for floats (orjson writes 1e-06 as
+    1e-6). Only use this renderer for views whose data holds no floats. Other
+    cases fall back to JSONRenderer: indented output, ensure_ascii, keys that
+    are not strings, and values neither library can handle.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or not fast_serialization_enabled()
+            or not self.compact or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Dates, decimals and the rest go through DRF's encoder, as with json.dumps().
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # As JSONRenderer: escape the separators JavaScript does not allow in strings.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
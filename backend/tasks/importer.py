@@ -0,0 +1,321 @@
+"""
+Bulk task import from CSV or JSON.
+
+Rows are parsed from the stream one at a time (CSV with a header row, a JSON
+array, or newline-delimited JSON objects), validated in plain Python and
+written a chunk at a time: multi-row INSERTs for the tasks (returning their
+ids), the assignee through rows and the sync change log, each chunk in its
+own transaction. The rows are inserted as plain tuples rather than through
+bulk_create, whose per-value field preparation costs several times the
+inserts themselves at this volume; model signals are not sent either way.
+Project names and usernames are resolved through in-memory maps
+filled with one query for the importer's visible projects and one query per
+chunk for usernames not seen before, so no per-row query is ever made.
+
+Invalid rows are skipped and reported with their 1-based row number; the rest
+are imported. The column names are those of the task export, so an export
+re-imports as is (id, created_by and the timestamps are ignored). Imports do
+not send assignment notifications: migrating a board would otherwise flood
+every assignee.
+"""
+import csv
+import io
+import json
+from datetime import datetime, time
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .bulk import bump_on_commit
+from .inserts import insert_rows
+from .models import Project, Task
+from .sync import record_changes
+from .visibility import visible_projects
+
+IMPORT_CHUNK_SIZE = 2000
+# Errors past this many are counted but not listed.
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = ('csv', 'json')
+
+_READ_SIZE = 64 * 1024
+# A JSON object still undecodable after this many characters is rejected
+# rather than buffering the rest of the upload.
+_MAX_OBJECT_SIZE = 1024 * 1024
+_TITLE_MAX_LENGTH = Task._meta.get_field('title').max_length
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+
+class _RowError(Exception):
+    """A row that could not be parsed at all; parsing stops after it."""
+
+
+def _csv_rows(stream):
+    for row in csv.DictReader(stream):
+        # Short rows leave missing columns as None, long rows collect extras under None.
+        row.pop(None, None)
+        yield row
+
+
+def _json_rows(stream):
+    """Objects of a top-level JSON array, or of newline-delimited JSON, read incrementally."""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(_READ_SIZE)
+    position = 0
+    eof = not buffer
+
+    while True:
+        # Skip whitespace and the array's brackets and commas, topping up the buffer.
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            buffer, position = stream.read(_READ_SIZE), 0
+            eof = not buffer
+        if position >= len(buffer):
+            return
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof or len(buffer) - position > _MAX_OBJECT_SIZE:
+                    raise _RowError(f'Invalid JSON: {e.msg}')
+                more = stream.read(_READ_SIZE)
+                eof = not more
+                buffer, position = buffer[position:] + more, 0
+                continue
+            break
+        position = end
+        yield value
+
+
+def _read_rows(stream, fmt):
+    return _csv_rows(stream) if fmt == 'csv' else _json_rows(stream)
+
+
+def _choice_map(choices):
+    """Accept choice values and their labels, case-insensitively."""
+    mapping = {}
+    for value, label in choices:
+        mapping[value.lower()] = value
+        mapping[label.lower()] = value
+    return mapping
+
+
+_STATUSES = _choice_map(Task.STATUS_CHOICES)
+_PRIORITIES = _choice_map(Task.PRIORITY_CHOICES)
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return value.strip() if isinstance(value, str) else str(value)
+
+
+def _parse_due_date(value):
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = day and datetime.combine(day, time())
+    else:
+        parsed = None
+    if parsed is None:
+        raise ValueError
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _usernames(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        return [name.strip() for name in value.replace(',', ';').split(';') if name.strip()]
+    if isinstance(value, list):
+        return [_text(name) for name in value if _text(name)]
+    raise ValueError
+
+
+TASK_FIELDS = [
+    'title', 'description', 'status', 'priority', 'due_date', 'project',
+    'created_by', 'created_at', 'updated_at',
+]
+
+
+class TaskImporter:
+    """Validates and writes task rows for `user`, `chunk_size` rows per transaction."""
+
+    def __init__(self, user, chunk_size=None, dry_run=False):
+        self.user = user
+        self.chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+        self.dry_run = dry_run
+        self.result = ImportResult()
+        self.project_ids = set()
+        self.projects_by_name = {}
+        for pk, name in visible_projects(user).values_list('pk', 'name'):
+            self.project_ids.add(pk)
+            # A name shared by several visible projects is ambiguous.
+            self.projects_by_name[name] = None if name in self.projects_by_name else pk
+        self.users_by_name = {}
+
+    def run(self, stream, fmt):
+        """Import every row of the text `stream`; returns the ImportResult."""
+        chunk = []
+        row_number = 0
+        try:
+            for row_number, row in enumerate(_read_rows(stream, fmt), 1):
+                chunk.append((row_number, row))
+                if len(chunk) == self.chunk_size:
+                    self._import_chunk(chunk)
+                    chunk = []
+        except (_RowError, csv.Error, UnicodeDecodeError) as e:
+            self._import_chunk(chunk)
+            chunk = []
+            message = str(e) if isinstance(e, _RowError) else f'Unreadable input: {e}'
+            self.result.add_error(row_number + 1, {'non_field_errors': [message]})
+        self._import_chunk(chunk)
+        return self.result
+
+    def _resolve_users(self, chunk):
+        wanted = set()
+        for _, row in chunk:
+            try:
+                wanted.update(_usernames(row.get('assignees')) if isinstance(row, dict) else ())
+            except ValueError:
+                pass
+        missing = wanted - self.users_by_name.keys()
+        if missing:
+            self.users_by_name.update(dict.fromkeys(missing))
+            self.users_by_name.update(
+                User.objects.filter(username__in=missing).values_list('username', 'id')
+            )
+
+    def _project_id(self, row):
+        project_id = row.get('project_id')
+        if project_id not in (None, ''):
+            try:
+                project_id = int(project_id)
+            except (TypeError, ValueError):
+                raise ValueError('A valid integer is required.')
+            if project_id not in self.project_ids:
+                raise ValueError(f'Project {project_id} not found.')
+            return project_id
+        name = _text(row.get('project', row.get('project_name')))
+        if not name:
+            return None
+        if name not in self.projects_by_name:
+            raise ValueError(f'Project "{name}" not found.')
+        if self.projects_by_name[name] is None:
+            raise ValueError(f'Project name "{name}" is ambiguous; give project_id instead.')
+        return self.projects_by_name[name]
+
+    def _build(self, row):
+        """
+        (values for TASK_FIELDS up to project, assignee ids) for one row, or
+        raises ValueError with a field -> messages dict.
+        """
+        if not isinstance(row, dict):
+            raise ValueError({'non_field_errors': ['Expected an object.']})
+        errors = {}
+        title = _text(row.get('title'))
+        if not title:
+            errors['title'] = ['This field is required.']
+        elif len(title) > _TITLE_MAX_LENGTH:
+            errors['title'] = [f'Ensure this field has no more than {_TITLE_MAX_LENGTH} characters.']
+
+        fields = {}
+        for field, mapping, default in (('status', _STATUSES, 'TODO'), ('priority', _PRIORITIES, 'MEDIUM')):
+            value = _text(row.get(field))
+            fields[field] = mapping.get(value.lower()) if value else default
+            if fields[field] is None:
+                errors[field] = [f'"{value}" is not a valid choice.']
+
+        due_date = row.get('due_date')
+        if due_date not in (None, ''):
+            try:
+                due_date = _parse_due_date(due_date)
+            except ValueError:
+                errors['due_date'] = ['Datetime has wrong format.']
+        else:
+            due_date = None
+
+        try:
+            project_id = self._project_id(row)
+        except ValueError as e:
+            errors['project'] = [str(e)]
+
+        assignee_ids = []
+        try:
+            names = _usernames(row.get('assignees'))
+        except ValueError:
+            errors['assignees'] = ['Expected a list of usernames.']
+        else:
+            unknown = [name for name in names if self.users_by_name.get(name) is None]
+            if unknown:
+                errors['assignees'] = [f'User "{name}" not found.' for name in unknown]
+            assignee_ids = {self.users_by_name.get(name) for name in names}
+
+        if errors:
+            raise ValueError(errors)
+        due_date = connection.ops.adapt_datetimefield_value(due_date)
+        values = (title, _text(row.get('description')), fields['status'], fields['priority'], due_date, project_id)
+        return values, assignee_ids
+
+    def _import_chunk(self, chunk):
+        if not chunk:
+            return
+        self._resolve_users(chunk)
+        rows, assignments = [], []
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        for row_number, row in chunk:
+            try:
+                values, assignee_ids = self._build(row)
+            except ValueError as e:
+                self.result.add_error(row_number, e.args[0])
+                continue
+            rows.append((*values, self.user.pk, now, now))
+            assignments.append(assignee_ids)
+        if self.dry_run or not rows:
+            # A dry run reports how many rows would have been created.
+            self.result.created += len(rows)
+            return
+
+        with transaction.atomic():
+            task_ids = insert_rows(Task, TASK_FIELDS, rows, returning='id')
+            insert_rows(Task.assignees.through, ['task', 'user'], [
+                (task_id, user_id) for task_id, user_ids in zip(task_ids, assignments) for user_id in user_ids
+            ])
+            record_changes('task', task_ids)
+            # The audience is the importer, the assignees and the projects'
+            # members; only the last needs a query.
+            project_ids = {row[5] for row in rows} - {None}
+            audience = {self.user.pk}.union(*assignments)
+            audience.update(
+                Project.members.through.objects.filter(project_id__in=project_ids).values_list('user_id', flat=True)
+            )
+            bump_on_commit(audience, project_ids)
+        self.result.created += len(rows)
+
+
+def import_tasks(user, file, fmt, chunk_size=None, dry_run=False):
+    """Import tasks for `user` from the binary `file` in `fmt` ('csv' or 'json')."""
+    stream = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    return TaskImporter(user, chunk_size=chunk_size, dry_run=dry_run).run(stream, fmt)
@@ -0,0 +1,41 @@
+"""
+Multi-row INSERTs of plain tuples, for the bulk paths (imports, the sync
+change log) where bulk_create's per-value field preparation costs several
+times the inserts themselves.
+"""
+from django.db import connection
+from django.db.models.constants import OnConflict
+
+# Bind parameters one statement may carry. PostgreSQL's protocol stops at
+# 65535 and its bulk_batch_size() sets no limit, so the cap is applied here.
+MAX_QUERY_PARAMS = 65535
+
+
+def insert_rows(model, field_names, rows, returning=None, ignore_conflicts=False):
+    """
+    INSERT `rows` (tuples of database-ready values for `field_names`) into
+    `model`'s table, as many rows per statement as the backend allows.
+    With `returning` (a field name), returns that field of every inserted
+    row. With `ignore_conflicts`, rows that would violate a unique
+    constraint are skipped and, as they were not inserted, not returned.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    on_conflict = OnConflict.IGNORE if ignore_conflicts else None
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    row_sql = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    suffix = connection.ops.on_conflict_suffix_sql(fields, on_conflict, None, None)
+    if returning:
+        column = connection.ops.quote_name(model._meta.get_field(returning).column)
+        suffix = f'{suffix} RETURNING {column}'.lstrip()
+    batch_size = max(1, min(connection.ops.bulk_batch_size(fields, rows), MAX_QUERY_PARAMS // len(fields)))
+    values = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = (f'{connection.ops.insert_statement(on_conflict=on_conflict)} {table} ({columns}) '
+                   f'VALUES {", ".join([row_sql] * len(batch))} {suffix}').rstrip()
+            cursor.execute(sql, [value for row in batch for value in row])
+            if returning:
+                values.extend(value for value, in cursor.fetchall())
+    return values
@@ -0,0 +1,123 @@
+import asyncio
+import random
+import re
+import time
+
+import aiohttp
+from django.core.management.base import BaseCommand
+
+from tasks.benchmarking import member_identities, percentile, running_server, throwaway_database
+from tasks.synthetic import generate_dataset
+
+# endpoint -> (sync DRF view, async view); {project} is one of the user's projects.
+ENDPOINTS = {
+    'tasks': ('/api/tasks/?page_size=50', '/api/async/tasks/?page_size=50'),
+    'my_tasks': ('/api/tasks/my_tasks/?page_size=50', '/api/async/tasks/my_tasks/?page_size=50'),
+    'projects': ('/api/projects/?page_size=50', '/api/async/projects/?page_size=50'),
+    'members': ('/api/projects/{project}/members/', '/api/async/projects/{project}/members/'),
+    'users': ('/api/users/?page_size=50', '/api/async/users/?page_size=50'),
+}
+
+SERVER_TIMING = re.compile(r'(\w+);dur=([\d.]+)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the sync DRF read endpoints with their async versions under many '
+        'concurrent clients, against a uvicorn server on a throwaway SQLite database. '
+        '"overlap" is the most requests the server had in progress at once and "db" the '
+        'average number of queries running at once, both from the Server-Timing header'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=3, help='Requests per client per run')
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help='Endpoint to run (repeatable; default: all)')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--projects', type=int, default=200)
+        parser.add_argument('--tasks', type=int, default=20000)
+        parser.add_argument('--cache', action='store_true',
+                            help='Keep the response cache on (default: off, so every request does the work)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with throwaway_database() as path:
+            generate_dataset(
+                users=options['users'], projects=options['projects'], tasks=options['tasks'], seed=options['seed'],
+            )
+            identities = member_identities(options['seed'])
+            env = {} if options['cache'] else {'RESPONSE_CACHE_TIMEOUT': '0'}
+            with running_server(path, **env) as (_, url):
+                asyncio.run(self._run(url, identities, options))
+
+    async def _run(self, url, identities, options):
+        rng = random.Random(options['seed'])
+        connector = aiohttp.TCPConnector(limit=options['clients'])
+        timeout = aiohttp.ClientTimeout(total=300)
+        async with aiohttp.ClientSession(url, connector=connector, timeout=timeout) as session:
+            self.stdout.write(
+                f'{options["clients"]} clients x {options["requests"]} requests, '
+                f'response cache {"on" if options["cache"] else "off"}'
+            )
+            self.stdout.write(
+                f'{"endpoint":>10} {"view":>5} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+                f'{"overlap":>8} {"db":>6} errors'
+            )
+            for name in options['endpoint'] or list(ENDPOINTS):
+                for mode, path in zip(('sync', 'async'), ENDPOINTS[name]):
+                    # Warm up connections, caches and the server's import paths.
+                    await self._load(session, path, identities, rng, clients=20, requests=2)
+                    result = await self._load(session, path, identities, rng, options['clients'], options['requests'])
+                    self._report(name, mode, *result)
+
+    async def _load(self, session, path, identities, rng, clients, requests):
+        latencies, errors = [], 0
+        # (start, end, db seconds) of each request as the server timed it;
+        # the end is when the response arrived, on the same host.
+        spans = []
+
+        async def client():
+            nonlocal errors
+            for _ in range(requests):
+                headers, project_id = rng.choice(identities)
+                started = time.perf_counter()
+                try:
+                    async with session.get(path.format(project=project_id), headers=headers) as response:
+                        await response.read()
+                        ok = response.status == 200
+                        timing = dict(SERVER_TIMING.findall(response.headers.get('Server-Timing', '')))
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                if ok:
+                    finished = time.perf_counter()
+                    latencies.append((finished - started) * 1000)
+                    if 'total' in timing:
+                        spans.append((finished - float(timing['total']) / 1000, finished,
+                                      float(timing.get('db', 0)) / 1000))
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return latencies, errors, time.perf_counter() - started, spans
+
+    def _overlap(self, spans, elapsed):
+        """Peak requests in progress on the server, and mean queries running at once."""
+        peak = running = 0
+        for _, change in sorted([(start, 1) for start, _, _ in spans] + [(end, -1) for _, end, _ in spans]):
+            running += change
+            peak = max(peak, running)
+        return peak, sum(db for _, _, db in spans) / elapsed if elapsed else 0
+
+    def _report(self, name, mode, latencies, errors, elapsed, spans):
+        latencies.sort()
+        if not latencies:
+            self.stdout.write(f'{name:>10} {mode:>5}: no successful requests, {errors} errors')
+            return
+        peak, db = self._overlap(spans, elapsed)
+        self.stdout.write(
+            f'{name:>10} {mode:>5} {len(latencies) / elapsed:>8.0f} {percentile(latencies, 0.5):>8.1f} '
+            f'{percentile(latencies, 0.95):>8.1f} {percentile(latencies, 0.99):>8.1f} '
+            f'{peak:>8} {db:>6.2f} {errors}'
+        )
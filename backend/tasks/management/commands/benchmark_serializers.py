@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from tasks import fast_serializers
+from tasks.fast_serializers import FastJSONRenderer, FastProjectSerializer, FastTaskSerializer
+from tasks.models import Project, Task
+from tasks.serializers import ProjectSerializer, TaskSerializer
+from tasks.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the per-row cost of reading, serializing and rendering task and project '
+        'lists through the DRF serializers and through tasks.fast_serializers, on a throwaway database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--projects', type=int, default=500)
+        parser.add_argument('--tasks', type=int, default=20000)
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per list')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best is reported')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, options):
+        generate_dataset(
+            users=options['users'], projects=options['projects'], tasks=options['tasks'], seed=options['seed'],
+        )
+        self.stdout.write(
+            f'{options["rows"]} rows per list, best of {options["repeat"]}; '
+            f'orjson {"installed" if fast_serializers.orjson else "not installed"}'
+        )
+        self.stdout.write(f'{"list":>8} {"path":>5} {"read":>9} {"serialize":>9} {"render":>9} {"total":>9} (us/row)')
+        for name, model, serializer_class, fast_class in (
+            ('tasks', Task, TaskSerializer, FastTaskSerializer),
+            ('projects', Project, ProjectSerializer, FastProjectSerializer),
+        ):
+            rows = min(model.objects.count(), options['rows'])
+
+            def drf_read():
+                return list(model.objects.all().for_list()[:options['rows']])
+
+            def fast_read():
+                return list(fast_class().values(model.objects.all())[:options['rows']])
+
+            # Each phase is timed on its own; serialize() of the fast path
+            # includes its many-to-many query, the DRF read its prefetches.
+            for path, read, serialize, renderer in (
+                ('drf', drf_read, lambda objs: serializer_class(objs, many=True).data, JSONRenderer()),
+                ('fast', fast_read, lambda objs: fast_class().serialize(objs), FastJSONRenderer()),
+            ):
+                objs = read()
+                data = serialize(objs)
+                timings = [
+                    self._best(read, options['repeat']),
+                    self._best(lambda: serialize(objs), options['repeat']),
+                    self._best(lambda: renderer.render(data), options['repeat']),
+                ]
+                per_row = [seconds * 1e6 / max(rows, 1) for seconds in timings]
+                self.stdout.write(
+                    f'{name:>8} {path:>5} ' + ' '.join(f'{value:>9.1f}' for value in per_row)
+                    + f' {sum(per_row):>9.1f}'
+                )
+
+    def _best(self, func, repeat):
+        best = None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
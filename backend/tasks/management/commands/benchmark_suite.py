@@ -0,0 +1,287 @@
+import asyncio
+import json
+import platform
+import random
+import sqlite3
+import time
+
+import aiohttp
+import django
+import socketio
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from tasks.benchmarking import (
+    auth_header, member_identities, queries_from_server_timing, running_server, summarize, throwaway_database,
+)
+from tasks.models import Project
+from tasks.synthetic import generate_dataset
+
+# scenario -> path; {project} is one of the requesting user's projects.
+ENDPOINTS = {
+    'tasks': '/api/tasks/?page_size=50',
+    'my_tasks': '/api/tasks/my_tasks/?page_size=50',
+    'projects': '/api/projects/?page_size=50',
+    'members': '/api/projects/{project}/members/',
+    'users': '/api/users/?page_size=50',
+}
+FANOUT = 'fanout'
+SCENARIOS = [*ENDPOINTS, FANOUT]
+
+# Compared with a baseline; the rest of each result is informational.
+LOWER_IS_BETTER = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+HIGHER_IS_BETTER = ('per_second',)
+# Below this many milliseconds latency differences are noise, not regressions.
+LATENCY_FLOOR_MS = 2
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the REST read endpoints and the Socket.IO notification fan-out against a uvicorn server '
+        'on a throwaway, seeded SQLite database; reports p50/p95/p99 latency, throughput and queries '
+        'per request, and saves or checks JSON baselines'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help='Scenario to run (repeatable; default: all)')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--projects', type=int, default=200)
+        parser.add_argument('--tasks', type=int, default=20000)
+        parser.add_argument('--skew', type=float, default=1.1, help='Dataset skew (see seed_benchmark)')
+        parser.add_argument('--clients', type=int, default=50, help='Concurrent REST clients')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per REST client')
+        parser.add_argument('--sockets', type=int, default=200,
+                            help='Socket.IO clients, all members of the largest project')
+        parser.add_argument('--events', type=int, default=20, help='Project updates fanned out to them')
+        parser.add_argument('--cache', action='store_true',
+                            help='Keep the response cache on (default: off, so every request does the work)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--save', metavar='PATH', help='Write the results to PATH as a JSON baseline')
+        parser.add_argument('--baseline', metavar='PATH',
+                            help='Compare with a saved baseline; exits non-zero on a regression')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative change against the baseline (default 0.25)')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+
+        scenarios = options['scenario'] or SCENARIOS
+        dataset = {name: options[name] for name in ('users', 'projects', 'tasks', 'skew', 'seed')}
+        with throwaway_database() as path:
+            generate_dataset(
+                users=options['users'], projects=options['projects'], tasks=options['tasks'],
+                seed=options['seed'], skew=options['skew'],
+            )
+            identities = member_identities(options['seed'])
+            audience = self._fanout_audience(options['sockets']) if FANOUT in scenarios else None
+            env = {'SERVER_TIMING': '1'}
+            if not options['cache']:
+                env['RESPONSE_CACHE_TIMEOUT'] = '0'
+            with running_server(path, **env) as (_, url):
+                results = asyncio.run(self._run(url, scenarios, identities, audience, options))
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(), 'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version, 'machine': platform.machine(),
+            },
+            'dataset': dataset,
+            'load': {name: options[name] for name in ('clients', 'requests', 'sockets', 'events', 'cache')},
+            'results': results,
+        }
+        if options['save']:
+            with open(options['save'], 'w') as file:
+                json.dump(report, file, indent=2)
+                file.write('\n')
+            self.stdout.write(f'Saved baseline to {options["save"]}')
+        if baseline is not None:
+            self._compare(baseline, report, options['tolerance'])
+
+    def _fanout_audience(self, count):
+        """(project id, owner's auth header, member auth headers) for the project with most members."""
+        if count <= 0:
+            return None
+        project = Project.objects.annotate(size=Count('members')).order_by('-size', 'pk').first()
+        if project is None:
+            return None
+        members = User.objects.filter(projects=project).order_by('pk')[:count]
+        return project.pk, auth_header(project.created_by), [auth_header(user) for user in members]
+
+    async def _run(self, url, scenarios, identities, audience, options):
+        connector = aiohttp.TCPConnector(limit=max(options['clients'], 10))
+        timeout = aiohttp.ClientTimeout(total=300)
+        results = {}
+        async with aiohttp.ClientSession(url, connector=connector, timeout=timeout) as session:
+            self.stdout.write(
+                f'{"scenario":>10} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8} errors'
+            )
+            for name in scenarios:
+                if name == FANOUT:
+                    if audience is None:
+                        continue
+                    results[name] = await self._fanout(session, url, audience, options['events'])
+                else:
+                    path = ENDPOINTS[name]
+                    # Each scenario draws the same requests whichever others run.
+                    rng = random.Random(f'{options["seed"]}:{name}')
+                    await self._warm_up(session, path, identities, options['clients'])
+                    results[name] = await self._load(
+                        session, path, identities, rng, options['clients'], options['requests'],
+                    )
+                self._report(name, results[name])
+        return results
+
+    async def _warm_up(self, session, path, identities, clients):
+        """
+        One request per identity, so connections, the verified-token cache and
+        the server's code paths are warm and queries per request are steady.
+        """
+        pending = list(identities)
+
+        async def client():
+            while pending:
+                headers, project_id = pending.pop()
+                try:
+                    async with session.get(path.format(project=project_id), headers=headers) as response:
+                        await response.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+
+        await asyncio.gather(*(client() for _ in range(clients)))
+
+    async def _load(self, session, path, identities, rng, clients, requests):
+        latencies, queries, errors = [], [], 0
+
+        async def client():
+            nonlocal errors
+            for _ in range(requests):
+                headers, project_id = rng.choice(identities)
+                started = time.perf_counter()
+                try:
+                    async with session.get(path.format(project=project_id), headers=headers) as response:
+                        await response.read()
+                        ok = response.status == 200
+                        count = queries_from_server_timing(response.headers.get('Server-Timing'))
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if count is not None:
+                        queries.append(count)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return summarize(latencies, errors, time.perf_counter() - started, queries)
+
+    async def _fanout(self, session, url, audience, events):
+        """
+        Update the project `events` times, one at a time, and time each
+        notification from the start of the PATCH to its arrival at every
+        member's socket. The summary counts deliveries as requests; missing
+        ones count as errors.
+        """
+        project_id, owner_headers, member_headers = audience
+        received = []
+        current = {'event': None, 'started': 0}
+        arrived = asyncio.Event()
+        expected = 0
+
+        def handler(data):
+            if data.get('type') == 'PROJECT_UPDATED' and data.get('data', {}).get('project_id') == project_id:
+                if current['event'] is not None:
+                    received.append((time.perf_counter() - current['started']) * 1000)
+                    if len(received) >= expected:
+                        arrived.set()
+
+        clients = []
+        connect_limit = asyncio.Semaphore(50)
+
+        async def connect(headers):
+            client = socketio.AsyncClient(reconnection=False)
+            client.on('notification', handler)
+            async with connect_limit:
+                try:
+                    await client.connect(
+                        url, auth={'token': headers['Authorization'].split()[1]}, transports=['websocket'],
+                    )
+                except socketio.exceptions.ConnectionError:
+                    return
+            clients.append(client)
+
+        await asyncio.gather(*(connect(headers) for headers in member_headers))
+        latencies, queries, errors = [], [], len(member_headers) - len(clients)
+        started = time.perf_counter()
+        try:
+            for event in range(events):
+                received.clear()
+                arrived.clear()
+                expected = len(clients)
+                current['event'], current['started'] = event, time.perf_counter()
+                async with session.patch(
+                    f'/api/projects/{project_id}/', json={'description': f'fan-out {event}'}, headers=owner_headers,
+                ) as response:
+                    await response.read()
+                    if response.status != 200:
+                        raise CommandError(f'Updating project {project_id} failed: HTTP {response.status}')
+                    count = queries_from_server_timing(response.headers.get('Server-Timing'))
+                    if count is not None:
+                        queries.append(count)
+                try:
+                    await asyncio.wait_for(arrived.wait(), timeout=10)
+                except asyncio.TimeoutError:
+                    pass
+                current['event'] = None
+                latencies += received
+                errors += expected - len(received)
+        finally:
+            await asyncio.gather(*(client.disconnect() for client in clients), return_exceptions=True)
+        summary = summarize(latencies, errors, time.perf_counter() - started, queries)
+        summary['sockets'] = len(clients)
+        return summary
+
+    def _report(self, name, result):
+        def value(key, spec):
+            return 'n/a'.rjust(8) if result[key] is None else format(result[key], spec)
+        self.stdout.write(
+            f'{name:>10} {result["per_second"]:>8.0f} {value("p50_ms", ">8.1f")} {value("p95_ms", ">8.1f")} '
+            f'{value("p99_ms", ">8.1f")} {value("queries_per_request", ">8.1f")} {result["errors"]}'
+        )
+
+    def _compare(self, baseline, report, tolerance):
+        regressions = []
+        for name, result in report['results'].items():
+            before = baseline.get('results', {}).get(name)
+            if before is None:
+                continue
+            for key in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+                old, new = before.get(key), result.get(key)
+                if old is None or new is None:
+                    continue
+                if key in LOWER_IS_BETTER:
+                    slack = old * tolerance
+                    if key.endswith('_ms'):
+                        slack = max(slack, LATENCY_FLOOR_MS)
+                    worse = new > old + slack
+                else:
+                    worse = new < old * (1 - tolerance)
+                if worse:
+                    regressions.append(f'{name} {key}: {old} -> {new}')
+            if result['errors'] > before.get('errors', 0):
+                regressions.append(f'{name} errors: {before.get("errors", 0)} -> {result["errors"]}')
+        if baseline.get('dataset') != report['dataset'] or baseline.get('load') != report['load']:
+            self.stderr.write('Warning: the baseline was recorded with a different dataset or load')
+        if regressions:
+            for line in regressions:
+                self.stderr.write(f'Regression: {line}')
+            raise CommandError(f'{len(regressions)} regressions against {len(baseline.get("results", {}))} '
+                               f'baseline scenarios (tolerance {tolerance:.0%})')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,68 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from tasks.models import Task
+from tasks.synthetic import generate_dataset
+from tasks.visibility import visible_tasks
+
+
+def legacy_visible_tasks(user):
+    return (
+        Task.objects.filter(assignees=user)
+        | Task.objects.filter(created_by=user)
+        | Task.objects.filter(project__members=user)
+    ).distinct()
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the task visibility filter against the legacy OR + DISTINCT query on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--projects', type=int, default=1000)
+        parser.add_argument('--tasks', type=int, default=100000)
+        parser.add_argument('--samples', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, options):
+        started = time.perf_counter()
+        summary = generate_dataset(
+            users=options['users'], projects=options['projects'],
+            tasks=options['tasks'], seed=options['seed'],
+        )
+        self.stdout.write(
+            f"Seeded {summary['users']} users, {summary['projects']} projects, "
+            f"{summary['tasks']} tasks in {time.perf_counter() - started:.1f}s"
+        )
+
+        user_ids = list(User.objects.values_list('id', flat=True))
+        sample = random.Random(options['seed']).sample(user_ids, min(options['samples'], len(user_ids)))
+        users = list(User.objects.filter(id__in=sample))
+
+        for label, build in (('legacy OR + DISTINCT', legacy_visible_tasks), ('visibility', visible_tasks)):
+            timings = []
+            rows = 0
+            for user in users:
+                queryset = build(user).order_by('-created_at').values_list('id', flat=True)
+                t0 = time.perf_counter()
+                rows += len(list(queryset))
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+            self.stdout.write(
+                f'{label:>22}: median {statistics.median(timings):.2f} ms, '
+                f'p95 {p95:.2f} ms, {rows / len(users):.0f} rows/user'
+            )
@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.importer import IMPORT_CHUNK_SIZE, IMPORT_FORMATS, import_tasks
+
+
+class Command(BaseCommand):
+    help = 'Imports tasks from a CSV or JSON file (array or one object per line) as the given user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username the tasks are created by')
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help='Input format; defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing')
+        parser.add_argument('--show-errors', type=int, default=20, help='Row errors to print')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+        fmt = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if fmt in ('ndjson', 'jsonl'):
+            fmt = 'json'
+        if fmt not in IMPORT_FORMATS:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        started = time.perf_counter()
+        with open(options['path'], 'rb') as file:
+            result = import_tasks(
+                user, file, fmt, chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+            )
+        elapsed = time.perf_counter() - started
+
+        for error in result.errors[:options['show_errors']]:
+            messages = '; '.join(f'{field}: {" ".join(errors)}' for field, errors in error['errors'].items())
+            self.stderr.write(f'row {error["row"]}: {messages}')
+        rows = result.created + result.error_count
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.created} tasks, {result.error_count} rows rejected '
+            f'({rows / elapsed if elapsed else 0:.0f} rows/s)'
+        ))
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import resource
+import time
+from datetime import datetime
+
+import aiohttp
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tasks.benchmarking import (
+    auth_header, percentile, process_cpu_seconds, process_rss, running_server, throwaway_database,
+)
+from tasks.models import Project
+
+
+class SocketClient:
+    """
+    Just enough of the Engine.IO 4 / Socket.IO 5 protocol over a websocket
+    to authenticate, answer pings and record notifications. Far lighter than
+    socketio.AsyncClient (its own HTTP session and tasks per client), so one
+    process can hold thousands of connections.
+    """
+
+    def __init__(self, session, url, token):
+        self.session = session
+        self.url = url.replace('http', 'ws', 1) + '/socket.io/?EIO=4&transport=websocket'
+        self.token = token
+        self.ws = None
+        # (arrival time, project id, notification timestamp)
+        self.received = []
+        self.closed_by_server = False
+
+    async def connect(self):
+        self.ws = await self.session.ws_connect(self.url, autoping=False, max_msg_size=0)
+        message = await self.ws.receive_str()
+        if not message.startswith('0'):
+            raise ConnectionError(f'Unexpected Engine.IO open packet: {message[:60]}')
+        await self.ws.send_str('40' + json.dumps({'token': self.token}))
+        while True:
+            message = await self.ws.receive_str()
+            if message == '2':
+                await self.ws.send_str('3')
+            elif message.startswith('40'):
+                return
+            else:
+                raise ConnectionError(f'Socket.IO connect refused: {message[:60]}')
+
+    async def listen(self):
+        async for message in self.ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            data = message.data
+            if data == '2':
+                await self.ws.send_str('3')
+            elif data.startswith('42'):
+                now = time.perf_counter()
+                event, payload = json.loads(data[2:])[:2]
+                if event == 'notification' and payload.get('type') == 'PROJECT_UPDATED':
+                    self.received.append((now, payload['data']['project_id'], payload['timestamp']))
+        self.closed_by_server = True
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Opens many authenticated Socket.IO clients against a uvicorn server on a throwaway SQLite '
+        'database, updates projects they are all members of, and reports notification delivery '
+        'latency, missed deliveries, server memory per socket and CPU (Linux)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=1000, help='Clients, one user each')
+        parser.add_argument('--projects', type=int, default=1,
+                            help='Projects every client user is a member of; events rotate over them')
+        parser.add_argument('--events', type=int, default=50, help='Project updates to send')
+        parser.add_argument('--rate', type=float, default=5.0, help='Updates per second (open loop)')
+        parser.add_argument('--connect-concurrency', type=int, default=100,
+                            help='Clients connecting at the same time')
+        parser.add_argument('--timeout', type=float, default=30,
+                            help='Seconds to wait for stragglers after the last update')
+        parser.add_argument('--output', metavar='PATH', help='Also write the results to PATH as JSON')
+
+    def handle(self, *args, **options):
+        self._raise_fd_limit(options['sockets'])
+        with throwaway_database() as path:
+            owner, project_ids, tokens = self._seed(options['sockets'], options['projects'])
+            with running_server(path, RESPONSE_CACHE_TIMEOUT='0') as (server, url):
+                results = asyncio.run(self._run(server.pid, url, owner, project_ids, tokens, options))
+        self._report(results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+                file.write('\n')
+
+    def _raise_fd_limit(self, sockets):
+        # Client and server share the box: two descriptors per connection.
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = 2 * sockets + 1024
+        if soft < wanted and soft != resource.RLIM_INFINITY:
+            new_soft = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+            if new_soft < wanted:
+                self.stderr.write(
+                    f'Warning: the open file limit ({hard}) is too low for {sockets} sockets; '
+                    'raise `ulimit -n`'
+                )
+
+    def _seed(self, sockets, projects):
+        """Users for every socket, plus an owner, all members of `projects` projects."""
+        users = User.objects.bulk_create(User(username=f'load{i}', password='!') for i in range(sockets + 1))
+        owner, members = users[0], users[1:]
+        rows = Project.objects.bulk_create(
+            Project(name=f'Load test {i}', created_by=owner) for i in range(projects)
+        )
+        Membership = Project.members.through
+        Membership.objects.bulk_create(
+            (Membership(project_id=project.pk, user_id=user.pk) for project in rows for user in users),
+            batch_size=5000,
+        )
+        tokens = [str(AccessToken.for_user(user)) for user in members]
+        return owner, [project.pk for project in rows], tokens
+
+    async def _run(self, pid, url, owner, project_ids, tokens, options):
+        connector = aiohttp.TCPConnector(limit=0)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30)
+        results = {'sockets': len(tokens), 'projects': len(project_ids), 'events': options['events'],
+                   'rate': options['rate']}
+        async with aiohttp.ClientSession(url, connector=connector, timeout=timeout) as session:
+            # Warm the server up before taking the idle memory reading.
+            async with session.get(f'/api/projects/{project_ids[0]}/', headers=auth_header(owner)) as response:
+                await response.read()
+            idle_rss = process_rss(pid)
+
+            clients, failures = await self._connect(session, url, tokens, options['connect_concurrency'])
+            await asyncio.sleep(1)
+            connected_rss = process_rss(pid)
+            results['connected'] = len(clients)
+            results['connect_failures'] = failures
+            if idle_rss is not None and connected_rss is not None:
+                results['server_rss_idle_mb'] = round(idle_rss / 2 ** 20, 1)
+                results['server_rss_connected_mb'] = round(connected_rss / 2 ** 20, 1)
+                results['server_kb_per_socket'] = (
+                    round((connected_rss - idle_rss) / 1024 / len(clients), 1) if clients else None
+                )
+            listeners = [asyncio.ensure_future(client.listen()) for client in clients]
+
+            cpu_before, client_cpu_before, started = process_cpu_seconds(pid), time.process_time(), time.perf_counter()
+            sent = await self._fire(session, owner, project_ids, options)
+            await self._wait_for_delivery(clients, sent, options['timeout'])
+            elapsed = time.perf_counter() - started
+            cpu_after = process_cpu_seconds(pid)
+            results['server_rss_peak_mb'] = round((process_rss(pid) or 0) / 2 ** 20, 1)
+            if cpu_before is not None and cpu_after is not None:
+                results['server_cpu_seconds'] = round(cpu_after - cpu_before, 2)
+                results['server_cpu_percent'] = round(100 * (cpu_after - cpu_before) / elapsed, 1)
+            results['client_cpu_percent'] = round(100 * (time.process_time() - client_cpu_before) / elapsed, 1)
+
+            results.update(self._deliveries(clients, sent, elapsed))
+            await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+            for listener in listeners:
+                listener.cancel()
+        return results
+
+    async def _connect(self, session, url, tokens, concurrency):
+        limit = asyncio.Semaphore(concurrency)
+        clients, failures = [], 0
+
+        async def connect(token):
+            nonlocal failures
+            client = SocketClient(session, url, token)
+            async with limit:
+                try:
+                    await asyncio.wait_for(client.connect(), timeout=30)
+                except (aiohttp.ClientError, ConnectionError, asyncio.TimeoutError, TypeError):
+                    failures += 1
+                    await client.close()
+                    return
+            clients.append(client)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect(token) for token in tokens))
+        self.stdout.write(f'Connected {len(clients)} sockets in {time.perf_counter() - started:.1f}s '
+                          f'({failures} failed)')
+        return clients, failures
+
+    async def _fire(self, session, owner, project_ids, options):
+        """
+        Send the updates on an open-loop schedule; returns, per event, (project
+        id, send time, the updated_at the server stored).
+        """
+        headers = auth_header(owner)
+        interval = 1 / options['rate'] if options['rate'] > 0 else 0
+        start = time.perf_counter()
+
+        async def update(event):
+            await asyncio.sleep(max(0, start + event * interval - time.perf_counter()))
+            project_id = project_ids[event % len(project_ids)]
+            sent = time.perf_counter()
+            async with session.patch(
+                f'/api/projects/{project_id}/', json={'description': f'load test {event}'}, headers=headers,
+            ) as response:
+                body = await response.json()
+                if response.status != 200:
+                    raise CommandError(f'Updating project {project_id} failed: HTTP {response.status}')
+            return project_id, sent, datetime.fromisoformat(body['updated_at'])
+
+        return await asyncio.gather(*(update(event) for event in range(options['events'])))
+
+    async def _wait_for_delivery(self, clients, sent, timeout):
+        """Until every client has seen the last update of every project, or `timeout` seconds."""
+        latest = {}
+        for project_id, _, updated_at in sent:
+            latest[project_id] = max(updated_at, latest.get(project_id, updated_at))
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if all(self._covered(client, latest) for client in clients):
+                return
+            await asyncio.sleep(0.1)
+
+    def _covered(self, client, latest):
+        seen = {}
+        for _, project_id, stamp in client.received:
+            stamp = datetime.fromisoformat(stamp)
+            seen[project_id] = max(stamp, seen.get(project_id, stamp))
+        return all(project_id in seen and seen[project_id] >= stamp for project_id, stamp in latest.items())
+
+    def _deliveries(self, clients, sent, elapsed):
+        """
+        Latency from each update's request to the first notification on each
+        socket that reflects it. Notifications carry the project's updated_at,
+        so one that the dispatcher coalesced from several updates delivers
+        all of them. Updates a socket never saw count as missed.
+        """
+        latencies, missed = [], 0
+        for client in clients:
+            arrivals = {}
+            for arrived, project_id, stamp in client.received:
+                arrivals.setdefault(project_id, []).append((arrived, datetime.fromisoformat(stamp)))
+            for project_id, sent_at, updated_at in sent:
+                arrival = next(
+                    (arrived for arrived, stamp in arrivals.get(project_id, ()) if stamp >= updated_at), None,
+                )
+                if arrival is None:
+                    missed += 1
+                else:
+                    latencies.append((arrival - sent_at) * 1000)
+        latencies.sort()
+        expected = len(clients) * len(sent)
+        summary = {
+            'expected_deliveries': expected,
+            'delivered': len(latencies),
+            'missed': missed,
+            'disconnected_by_server': sum(client.closed_by_server for client in clients),
+            'notifications_received': sum(len(client.received) for client in clients),
+            'deliveries_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        }
+        for name, fraction in (('p50_ms', 0.5), ('p90_ms', 0.9), ('p95_ms', 0.95), ('p99_ms', 0.99),
+                               ('max_ms', 1.0)):
+            summary[name] = round(percentile(latencies, fraction), 1) if latencies else None
+        return summary
+
+    def _report(self, results):
+        for key, value in results.items():
+            self.stdout.write(f'{key:>24}: {value}')
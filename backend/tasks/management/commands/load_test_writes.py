@@ -0,0 +1,118 @@
+import copy
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+
+from tasks.models import Task
+from tasks.synthetic import generate_dataset
+
+PROFILE_KEYS = ('OPTIONS', 'CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')
+# What settings.py used to hardcode: no PRAGMAs, no pool, a new connection per request.
+BASELINE = {'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures concurrent task-update throughput on a throwaway database, '
+        'for the baseline and the configured (DB_*) database profile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--updates', type=int, default=200, help='Updates per thread')
+        parser.add_argument('--tasks', type=int, default=2000)
+        parser.add_argument(
+            '--profile', action='append', choices=['baseline', 'configured'],
+            help='Profile to run (repeatable; default: both)',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        configured = {key: copy.deepcopy(settings_dict[key]) for key in PROFILE_KEYS}
+        old_name = settings_dict['NAME']
+        old_test_name = settings_dict['TEST'].get('NAME')
+        tmpdir = None
+        if connection.vendor == 'sqlite':
+            # The default in-memory test database would hide file locking.
+            tmpdir = tempfile.mkdtemp()
+            settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'load_test.sqlite3')
+
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            generate_dataset(users=200, projects=50, tasks=options['tasks'], seed=options['seed'])
+            task_ids = list(Task.objects.values_list('id', flat=True))
+            for profile in options['profile'] or ['baseline', 'configured']:
+                self._apply(settings_dict, BASELINE if profile == 'baseline' else configured)
+                self._report(profile, self._run(task_ids, options))
+        finally:
+            self._apply(settings_dict, configured)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            settings_dict['TEST']['NAME'] = old_test_name
+            if tmpdir:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _apply(self, settings_dict, profile):
+        connections.close_all()
+        settings_dict.update(copy.deepcopy(profile))
+        if connection.vendor == 'sqlite' and 'init_command' not in profile['OPTIONS']:
+            # journal_mode is stored in the file, so undo an earlier WAL run.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=DELETE')
+            connection.close()
+
+    def _run(self, task_ids, options):
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local_latencies, local_errors = [], 0
+            try:
+                for _ in range(options['updates']):
+                    t0 = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            task = Task.objects.select_for_update().get(pk=rng.choice(task_ids))
+                            task.status = rng.choice(['TODO', 'IN_PROGRESS', 'DONE'])
+                            task.save()
+                    except OperationalError:
+                        local_errors += 1
+                    else:
+                        local_latencies.append((time.perf_counter() - t0) * 1000)
+                    # End of "request": honours CONN_MAX_AGE / returns pooled connections.
+                    close_old_connections()
+            finally:
+                connections.close_all()
+                with lock:
+                    latencies.extend(local_latencies)
+                    errors.append(local_errors)
+
+        threads = [
+            threading.Thread(target=worker, args=(options['seed'] + i,)) for i in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, sum(errors), time.perf_counter() - started
+
+    def _report(self, profile, result):
+        latencies, errors, elapsed = result
+        latencies.sort()
+        if not latencies:
+            self.stdout.write(f'{profile:>10}: no successful updates, {errors} errors')
+            return
+        p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+        self.stdout.write(
+            f'{profile:>10}: {len(latencies) / elapsed:.0f} updates/s, '
+            f'median {statistics.median(latencies):.2f} ms, p95 {p95:.2f} ms, {errors} errors'
+        )
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.sync import SYNC_RETENTION_DAYS, prune_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes delta-sync change-log rows older than the retention period; clients holding older '
+        'tokens are told to reload (run it daily, e.g. from cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=getattr(settings, 'SYNC_RETENTION_DAYS', SYNC_RETENTION_DAYS),
+                            help='Keep this many days of changes (default SYNC_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change-log rows'))
@@ -0,0 +1,46 @@
+import asyncio
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.deadlines import deadline_windows, scan_deadlines
+from tasks.notifications import build_notifications, user_room
+from tasks.socket_managers import get_client_manager
+
+
+class Command(BaseCommand):
+    help = 'Sends deadline reminders for open tasks due within the configured windows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, action='append', dest='windows',
+                            help='Window in minutes (repeatable); defaults to DEADLINE_WINDOWS_MINUTES')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not settings.SOCKETIO_MESSAGE_QUEUE:
+            self.stderr.write(self.style.WARNING(
+                'SOCKETIO_MESSAGE_QUEUE is not set: reminders are recorded but cannot '
+                'reach sockets held by the server process.'
+            ))
+        windows = options['windows'] or deadline_windows()
+        sent = asyncio.run(self._scan(windows, options['chunk_size']))
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} deadline reminders'))
+
+    async def _scan(self, windows, chunk_size):
+        # A write-only manager publishes to the workers' message queue
+        # without accepting connections of its own.
+        manager = get_client_manager(write_only=True)
+
+        async def emit(built):
+            for user_ids, payload in built:
+                rooms = [user_room(user_id) for user_id in set(user_ids)]
+                if rooms:
+                    await manager.emit('notification', payload, namespace='/', room=rooms)
+
+        def send(events):
+            async_to_sync(emit)(build_notifications(events, coalesce=True))
+
+        return await sync_to_async(scan_deadlines, thread_sensitive=False)(
+            send=send, windows=windows, chunk_size=chunk_size,
+        )
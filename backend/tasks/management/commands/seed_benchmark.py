@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds the configured database with synthetic users, projects, memberships, tasks and '
+        'assignees (usernames bench<seed>_user<n>), with long-tailed volumes by default'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--projects', type=int, default=1000)
+        parser.add_argument('--tasks', type=int, default=100000)
+        parser.add_argument('--members-per-project', type=int, default=10, help='Average members per project')
+        parser.add_argument('--assignees-per-task', type=int, default=2, help='Average assignees per task')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent for user activity and project size (0 = uniform)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed; also names the rows, so each seed can be loaded once')
+        parser.add_argument('--password',
+                            help='Give every seeded user this password (default: unusable; tokens only)')
+
+    def handle(self, *args, **options):
+        prefix = f'bench{options["seed"]}_'
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Users named {prefix}* already exist; pass another --seed')
+
+        started = time.perf_counter()
+        summary = generate_dataset(
+            users=options['users'], projects=options['projects'], tasks=options['tasks'],
+            members_per_project=options['members_per_project'],
+            assignees_per_task=options['assignees_per_task'],
+            seed=options['seed'], skew=options['skew'],
+        )
+        if options['password']:
+            # One hash for everyone: hashing per user would take minutes.
+            User.objects.filter(username__startswith=prefix).update(password=make_password(options['password']))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {summary['users']} users, {summary['projects']} projects, "
+            f"{summary['memberships']} memberships, {summary['tasks']} tasks and "
+            f"{summary['assignments']} assignments in {elapsed:.1f}s"
+        ))
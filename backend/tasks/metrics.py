@@ -0,0 +1,384 @@
+"""
+Request and Socket.IO performance metrics.
+
+RequestMetricsMiddleware times every request. Three hooks feed it:
+- an execute wrapper installed on each database connection adds the query
+  count and SQL time;
+- `timed('serialize')` around serializer work adds the serializer time;
+- the span between the view returning and the middleware seeing the
+  response is the render time.
+
+Each request then gets:
+- a Server-Timing header, which browsers show in their network panel;
+- samples in per-view histograms;
+- past SLOW_REQUEST_MS, a warning on the 'tasks.performance' logger with
+  the request's SQL statements.
+
+`/metrics` serves the histograms, together with the Socket.IO metrics that
+notifications.py and outbound.py register, in the Prometheus text format.
+
+Metrics live in the process that recorded them, so scrape every worker.
+"""
+import bisect
+import contextvars
+import ipaddress
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger('tasks.performance')
+
+SLOW_REQUEST_MS = 500
+# A slow request's log lists at most this many of its statements.
+SLOW_REQUEST_MAX_QUERIES = 100
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, tuple(zip(self.labels, key)), value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            labels = tuple(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', labels + (('le', bound),), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+class Gauge:
+    """
+    A value read from `function()` at scrape time; `type='counter'` exposes
+    a count kept elsewhere as a counter.
+    """
+
+    def __init__(self, name, help, function, type='gauge'):
+        self.name = name
+        self.help = help
+        self.function = function
+        self.type = type
+        REGISTRY.append(self)
+
+    def samples(self):
+        yield self.name, (), self.function()
+
+
+class RateWindow:
+    """Events per second over the last `window` seconds."""
+
+    def __init__(self, window=60):
+        self.window = window
+        self._seconds = deque()
+        self._lock = threading.Lock()
+
+    def add(self, count=1):
+        second = int(time.monotonic())
+        with self._lock:
+            if self._seconds and self._seconds[-1][0] == second:
+                self._seconds[-1][1] += count
+            else:
+                self._seconds.append([second, count])
+            self._trim(second)
+
+    def rate(self):
+        with self._lock:
+            self._trim(int(time.monotonic()))
+            return sum(count for _, count in self._seconds) / self.window
+
+    def _trim(self, second):
+        while self._seconds and self._seconds[0][0] <= second - self.window:
+            self._seconds.popleft()
+
+
+REGISTRY = []
+
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests', ['view', 'method', 'status'])
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time to produce the response', LATENCY_BUCKETS, ['view', 'method'],
+)
+QUERY_COUNT = Histogram('http_request_db_queries', 'SQL queries per request', QUERY_COUNT_BUCKETS, ['view'])
+QUERY_DURATION = Histogram('http_request_db_seconds', 'SQL time per request', LATENCY_BUCKETS, ['view'])
+SERIALIZE_DURATION = Histogram(
+    'http_request_serialize_seconds', 'Serializer time per request, SQL excluded', LATENCY_BUCKETS, ['view'],
+)
+RENDER_DURATION = Histogram('http_request_render_seconds', 'Response rendering time', LATENCY_BUCKETS, ['view'])
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size', SIZE_BUCKETS, ['view'])
+
+SOCKET_EMITS = Counter('socketio_emits_total', 'Socket.IO notification emits', ['type'])
+SOCKET_EMIT_DURATION = Histogram(
+    'socketio_emit_duration_seconds',
+    'Time for one notification emit to queue its packet for every recipient; '
+    'socketio_outbound_delivery_seconds times the sockets taking it',
+    LATENCY_BUCKETS,
+)
+socket_emit_rate = RateWindow()
+Gauge('socketio_emits_per_second', 'Socket.IO emits per second over the last minute', socket_emit_rate.rate)
+
+
+def record_emit(event_type, seconds):
+    """Count one Socket.IO emit that took `seconds`."""
+    SOCKET_EMITS.inc(type=event_type or 'unknown')
+    SOCKET_EMIT_DURATION.observe(seconds)
+    socket_emit_rate.add()
+
+
+class RequestMetrics:
+    """What one request spent where; the current one is in a context variable."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_finished = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = []
+        self.phases = {}
+        self._open = set()
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.db_time += seconds
+        if len(self.statements) < SLOW_REQUEST_MAX_QUERIES:
+            self.statements.append((sql, seconds))
+
+    def add_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0) + seconds
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to the current request's `phase`.
+
+    SQL run inside the block is already counted as db time, so it is
+    subtracted. Nested blocks for the same phase count once. Also usable as
+    a decorator.
+    """
+    metrics = _current.get()
+    if metrics is None or phase in metrics._open:
+        yield
+        return
+    metrics._open.add(phase)
+    started, db_time = time.perf_counter(), metrics.db_time
+    try:
+        yield
+    finally:
+        metrics._open.discard(phase)
+        elapsed = time.perf_counter() - started - (metrics.db_time - db_time)
+        metrics.add_phase(phase, max(elapsed, 0))
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class RequestMetricsMiddleware:
+    """
+    Times each request (see the module docstring). Keep it first in
+    MIDDLEWARE so the total covers the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        # Called between the view returning and the response being rendered.
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_finished = time.perf_counter()
+        return response
+
+    def _finish(self, request, response, metrics):
+        finished = time.perf_counter()
+        total = finished - metrics.started
+        if metrics.view_finished is not None:
+            metrics.add_phase('render', finished - metrics.view_finished)
+        serialize = metrics.phases.get('serialize', 0)
+        render = metrics.phases.get('render', 0)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unresolved'
+        method = request.method if request.method in _METHODS else 'other'
+        size = None if response.streaming else len(response.content)
+
+        REQUESTS.inc(view=view, method=method, status=response.status_code)
+        REQUEST_DURATION.observe(total, view=view, method=method)
+        QUERY_COUNT.observe(metrics.queries, view=view)
+        QUERY_DURATION.observe(metrics.db_time, view=view)
+        SERIALIZE_DURATION.observe(serialize, view=view)
+        RENDER_DURATION.observe(render, view=view)
+        if size is not None:
+            RESPONSE_SIZE.observe(size, view=view)
+
+        if getattr(settings, 'SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+                f'serialize;dur={serialize * 1000:.1f}',
+                f'render;dur={render * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+
+        threshold = getattr(settings, 'SLOW_REQUEST_MS', SLOW_REQUEST_MS)
+        if threshold and total * 1000 >= threshold:
+            statements = [f'  {seconds * 1000:8.1f} ms  {sql}' for sql, seconds in metrics.statements]
+            if metrics.queries > len(metrics.statements):
+                statements.append(f'  ... and {metrics.queries - len(metrics.statements)} more')
+            logger.warning(
+                'Slow request: %s %s (%s) -> %s in %.0f ms; %d queries in %.0f ms, serialize %.0f ms, '
+                'render %.0f ms, %s bytes%s',
+                request.method, request.get_full_path(), view, response.status_code, total * 1000,
+                metrics.queries, metrics.db_time * 1000, serialize * 1000, render * 1000,
+                'streamed' if size is None else size, ''.join(f'\n{line}' for line in statements),
+            )
+        return response
+
+
+def _internal_client(request):
+    # REMOTE_ADDR is the proxy's address behind a reverse proxy, so deployments
+    # behind one set METRICS_TOKEN.
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return address.is_loopback or address.is_private
+
+
+def metrics_view(request):
+    """
+    `GET /metrics` for Prometheus. With settings.METRICS_TOKEN set, scrapers
+    must send it as a bearer token; without it, only loopback and private
+    network clients are served.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    elif not _internal_client(request):
+        return HttpResponse('Forbidden: set METRICS_TOKEN to scrape from outside\n', status=403,
+                            content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+# The auto-created M2M through tables only carry a unique (owner_id, user_id)
+# index, which serves lookups from the task/project side. Visibility filters go
+# the other way ("which tasks/projects is this user on?"), so add the reverse
+# composite as a covering index for those subqueries.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_project_due_date_project_priority_project_start_date_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS tasks_task_assignees_user_task_idx '
+            'ON tasks_task_assignees (user_id, task_id)',
+            reverse_sql='DROP INDEX IF EXISTS tasks_task_assignees_user_task_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS tasks_project_members_user_project_idx '
+            'ON tasks_project_members (user_id, project_id)',
+            reverse_sql='DROP INDEX IF EXISTS tasks_project_members_user_project_idx',
+        ),
+    ]
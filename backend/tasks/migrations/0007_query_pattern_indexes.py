@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Composite indexes shaped after the hot queries: each leads with the column
+# the query pins (project, creator) and continues in list order (-created_at,
+# -id), so pages come straight off the index. They make the single-column FK
+# indexes redundant, and without ANALYZE statistics SQLite would keep picking
+# those instead, so the FK indexes are dropped. Dropping them by name rather
+# than with AlterField(db_index=False) avoids rebuilding both tables on SQLite.
+DROP_FK_INDEXES = [
+    ('tasks_project', 'tasks_project_created_by_id_91543690', 'created_by_id'),
+    ('tasks_task', 'tasks_task_created_by_id_1345568a', 'created_by_id'),
+    ('tasks_task', 'tasks_task_project_id_a2815f0c', 'project_id'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_changelog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='project_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', '-created_at', '-id'], name='task_project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'status', '-created_at', '-id'], name='task_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='task_creator_created_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='project',
+                    name='created_by',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='created_projects', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='task',
+                    name='created_by',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='created_tasks', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='task',
+                    name='project',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='tasks.project'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    f'DROP INDEX IF EXISTS {name}',
+                    reverse_sql=f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})',
+                )
+                for table, name, column in DROP_FK_INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,77 @@
+from django.db import migrations
+
+
+# Full-text indexes for /api/search/ (see tasks/search.py).
+#
+# SQLite: external-content FTS5 tables over tasks_task/tasks_project, kept in
+# step by triggers so bulk_create, bulk_update and queryset.update() are
+# covered too. A later migration that makes Django rebuild either table on
+# SQLite drops these triggers with it and has to recreate them.
+#
+# PostgreSQL: GIN indexes over the same weighted tsvector expressions that
+# tasks/search.py queries with; the two must stay textually identical.
+
+FTS5_TABLES = [
+    ('tasks_task', 'title'),
+    ('tasks_project', 'name'),
+]
+
+
+def fts5_sql(table, heading):
+    fts = f'{table}_fts'
+    columns = f'{heading}, description'
+    new_values = f'new.id, new.{heading}, new.description'
+    old_values = f"'delete', old.id, old.{heading}, old.description"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts}(rowid, {columns}) VALUES ({new_values}); END',
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN '
+        f'INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ({old_values}); END',
+        f'CREATE TRIGGER {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN '
+        f'INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ({old_values}); '
+        f'INSERT INTO {fts}(rowid, {columns}) VALUES ({new_values}); END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def tsvector_sql(heading):
+    return (
+        f"setweight(to_tsvector('simple', coalesce({heading}, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+    )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, heading in FTS5_TABLES:
+        if vendor == 'sqlite':
+            for statement in fts5_sql(table, heading):
+                schema_editor.execute(statement)
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE INDEX {table}_search_idx ON {table} USING GIN (({tsvector_sql(heading)}))'
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, _ in FTS5_TABLES:
+        if vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
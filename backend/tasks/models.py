@@ -1,6 +1,74 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 
+
+def _count_subquery(queryset, field):
+    """Correlated COUNT(*) of `queryset` rows whose `field` points at the outer row."""
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class ProjectQuerySet(models.QuerySet):
+    def for_list(self, fields=None):
+        """
+        Load everything ProjectSerializer renders in a fixed number of queries.
+
+        `fields` is the sparse fieldset requested by the client; related data
+        that will not be rendered is neither prefetched nor counted.
+        """
+        queryset = self.select_related('created_by').only(
+            'id', 'name', 'description', 'status', 'priority',
+            'start_date', 'due_date', 'created_at', 'updated_at',
+            'created_by__id', 'created_by__username',
+        )
+        if fields is None or 'members' in fields:
+            # Ordered so the fast serializers (fast_serializers.py) can match it.
+            queryset = queryset.prefetch_related(
+                Prefetch('members', queryset=User.objects.only('id').order_by('pk')),
+            )
+        return queryset.with_counts(fields)
+
+    def with_counts(self, fields=None):
+        """Annotate member_count and task_count, unless `fields` leaves them out."""
+        queryset = self
+        if fields is None or 'member_count' in fields:
+            queryset = queryset.annotate(
+                member_count=_count_subquery(Project.members.through.objects.all(), 'project_id'),
+            )
+        if fields is None or 'task_count' in fields:
+            queryset = queryset.annotate(
+                task_count=_count_subquery(Task.objects.all(), 'project_id'),
+            )
+        return queryset
+
+
+class TaskQuerySet(models.QuerySet):
+    def for_list(self, fields=None):
+        """Load everything TaskSerializer renders in a fixed number of queries."""
+        queryset = self.select_related('project', 'created_by').only(
+            'id', 'title', 'description', 'status', 'priority',
+            'created_at', 'updated_at', 'due_date',
+            'created_by__id', 'created_by__username',
+            'project__id', 'project__name',
+        )
+        if fields is None or fields & {'assignees', 'assignee_details'}:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'assignees',
+                    queryset=User.objects.only('id', 'username', 'email', 'first_name', 'last_name').order_by('pk'),
+                ),
+            )
+        return queryset
+
+
 class Project(models.Model):
     STATUS_CHOICES = [
         ('NOT_STARTED', 'Not Started'),
@@ -23,14 +91,21 @@ class Project(models.Model):
     due_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_projects')
+    # Indexed by project_creator_created_idx below, which leads with this column.
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_projects', db_index=False)
     members = models.ManyToManyField(User, related_name='projects', blank=True)
 
+    objects = ProjectQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # "Projects I created" in list order (visibility and keyset pages).
+            models.Index(fields=['created_by', '-created_at', '-id'], name='project_creator_created_idx'),
+        ]
 
 class Task(models.Model):
     STATUS_CHOICES = [
@@ -53,11 +128,67 @@ class Task(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     due_date = models.DateTimeField(null=True, blank=True)
     assignees = models.ManyToManyField(User, related_name='assigned_tasks', blank=True)
-    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_tasks')
-    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tasks', null=True, blank=True)
+    # Both FKs are indexed by the composites below, which lead with them.
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_tasks', db_index=False)
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name='tasks', null=True, blank=True, db_index=False,
+    )
+
+    objects = TaskQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A project's tasks (?project=, /projects/<id>/tasks/) and the same
+            # narrowed by ?status=, each in list order (-created_at, -id), so
+            # keyset pages are read straight off the index without a sort.
+            models.Index(fields=['project', '-created_at', '-id'], name='task_project_created_idx'),
+            models.Index(fields=['project', 'status', '-created_at', '-id'], name='task_project_status_idx'),
+            # "Tasks I created" in list order (visibility and keyset pages).
+            models.Index(fields=['created_by', '-created_at', '-id'], name='task_creator_created_idx'),
+            # Deadline scans only look at open tasks.
+            models.Index(fields=['due_date'], condition=~Q(status='DONE'), name='task_open_due_date_idx'),
+        ]
+
+
+class DeadlineReminder(models.Model):
+    """A deadline notification already sent for one task, window and due date."""
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='deadline_reminders')
+    window_minutes = models.PositiveIntegerField()
+    due_date = models.DateTimeField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.task_id} @ {self.window_minutes}m'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['task', 'window_minutes', 'due_date'], name='unique_deadline_reminder',
+            ),
+        ]
+
+
+class ChangeLog(models.Model):
+    """One row per write to a task or project; the latest id is the sync token."""
+    MODEL_CHOICES = [
+        ('task', 'Task'),
+        ('project', 'Project'),
+    ]
+
+    ACTION_CHOICES = [
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+        ('members', 'Members changed'),
+    ]
+
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default='upsert')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.action} {self.model} {self.object_id}'
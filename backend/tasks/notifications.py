@@ -1,41 +1,125 @@
-import socketio
 import asyncio
-import jwt
+import time
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+from .auth import aauthenticate_token
+from .metrics import Gauge, record_emit
 from .models import Task, Project
+from .outbound import BufferedAsyncServer
+from .socket_managers import get_client_manager
+from .sync import current_token
 
-# Create Socket.IO server with asyncio
-sio = socketio.AsyncServer(
+TASK_ASSIGNED = 'TASK_ASSIGNED'
+TASK_UPDATED = 'TASK_UPDATED'
+PROJECT_UPDATED = 'PROJECT_UPDATED'
+DEADLINE = 'DEADLINE'
+
+def _replaces_pending(event, payload):
+    """A newer update to the same task or project supersedes one still queued for a socket."""
+    if event != 'notification' or not isinstance(payload, dict):
+        return None
+    data = payload.get('data') or {}
+    if payload.get('type') == TASK_UPDATED and 'task_id' in data:
+        return TASK_UPDATED, data['task_id']
+    if payload.get('type') == PROJECT_UPDATED:
+        return PROJECT_UPDATED, data.get('project_id')
+    return None
+
+# Create Socket.IO server with asyncio; emits go through bounded per-socket
+# queues (see outbound.py)
+sio = BufferedAsyncServer(
+    client_manager=get_client_manager(),
     cors_allowed_origins=['http://localhost:5173', 'http://127.0.0.1:5173'],  # Match Vite's default dev server URLs
     async_mode='asgi',
-    logger=True,
-    engineio_logger=True
+    max_queue=getattr(settings, 'SOCKETIO_OUTBOUND_QUEUE_SIZE', 100),
+    send_timeout=getattr(settings, 'SOCKETIO_SEND_TIMEOUT', 15),
+    coalesce=_replaces_pending,
 )
 
+class SessionRegistry:
+    """
+    Tracks which Socket.IO sids belong to which user.
+
+    Both directions are indexed so connect and disconnect are O(1), and a user
+    entry is dropped as soon as its last socket goes away, so memory is bounded
+    by the number of live connections rather than by uptime.
+    """
+
+    def __init__(self):
+        self._sids_by_user = {}
+        self._user_by_sid = {}
+        self.connects = 0
+        self.disconnects = 0
+
+    def add(self, sid, user_id):
+        self.remove(sid)
+        self._user_by_sid[sid] = user_id
+        self._sids_by_user.setdefault(user_id, set()).add(sid)
+        self.connects += 1
+
+    def remove(self, sid):
+        """Forget `sid`; returns the user it belonged to, or None."""
+        user_id = self._user_by_sid.pop(sid, None)
+        if user_id is None:
+            return None
+        sids = self._sids_by_user[user_id]
+        sids.discard(sid)
+        if not sids:
+            del self._sids_by_user[user_id]
+        self.disconnects += 1
+        return user_id
+
+    def user_for(self, sid):
+        return self._user_by_sid.get(sid)
+
+    def sids_for(self, user_id):
+        return set(self._sids_by_user.get(user_id, ()))
+
+    def is_online(self, user_id):
+        return user_id in self._sids_by_user
+
+    @property
+    def active_users(self):
+        return len(self._sids_by_user)
+
+    @property
+    def active_sockets(self):
+        return len(self._user_by_sid)
+
+
+def user_room(user_id):
+    return f'user:{user_id}'
+
+
 # Client sessions storage
-sessions = {}
+sessions = SessionRegistry()
+
+# Socket.IO gauges for /metrics (see metrics.py)
+Gauge('socketio_connected_sockets', 'Connected Socket.IO clients', lambda: sessions.active_sockets)
+Gauge('socketio_connected_users', 'Users with at least one connected client', lambda: sessions.active_users)
+Gauge('socketio_connects_total', 'Socket.IO connections accepted', lambda: sessions.connects, type='counter')
+Gauge('socketio_disconnects_total', 'Socket.IO disconnections', lambda: sessions.disconnects, type='counter')
+Gauge('socketio_outbound_queued_packets', 'Packets waiting in outbound queues', lambda: sum(sio.outbound_depths()))
+Gauge('socketio_outbound_queue_max_depth', 'Deepest outbound queue', lambda: max(sio.outbound_depths(), default=0))
 
 @sio.event
-async def connect(sid, environ):
+async def connect(sid, environ, auth=None):
     try:
-        auth = environ.get('HTTP_AUTHORIZATION', '') or environ.get('QUERY_STRING', '')
-        if 'auth' in environ:
-            auth_data = environ['auth']
-            if isinstance(auth_data, dict) and 'token' in auth_data:
-                token = auth_data['token']
-                try:
-                    # Verify and decode the JWT token
-                    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-                    user_id = payload.get('user_id')
-                    
-                    if user_id:
-                        # Store the user's session
-                        if user_id not in sessions:
-                            sessions[user_id] = set()
-                        sessions[user_id].add(sid)
-                        return True
-                except jwt.InvalidTokenError:
-                    return False
+        # The client sends its JWT in the Socket.IO handshake `auth` payload.
+        if auth is None:
+            auth = environ.get('auth')
+        if isinstance(auth, dict) and isinstance(auth.get('token'), str):
+            try:
+                # Same checks (and verified-token cache) as the REST API
+                user, _ = await aauthenticate_token(auth['token'])
+            except AuthenticationFailed:
+                return False
+            # Store the user's session and join their personal room
+            sessions.add(sid, user.pk)
+            await sio.enter_room(sid, user_room(user.pk))
+            return True
         return False
     except Exception as e:
         print(f"Connection error: {str(e)}")
@@ -43,102 +127,203 @@ async def connect(sid, environ):
 
 @sio.event
 async def disconnect(sid):
-    if sid in sessions:
-        del sessions[sid]
+    # Socket.IO drops the sid from its rooms itself.
+    sessions.remove(sid)
 
 def get_user_sids(user_id):
-    return list(sessions.get(user_id, set()))
+    return list(sessions.sids_for(user_id))
 
 async def notify_users(user_ids, notification_data):
-    for user_id in user_ids:
-        sids = get_user_sids(user_id)
-        tasks = [sio.emit('notification', notification_data, room=sid) for sid in sids]
-        if tasks:
-            await asyncio.gather(*tasks)
+    rooms = [user_room(user_id) for user_id in set(user_ids)]
+    if rooms:
+        # One emit: the packet is encoded once and queued for every socket in
+        # the rooms. This times the queuing; outbound.py times the delivery.
+        started = time.perf_counter()
+        await sio.emit('notification', notification_data, room=rooms)
+        record_emit(notification_data.get('type'), time.perf_counter() - started)
 
-async def notify_task_assigned(task_id, assigned_by_id):
-    try:
-        task = Task.objects.select_related('project').get(id=task_id)
-        assignee_ids = list(task.assignees.values_list('id', flat=True))
-        
-        notification_data = {
-            'id': f'task_assigned_{task_id}_{assigned_by_id}',
-            'type': 'TASK_ASSIGNED',
-            'message': f'You have been assigned to task: {task.title}',
-            'timestamp': task.updated_at.isoformat(),
-            'data': {
-                'task_id': task_id,
-                'project_id': task.project_id if task.project else None
-            },
-            'read': False
-        }
-        
-        await notify_users(assignee_ids, notification_data)
-    except Task.DoesNotExist:
-        pass
+def _task_notification(event_type, task, actor_id):
+    if event_type == TASK_ASSIGNED:
+        message = f'You have been assigned to task: {task["title"]}'
+        notification_id = f'task_assigned_{task["id"]}_{actor_id}'
+    elif event_type == TASK_UPDATED:
+        message = f'Task updated: {task["title"]}'
+        notification_id = f'task_updated_{task["id"]}_{actor_id}'
+    else:
+        message = f'Deadline approaching for task: {task["title"]}'
+        notification_id = f'deadline_{task["id"]}'
+    data = {
+        'task_id': task['id'],
+        'project_id': task['project_id']
+    }
+    if event_type == DEADLINE:
+        data['due_date'] = task['due_date'].isoformat() if task['due_date'] else None
+    return {
+        'id': notification_id,
+        'type': event_type,
+        'message': message,
+        'timestamp': task['updated_at'].isoformat(),
+        'data': data,
+        'read': False
+    }
 
-async def notify_task_updated(task_id, updated_by_id):
+def _task_recipients(event_type, task):
+    user_ids = list(task['assignee_ids'])
+    if event_type == TASK_UPDATED and task['created_by_id'] not in user_ids:
+        user_ids.append(task['created_by_id'])
+    return user_ids
+
+def _digest_notification(event_type, project_id, project_name, tasks):
+    count = len(tasks)
+    where = f' in {project_name}' if project_name else ''
+    if event_type == TASK_ASSIGNED:
+        message = f'You have been assigned to {count} tasks{where}'
+    elif event_type == TASK_UPDATED:
+        message = f'{count} tasks updated{where}'
+    else:
+        message = f'Deadlines approaching for {count} tasks{where}'
+    task_ids = sorted(task['id'] for task in tasks)
+    return {
+        'id': f'{event_type.lower()}_digest_{project_id}_{task_ids[0]}_{task_ids[-1]}_{count}',
+        'type': event_type,
+        'message': message,
+        'timestamp': max(task['updated_at'] for task in tasks).isoformat(),
+        'data': {
+            'project_id': project_id,
+            'task_ids': task_ids,
+            'count': count
+        },
+        'read': False
+    }
+
+def _coalesce(entries):
+    """
+    Collapse each user's notifications per (event type, project).
+
+    Repeated events for the same task or project keep only the latest one;
+    when several distinct tasks remain, the user gets a single digest
+    ("5 tasks updated in Project X") instead. Users ending up with identical
+    payloads share one emit.
+    """
+    per_user = {}
+    for user_ids, payload, group, item_id, task in entries:
+        for user_id in user_ids:
+            per_user.setdefault(user_id, {}).setdefault(group, {})[item_id] = (payload, task)
+
+    outgoing = {}
+    for user_id, groups in per_user.items():
+        for group, items in groups.items():
+            if len(items) == 1:
+                (payload, _), = items.values()
+                key = id(payload)
+                if key not in outgoing:
+                    outgoing[key] = (payload, [])
+            else:
+                key = (group, tuple(sorted(items)))
+                if key not in outgoing:
+                    event_type, project_id, project_name = group
+                    tasks = [task for _, task in items.values()]
+                    outgoing[key] = (_digest_notification(event_type, project_id, project_name, tasks), [])
+            outgoing[key][1].append(user_id)
+    return [(user_ids, payload) for payload, user_ids in outgoing.values()]
+
+def build_notifications(events, coalesce=False):
+    """
+    Turn (event_type, object_id, actor_id) tuples into (user_ids, payload) pairs.
+
+    Tasks and projects referenced by the whole batch are loaded together, one
+    query per model, with their recipients joined in; events for rows that no
+    longer exist are skipped. With `coalesce`, bursts are folded into
+    per-user digests (see `_coalesce`). Every payload carries the current
+    delta-sync token as `sync_token`.
+    """
+    task_ids = {object_id for event_type, object_id, _ in events if event_type != PROJECT_UPDATED}
+    project_ids = {object_id for event_type, object_id, _ in events if event_type == PROJECT_UPDATED}
+
+    tasks = {}
+    if task_ids:
+        rows = Task.objects.filter(id__in=task_ids).order_by().values(
+            'id', 'title', 'updated_at', 'due_date', 'project_id', 'project__name',
+            'created_by_id', 'assignees__id'
+        )
+        for row in rows:
+            task = tasks.setdefault(row['id'], dict(row, assignee_ids=[]))
+            if row['assignees__id'] is not None:
+                task['assignee_ids'].append(row['assignees__id'])
+
+    projects = {}
+    if project_ids:
+        rows = Project.objects.filter(id__in=project_ids).order_by().values(
+            'id', 'name', 'updated_at', 'members__id'
+        )
+        for row in rows:
+            project = projects.setdefault(row['id'], dict(row, member_ids=[]))
+            if row['members__id'] is not None:
+                project['member_ids'].append(row['members__id'])
+
+    entries = []
+    for event_type, object_id, actor_id in events:
+        if event_type == PROJECT_UPDATED:
+            project = projects.get(object_id)
+            if project is None:
+                continue
+            entries.append((project['member_ids'], {
+                'id': f'project_updated_{object_id}_{actor_id}',
+                'type': PROJECT_UPDATED,
+                'message': f'Project updated: {project["name"]}',
+                'timestamp': project['updated_at'].isoformat(),
+                'data': {
+                    'project_id': object_id
+                },
+                'read': False
+            }, (PROJECT_UPDATED, object_id, project['name']), object_id, None))
+        else:
+            task = tasks.get(object_id)
+            if task is None:
+                continue
+            entries.append((
+                _task_recipients(event_type, task),
+                _task_notification(event_type, task, actor_id),
+                (event_type, task['project_id'], task['project__name']),
+                object_id,
+                task,
+            ))
+
+    if coalesce:
+        built = _coalesce(entries)
+    else:
+        built = [(user_ids, payload) for user_ids, payload, _, _, _ in entries]
+    if built:
+        # Lets clients pull /api/sync/ deltas instead of reloading whole lists.
+        token = current_token()
+        for _, payload in built:
+            payload['sync_token'] = token
+    return built
+
+def _build_notifications_in_thread(events, coalesce):
+    close_old_connections()
     try:
-        task = Task.objects.select_related('project').get(id=task_id)
-        user_ids = list(task.assignees.values_list('id', flat=True))
-        if task.created_by_id not in user_ids:
-            user_ids.append(task.created_by_id)
-            
-        notification_data = {
-            'id': f'task_updated_{task_id}_{updated_by_id}',
-            'type': 'TASK_UPDATED',
-            'message': f'Task updated: {task.title}',
-            'timestamp': task.updated_at.isoformat(),
-            'data': {
-                'task_id': task_id,
-                'project_id': task.project_id if task.project else None
-            },
-            'read': False
-        }
-        
+        return build_notifications(events, coalesce=coalesce)
+    finally:
+        close_old_connections()
+
+async def abuild_notifications(events, coalesce=False):
+    """`build_notifications` on a worker thread, so the ORM never blocks the event loop."""
+    return await sync_to_async(_build_notifications_in_thread, thread_sensitive=False)(events, coalesce)
+
+async def notify_events(events, coalesce=True):
+    for user_ids, notification_data in await abuild_notifications(events, coalesce=coalesce):
         await notify_users(user_ids, notification_data)
-    except Task.DoesNotExist:
-        pass
+
+async def notify_task_assigned(task_id, assigned_by_id):
+    await notify_events([(TASK_ASSIGNED, task_id, assigned_by_id)])
+
+async def notify_task_updated(task_id, updated_by_id):
+    await notify_events([(TASK_UPDATED, task_id, updated_by_id)])
 
 async def notify_project_updated(project_id, updated_by_id):
-    try:
-        project = Project.objects.get(id=project_id)
-        member_ids = list(project.members.values_list('id', flat=True))
-        
-        notification_data = {
-            'id': f'project_updated_{project_id}_{updated_by_id}',
-            'type': 'PROJECT_UPDATED',
-            'message': f'Project updated: {project.name}',
-            'timestamp': project.updated_at.isoformat(),
-            'data': {
-                'project_id': project_id
-            },
-            'read': False
-        }
-        
-        await notify_users(member_ids, notification_data)
-    except Project.DoesNotExist:
-        pass
+    await notify_events([(PROJECT_UPDATED, project_id, updated_by_id)])
 
 async def notify_deadline_approaching(task_id):
     """Send notification when a task deadline is approaching"""
-    try:
-        task = Task.objects.select_related('project').get(id=task_id)
-        user_ids = list(task.assignees.values_list('id', flat=True))
-        
-        notification_data = {
-            'id': f'deadline_{task_id}',
-            'type': 'DEADLINE',
-            'message': f'Deadline approaching for task: {task.title}',
-            'timestamp': task.updated_at.isoformat(),
-            'data': {
-                'task_id': task_id,
-                'project_id': task.project_id if task.project else None,
-                'due_date': task.due_date.isoformat() if task.due_date else None
-            },
-            'read': False
-        }
-        
-        await notify_users(user_ids, notification_data)
-    except Task.DoesNotExist:
-        pass
\ No newline at end of file
+    await notify_events([(DEADLINE, task_id, None)])
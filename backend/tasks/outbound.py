@@ -0,0 +1,181 @@
+"""
+Bounded per-socket outbound queues for Socket.IO.
+
+Engine.IO gives each connection an unbounded queue that a writer task drains
+into the websocket, so a client that stops reading makes every emit pile up
+in server memory. BufferedAsyncServer puts a bounded queue of its own in
+front of it. An emit only appends to each recipient's queue; a sender task,
+started while a socket has packets waiting, hands them to Engine.IO one batch
+at a time and waits for the writer to take a batch before handing over the
+next. While a client is slow, its packets wait in the bounded queue, where:
+- a packet the `coalesce` function gives a key replaces the pending packet
+  with the same key (e.g. a newer TASK_UPDATED for the same task);
+- past `max_queue` pending packets the oldest one is dropped;
+- a writer that has not taken a batch within `send_timeout` seconds gets
+  its socket disconnected.
+
+Healthy clients never wait on a slow one: no emit awaits a socket write.
+
+This hooks into python-socketio and python-engineio internals (the
+per-recipient `_send_eio_packet`, `_handle_eio_disconnect`, the Engine.IO
+socket's queue and `close(reason=)`); requirements.txt pins the releases
+they exist in and OutboundHooksTests fails if they go away.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+
+import socketio
+from engineio import packet as eio_packet
+
+from .metrics import LATENCY_BUCKETS, Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+DEPTH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+OUTBOUND_PACKETS = Counter(
+    'socketio_outbound_packets_total', 'Socket.IO packets sent, coalesced or dropped by outbound queues',
+    ['outcome'],
+)
+OUTBOUND_BATCH = Histogram(
+    'socketio_outbound_queue_depth', 'Packets waiting in a socket\'s outbound queue when it was flushed',
+    DEPTH_BUCKETS,
+)
+OUTBOUND_DELIVERY = Histogram(
+    'socketio_outbound_delivery_seconds',
+    'Time from a packet being queued to the socket\'s writer taking it (oldest packet of each batch)',
+    LATENCY_BUCKETS,
+)
+SLOW_CONSUMER_DISCONNECTS = Counter(
+    'socketio_slow_consumer_disconnects_total', 'Sockets disconnected for not reading their outbound queue',
+)
+
+
+class OutboundQueue:
+    """Packets waiting for one socket, oldest first."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._packets = {}
+        self._sequence = itertools.count()
+        self.sender = None
+        # perf_counter() when the oldest pending packet was queued.
+        self.oldest = None
+
+    def __len__(self):
+        return len(self._packets)
+
+    def put(self, pkt, key=None):
+        """
+        Queue `pkt`, replacing a pending packet with the same `key`; returns
+        'coalesced', 'dropped' (the oldest packet made room) or None.
+        """
+        if key is None:
+            key = next(self._sequence)
+        elif self._packets.pop(key, None) is not None:
+            self._packets[key] = pkt
+            return 'coalesced'
+        outcome = None
+        if not self._packets:
+            self.oldest = time.perf_counter()
+        if len(self._packets) >= self.max_size:
+            del self._packets[next(iter(self._packets))]
+            outcome = 'dropped'
+        self._packets[key] = pkt
+        return outcome
+
+    def take(self):
+        """Every pending packet, oldest first; the queue is left empty."""
+        packets = list(self._packets.values())
+        self._packets.clear()
+        self.oldest = None
+        return packets
+
+
+class BufferedAsyncServer(socketio.AsyncServer):
+    """
+    socketio.AsyncServer whose emits go through bounded per-socket queues.
+
+    `coalesce(event, data)` returns the key under which a newer event
+    replaces a pending one, or None to always deliver it.
+    """
+
+    def __init__(self, *args, max_queue=100, send_timeout=15, coalesce=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.coalesce = coalesce
+        self._outbound = {}
+        # An emit hands one packet object to every recipient in turn, so
+        # its key is worked out once.
+        self._last_packet = None
+        self._last_key = None
+
+    def outbound_depths(self):
+        return [len(queue) for queue in self._outbound.values()]
+
+    async def _send_eio_packet(self, eio_sid, eio_pkt):
+        socket = self.eio.sockets.get(eio_sid)
+        if socket is None or socket.closed:
+            return
+        queue = self._outbound.get(eio_sid)
+        if queue is None:
+            queue = self._outbound[eio_sid] = OutboundQueue(self.max_queue)
+        outcome = queue.put(eio_pkt, self._coalesce_key(eio_pkt))
+        if outcome is not None:
+            OUTBOUND_PACKETS.inc(outcome=outcome)
+        if queue.sender is None:
+            queue.sender = asyncio.ensure_future(self._send_queued(eio_sid, socket, queue))
+
+    def _coalesce_key(self, eio_pkt):
+        if self.coalesce is None:
+            return None
+        if eio_pkt is not self._last_packet:
+            self._last_packet, self._last_key = eio_pkt, self._decode_key(eio_pkt)
+        return self._last_key
+
+    def _decode_key(self, eio_pkt):
+        data = eio_pkt.data
+        # Only plain text events ('2[...]' or '2/namespace,[...]') are keyed.
+        if eio_pkt.packet_type != eio_packet.MESSAGE or not isinstance(data, str) or not data.startswith('2'):
+            return None
+        start = data.find('[')
+        try:
+            event, *args = json.loads(data[start:])
+        except ValueError:
+            return None
+        key = self.coalesce(event, args[0] if args else None)
+        return None if key is None else (data[1:start], key)
+
+    async def _send_queued(self, eio_sid, socket, queue):
+        try:
+            while len(queue) and not socket.closed:
+                queued_at = queue.oldest
+                packets = queue.take()
+                OUTBOUND_BATCH.observe(len(packets))
+                OUTBOUND_PACKETS.inc(len(packets), outcome='sent')
+                for pkt in packets:
+                    await socket.send(pkt)
+                try:
+                    # Engine.IO's writer marks packets done as it takes them.
+                    await asyncio.wait_for(socket.queue.join(), self.send_timeout)
+                    OUTBOUND_DELIVERY.observe(time.perf_counter() - queued_at)
+                except asyncio.TimeoutError:
+                    if not socket.closed:
+                        SLOW_CONSUMER_DISCONNECTS.inc()
+                        logger.warning('Disconnecting Socket.IO client %s: nothing read for %ss',
+                                       eio_sid, self.send_timeout)
+                        # Without waiting for its queue, which it is not reading.
+                        await socket.close(wait=False, abort=True, reason=self.eio.reason.SERVER_DISCONNECT)
+                    break
+        finally:
+            queue.sender = None
+
+    async def _handle_eio_disconnect(self, eio_sid, *args):
+        queue = self._outbound.pop(eio_sid, None)
+        if queue is not None:
+            queue.take()
+        await super()._handle_eio_disconnect(eio_sid, *args)
@@ -0,0 +1,91 @@
+"""
+Cached and conditional list responses.
+
+List endpoints keep their serialized response data under a key made of a
+versioned scope (see cache.py) and the request URL, so a hit costs a couple
+of cache reads and no queries or serializer work. Entries live in the
+'responses' cache, a bounded LRU kept apart from the version counters so
+large payloads can never push those out.
+
+The same key doubles as a strong ETag: it changes whenever anything the body
+depends on does, so a matching If-None-Match is answered with a 304 before
+the cache or the database is consulted. That holds only as long as every
+write bumps the version of each list showing it, including names shown
+through a relation (signals.py); a missed bump is a false 304.
+"""
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+RESPONSE_CACHE = 'responses'
+
+
+def response_cache():
+    return caches[RESPONSE_CACHE if RESPONSE_CACHE in settings.CACHES else DEFAULT_CACHE_ALIAS]
+
+
+def response_key(scope, request):
+    # Absolute URL because paginated bodies carry an absolute `next` link.
+    url = request.build_absolute_uri(request.path)
+    raw = json.dumps([url, sorted(request.query_params.lists())])
+    return f'{scope}:{hashlib.sha256(raw.encode()).hexdigest()}'
+
+
+def response_etag(key, request):
+    # Each rendering (JSON, browsable API) of the same data is its own entity.
+    media_type = getattr(request, 'accepted_media_type', '')
+    return quote_etag(hashlib.sha256(f'{key}|{media_type}'.encode()).hexdigest()[:32])
+
+
+def not_modified(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def cached_response(request, scope, build):
+    """
+    Return a 304, the cached body for `request` under `scope`, or `build()`.
+
+    `scope` must be computed before `build()` runs: a write that commits in
+    between then bumps a version the new entry is already keyed on, so a
+    stale body can be stored but never served.
+    """
+    key = response_key(scope, request)
+    etag = response_etag(key, request)
+    if not_modified(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    cache = response_cache()
+    data = cache.get(key)
+    if data is not None:
+        return Response(data, headers={'ETag': etag})
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.data)
+        response['ETag'] = etag
+    return response
+
+
+async def acached_response(request, scope, build):
+    """cached_response() for async views; `build` is awaited and returns the body data."""
+    key = response_key(scope, request)
+    etag = response_etag(key, request)
+    if not_modified(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    # Not cache.aget()/aset(), which queue on the thread-sensitive thread.
+    cache = response_cache()
+    data = await sync_to_async(cache.get, thread_sensitive=False)(key)
+    if data is None:
+        data = await build()
+        await sync_to_async(cache.set, thread_sensitive=False)(key, data)
+    return Response(data, headers={'ETag': etag})
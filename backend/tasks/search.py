@@ -0,0 +1,95 @@
+"""
+Full-text search over tasks and projects.
+
+On SQLite the text lives in external-content FTS5 tables (tasks_task_fts,
+tasks_project_fts) that triggers keep in step with every write; on
+PostgreSQL it is a weighted tsvector expression with a GIN index, so there is
+nothing to sync. Both are created by migration 0008. Other backends fall back
+to unranked icontains scans.
+
+Every term of the query must match, each as a prefix, and hits are ranked
+with titles/names weighted above descriptions. The ranked match is
+intersected with the user's visibility subquery inside the same statement.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Task, Project
+from .visibility import visible_projects, visible_tasks
+
+MAX_TERMS = 8
+# Title/name hits count ten times a description hit.
+HEADING_WEIGHT = 10.0
+
+HEADINGS = {Task: 'title', Project: 'name'}
+
+_term_re = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """Words of `query`, lowercased; punctuation and FTS operators are dropped."""
+    return _term_re.findall(query.lower())[:MAX_TERMS]
+
+
+def _tsvector_sql(heading):
+    # Must match the GIN index expression in migration 0008 exactly.
+    return (
+        f"setweight(to_tsvector('simple', coalesce({heading}, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+    )
+
+
+def ranked_ids(model, visible, terms, limit):
+    """[(id, score)] of the best `limit` rows of `visible` matching `terms`, best first."""
+    table = model._meta.db_table
+    visible_sql, visible_params = visible.order_by().values('pk').query.sql_with_params()
+
+    if connection.vendor == 'sqlite':
+        fts = f'{table}_fts'
+        # The unary + keeps SQLite from pushing the IN list into the virtual
+        # table, which would rerun the MATCH once per visible id.
+        sql = (
+            f'SELECT rowid, -bm25({fts}, {HEADING_WEIGHT}, 1.0) AS score FROM {fts} '
+            f'WHERE {fts} MATCH %s AND +rowid IN ({visible_sql}) '
+            f'ORDER BY score DESC, rowid DESC LIMIT %s'
+        )
+        params = [' '.join(f'"{term}"*' for term in terms), *visible_params, limit]
+    elif connection.vendor == 'postgresql':
+        vector = _tsvector_sql(HEADINGS[model])
+        sql = (
+            f"SELECT id, ts_rank({vector}, query) AS score FROM {table}, to_tsquery('simple', %s) query "
+            f'WHERE {vector} @@ query AND id IN ({visible_sql}) '
+            f'ORDER BY score DESC, id DESC LIMIT %s'
+        )
+        params = [' & '.join(f'{term}:*' for term in terms), *visible_params, limit]
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(**{f'{HEADINGS[model]}__icontains': term}) | Q(description__icontains=term)
+        return [(pk, 0.0) for pk in visible.filter(condition).order_by('-pk').values_list('pk', flat=True)[:limit]]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search(user, query, limit=20, offset=0, types=('task', 'project')):
+    """
+    Ranked hits for `user` as (type, id, score), tasks and projects merged.
+
+    Returns up to `limit + 1` hits starting at `offset`, so callers can tell
+    whether another page follows.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    window = offset + limit + 1
+    hits = []
+    if 'task' in types:
+        hits += [('task', pk, score) for pk, score in ranked_ids(Task, visible_tasks(user), terms, window)]
+    if 'project' in types:
+        hits += [('project', pk, score) for pk, score in ranked_ids(Project, visible_projects(user), terms, window)]
+    hits.sort(key=lambda hit: (-hit[2], hit[0], -hit[1]))
+    return hits[offset:window]
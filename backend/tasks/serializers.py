@@ -1,7 +1,41 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from .metrics import timed
 from .models import Task, Project
 
+
+def requested_fields(request):
+    """Field names from a `?fields=a,b,c` query parameter, or None for all fields."""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """Drop fields the client did not ask for via `?fields=` on read requests."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+class TimedSerializerMixin:
+    """Count the time spent building `.data` as the request's serializer time (metrics.py)."""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     
@@ -17,12 +51,13 @@ class RegisterSerializer(serializers.ModelSerializer):
         )
         return user
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
+        list_serializer_class = TimedListSerializer
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     member_count = serializers.SerializerMethodField()
     task_count = serializers.SerializerMethodField()
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
@@ -36,14 +71,20 @@ class ProjectSerializer(serializers.ModelSerializer):
             'member_count', 'task_count'
         ]
         read_only_fields = ['created_at', 'updated_at', 'created_by']
+        list_serializer_class = TimedListSerializer
 
     def get_member_count(self, obj):
+        # Annotated by ProjectQuerySet.for_list(); fall back for bare instances.
+        if hasattr(obj, 'member_count'):
+            return obj.member_count
         return obj.members.count()
 
     def get_task_count(self, obj):
+        if hasattr(obj, 'task_count'):
+            return obj.task_count
         return obj.tasks.count()
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     project_name = serializers.CharField(source='project.name', read_only=True)
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     assignee_details = UserSerializer(source='assignees', many=True, read_only=True)
@@ -56,4 +97,23 @@ class TaskSerializer(serializers.ModelSerializer):
             'created_by', 'created_by_username', 'project', 'project_name',
             'assignee_details'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'created_by']
\ No newline at end of file
+        read_only_fields = ['created_at', 'updated_at', 'created_by']
+        list_serializer_class = TimedListSerializer
+
+class BulkTaskCreateSerializer(serializers.ModelSerializer):
+    # Plain ids: existence is checked for the whole batch at once by
+    # tasks.bulk instead of one query per related field per row.
+    project = serializers.IntegerField(required=False, allow_null=True)
+    assignees = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    class Meta:
+        model = Task
+        fields = ['title', 'description', 'status', 'priority', 'due_date', 'project', 'assignees']
+
+
+class BulkTaskUpdateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Task.PRIORITY_CHOICES, required=False)
+    project = serializers.IntegerField(required=False, allow_null=True)
+    assignees = serializers.ListField(child=serializers.IntegerField(), required=False)
@@ -0,0 +1,268 @@
+"""
+Model signal handlers that keep per-user and per-project caches honest and
+append to the delta-sync change log.
+
+Each handler works out which users could see the changed row (before and
+after the change) and which projects it belongs to, and bumps their cache
+versions once the surrounding transaction commits. Bulk queryset writes
+(`update()`, `bulk_create()`, `bulk_update()`) do not send these signals;
+code using them must call `bump_user_versions`/`bump_project_versions`
+and `record_changes` itself, and can wrap cascading deletes in
+`cache_signals_suppressed()` to skip the per-row work here.
+
+Saving or deleting a user, and blacklisting one of their tokens, drops that
+user's entries from the verified-token cache in auth.py. Changing the name
+or email that task and project lists show for a user also bumps everyone
+who shares a task or project with them.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .cache import bump_auth_versions, bump_project_versions, bump_user_versions
+from .models import Task, Project
+from .sync import record_changes
+from .visibility import (
+    project_audience, project_ids_for_member, task_audience, task_ids_for_assignee, tasks_audience,
+)
+
+# User fields that cached task and project lists show (UserSerializer).
+USER_DISPLAY_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+
+_suppressed = contextvars.ContextVar('cache_signals_suppressed', default=False)
+
+
+@contextmanager
+def cache_signals_suppressed():
+    """Disable these handlers; the caller takes over invalidation."""
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def _unless_suppressed(handler):
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not _suppressed.get():
+            handler(*args, **kwargs)
+    return wrapper
+
+
+def _bump_on_commit(user_ids, project_ids=()):
+    def bump():
+        bump_user_versions(user_ids)
+        bump_project_versions(project_ids)
+    if user_ids or project_ids:
+        transaction.on_commit(bump)
+
+
+@receiver(pre_save, sender=Task)
+@_unless_suppressed
+def remember_task_project(sender, instance, **kwargs):
+    instance._previous_project_id = None
+    if instance.pk:
+        instance._previous_project_id = (
+            Task.objects.filter(pk=instance.pk).values_list('project_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Task)
+@_unless_suppressed
+def task_saved(sender, instance, **kwargs):
+    user_ids = task_audience(instance)
+    previous_project_id = getattr(instance, '_previous_project_id', None)
+    if previous_project_id != instance.project_id:
+        user_ids |= project_audience(previous_project_id)
+    _bump_on_commit(user_ids, {instance.project_id, previous_project_id})
+
+
+@receiver(pre_delete, sender=Task)
+@_unless_suppressed
+def task_deleting(sender, instance, **kwargs):
+    # The assignee rows are gone by post_delete, so capture the audience now.
+    instance._audience = task_audience(instance)
+
+
+@receiver(post_delete, sender=Task)
+@_unless_suppressed
+def task_deleted(sender, instance, **kwargs):
+    _bump_on_commit(getattr(instance, '_audience', {instance.created_by_id}), {instance.project_id})
+
+
+@receiver(pre_save, sender=Project)
+@_unless_suppressed
+def remember_project_name(sender, instance, **kwargs):
+    instance._previous_name = None
+    if instance.pk:
+        instance._previous_name = Project.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Project)
+@_unless_suppressed
+def project_saved(sender, instance, created, **kwargs):
+    user_ids = project_audience(instance.pk)
+    if not created and getattr(instance, '_previous_name', instance.name) != instance.name:
+        # Task lists show the project's name, also to users who only see
+        # its tasks as their assignees or creators.
+        user_ids |= tasks_audience(Task.objects.filter(project_id=instance.pk).values('pk'))
+    _bump_on_commit(user_ids, {instance.pk})
+
+
+@receiver(pre_delete, sender=Project)
+@_unless_suppressed
+def project_deleting(sender, instance, **kwargs):
+    instance._audience = project_audience(instance.pk)
+
+
+@receiver(post_delete, sender=Project)
+@_unless_suppressed
+def project_deleted(sender, instance, **kwargs):
+    _bump_on_commit(getattr(instance, '_audience', {instance.created_by_id}), {instance.pk})
+
+
+@receiver(m2m_changed, sender=Task.assignees.through)
+@_unless_suppressed
+def task_assignees_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Task):
+        _bump_on_commit(task_audience(instance) | set(pk_set or ()), {instance.project_id})
+    else:
+        # Reverse side (user.assigned_tasks): refresh every task's audience.
+        # clear() sends no pk_set, so its tasks are read before they go.
+        if action == 'pre_clear':
+            tasks = instance.assigned_tasks.all()
+        else:
+            tasks = Task.objects.filter(pk__in=pk_set or ())
+        user_ids, project_ids = {instance.pk}, set()
+        for task in tasks.only('id', 'created_by_id', 'project_id'):
+            user_ids |= task_audience(task)
+            project_ids.add(task.project_id)
+        _bump_on_commit(user_ids, project_ids)
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+@_unless_suppressed
+def project_members_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Project):
+        _bump_on_commit(project_audience(instance.pk) | set(pk_set or ()), {instance.pk})
+    else:
+        if action == 'pre_clear':
+            pk_set = set(instance.projects.values_list('pk', flat=True))
+        user_ids = {instance.pk}
+        for project_id in pk_set or ():
+            user_ids |= project_audience(project_id)
+        _bump_on_commit(user_ids, set(pk_set or ()))
+
+
+# Change log for /api/sync/. Rows are written inside the transaction that
+# makes the change, so they commit (or roll back) together with it.
+
+@receiver(post_save, sender=Task)
+@_unless_suppressed
+def log_task_saved(sender, instance, **kwargs):
+    record_changes('task', [instance.pk])
+
+
+@receiver(post_delete, sender=Task)
+@_unless_suppressed
+def log_task_deleted(sender, instance, **kwargs):
+    record_changes('task', [instance.pk], 'delete')
+
+
+@receiver(post_save, sender=Project)
+@_unless_suppressed
+def log_project_saved(sender, instance, **kwargs):
+    record_changes('project', [instance.pk])
+
+
+@receiver(post_delete, sender=Project)
+@_unless_suppressed
+def log_project_deleted(sender, instance, **kwargs):
+    record_changes('project', [instance.pk], 'delete')
+
+
+@receiver(m2m_changed, sender=Task.assignees.through)
+@_unless_suppressed
+def log_task_assignees_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Task):
+        record_changes('task', [instance.pk])
+    elif action == 'pre_clear':
+        record_changes('task', instance.assigned_tasks.values_list('pk', flat=True))
+    else:
+        record_changes('task', pk_set or ())
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+@_unless_suppressed
+def log_project_members_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Project):
+        record_changes('project', [instance.pk], 'members')
+    elif action == 'pre_clear':
+        record_changes('project', instance.projects.values_list('pk', flat=True), 'members')
+    else:
+        record_changes('project', pk_set or (), 'members')
+
+
+# Verified-token cache (auth.py). Bumped after commit, so a request racing
+# the write cannot re-cache the user as it was before.
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: bump_auth_versions([user_id]))
+
+
+@receiver(pre_save, sender=User)
+@_unless_suppressed
+def remember_user_display(sender, instance, update_fields=None, **kwargs):
+    instance._previous_display = None
+    # Logins only save last_login.
+    if instance.pk and (update_fields is None or set(update_fields) & set(USER_DISPLAY_FIELDS)):
+        instance._previous_display = User.objects.filter(pk=instance.pk).values_list(
+            *USER_DISPLAY_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+@_unless_suppressed
+def user_display_changed(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_display', None)
+    if previous is None or previous == tuple(getattr(instance, field) for field in USER_DISPLAY_FIELDS):
+        return
+    # Everyone shown the user as a creator, assignee or member.
+    tasks = Task.objects.filter(Q(created_by_id=instance.pk) | Q(pk__in=task_ids_for_assignee(instance)))
+    project_ids = set(
+        Project.objects.filter(Q(created_by_id=instance.pk) | Q(pk__in=project_ids_for_member(instance)))
+        .values_list('pk', flat=True)
+    )
+    project_ids.update(tasks.exclude(project=None).values_list('project_id', flat=True))
+    user_ids = tasks_audience(tasks.values('pk')) | {instance.pk}
+    user_ids.update(
+        Project.members.through.objects.filter(project_id__in=project_ids).values_list('user_id', flat=True)
+    )
+    user_ids.update(Project.objects.filter(pk__in=project_ids).values_list('created_by_id', flat=True))
+    _bump_on_commit(user_ids, project_ids)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, **kwargs):
+    user_id = instance.token.user_id
+    if user_id is not None:
+        transaction.on_commit(lambda: bump_auth_versions([user_id]))
@@ -0,0 +1,112 @@
+"""
+Socket.IO client managers.
+
+With a single process the default in-memory manager is enough. As soon as
+several uvicorn workers serve sockets, an emit on one worker has to reach
+sockets held by the others, so the server is given a pub/sub client manager
+instead. The backend is chosen by the SOCKETIO_MESSAGE_QUEUE setting:
+
+    ''                      in-process only (default)
+    redis://host:port/db    socketio.AsyncRedisManager (needs `redis`)
+    amqp://user:pw@host/    socketio.AsyncAioPikaManager (needs `aio_pika`)
+    sqlite:///relative/path AsyncSQLiteManager, a broker-less backend for
+    sqlite:////abs/path     several workers on one machine and for tests
+"""
+import asyncio
+import pickle
+import sqlite3
+import time
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+
+class AsyncSQLiteManager(AsyncPubSubManager):
+    """
+    Pub/sub over a shared SQLite file.
+
+    Publishers append rows to a message table; every listener polls for rows
+    newer than the last one it has seen. WAL mode lets readers and the writer
+    proceed concurrently, and old rows are pruned after `retention` seconds.
+    """
+    name = 'sqlite'
+
+    def __init__(self, url='sqlite:///socketio.sqlite3', channel='socketio', write_only=False,
+                 logger=None, poll_interval=0.02, retention=60):
+        if not url.startswith('sqlite:///'):
+            raise ValueError(f'Not a sqlite:/// URL: {url}')
+        self.path = url[len('sqlite:///'):]
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._last_prune = 0
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._setup()
+
+    def _connect(self):
+        # The listener's connection is used from asyncio.to_thread() workers.
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _setup(self):
+        conn = self._connect()
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS socketio_messages ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, '
+                'payload BLOB NOT NULL, created REAL NOT NULL)'
+            )
+        finally:
+            conn.close()
+
+    def _write(self, payload):
+        conn = self._connect()
+        try:
+            now = time.time()
+            conn.execute(
+                'INSERT INTO socketio_messages (channel, payload, created) VALUES (?, ?, ?)',
+                (self.channel, payload, now),
+            )
+            if now - self._last_prune > self.retention:
+                self._last_prune = now
+                conn.execute('DELETE FROM socketio_messages WHERE created < ?', (now - self.retention,))
+        finally:
+            conn.close()
+
+    async def _publish(self, data):
+        await asyncio.to_thread(self._write, pickle.dumps(data))
+
+    async def _listen(self):
+        conn = self._connect()
+        try:
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM socketio_messages').fetchone()[0]
+            while True:
+                rows = await asyncio.to_thread(
+                    lambda: conn.execute(
+                        'SELECT id, payload FROM socketio_messages WHERE id > ? AND channel = ? ORDER BY id',
+                        (last_id, self.channel),
+                    ).fetchall()
+                )
+                for last_id, payload in rows:
+                    yield pickle.loads(payload)
+                if not rows:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            conn.close()
+
+
+def get_client_manager(url=None, write_only=False, channel='socketio'):
+    """Build the client manager for `url`, defaulting to SOCKETIO_MESSAGE_QUEUE."""
+    if url is None:
+        from django.conf import settings
+        url = getattr(settings, 'SOCKETIO_MESSAGE_QUEUE', '')
+    if not url:
+        return socketio.AsyncManager()
+    if url.startswith('sqlite://'):
+        return AsyncSQLiteManager(url, channel=channel, write_only=write_only)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return socketio.AsyncRedisManager(url, channel=channel, write_only=write_only)
+    if url.startswith(('amqp://', 'amqps://')):
+        return socketio.AsyncAioPikaManager(url, channel=channel, write_only=write_only)
+    raise ValueError(f'Unsupported SOCKETIO_MESSAGE_QUEUE: {url}')
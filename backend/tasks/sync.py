@@ -0,0 +1,134 @@
+"""
+Delta sync.
+
+Every write to a task or project appends a ChangeLog row, from the model
+signals in signals.py or explicitly from the bulk helpers. A client keeps
+the id of the newest row it has seen as an opaque token and asks for what
+changed after it. Visibility is evaluated when changes are read, so rows a
+user has lost access to come back as deletions, and a membership change
+resends (or withdraws) the whole project's tasks.
+
+A token must never skip past a row that commits later with a lower id, so
+log ids have to become visible in commit order. SQLite serialises writers,
+which gives that for free. PostgreSQL hands out sequence values before
+commit, so there `record_changes` first takes a transaction-scoped advisory
+lock: from its first change-log row to its commit, a write transaction holds
+the next ids to itself, and the writer after it draws larger ones. The lock
+and the insert share a transaction even in autocommit (a bare `save()`);
+the API's single-object writes run in one so their rows commit with them.
+
+Rows older than SYNC_RETENTION_DAYS are deleted by `prune_changes`
+(`manage.py prune_changelog`). A token from before the oldest row left gets
+`reset`, like a token from a replaced database.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .inserts import insert_rows
+from .models import ChangeLog, Task
+from .visibility import visible_projects, visible_tasks
+
+SYNC_PAGE_SIZE = 1000
+SYNC_RETENTION_DAYS = 30
+# pg_advisory_xact_lock key serialising change-log writers on PostgreSQL.
+CHANGELOG_LOCK_KEY = 0x5359_4e43
+
+
+def record_changes(model, object_ids, action='upsert'):
+    object_ids = sorted(set(object_ids) - {None})
+    if not object_ids:
+        return
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    # No savepoint: a failure here should fail the caller's transaction.
+    with transaction.atomic(savepoint=False):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CHANGELOG_LOCK_KEY])
+        insert_rows(ChangeLog, ['model', 'object_id', 'action', 'created_at'], [
+            (model, object_id, action, now) for object_id in object_ids
+        ])
+
+
+def prune_changes(days=None):
+    """
+    Delete change-log rows older than `days` (default SYNC_RETENTION_DAYS);
+    the newest row is always kept, so tokens stay comparable. Returns the
+    number of rows deleted.
+    """
+    if days is None:
+        days = getattr(settings, 'SYNC_RETENTION_DAYS', SYNC_RETENTION_DAYS)
+    latest = current_token()
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = ChangeLog.objects.filter(created_at__lt=cutoff, id__lt=latest).delete()
+    return deleted
+
+
+def current_token():
+    return ChangeLog.objects.aggregate(token=Max('id'))['token'] or 0
+
+
+def changes_since(user, since):
+    """
+    What changed for `user` after token `since`, at most SYNC_PAGE_SIZE log rows.
+
+    Returns a dict with the new `token`, `more` when the page was full, the
+    visible `tasks`/`projects` to send, and the `deleted_task_ids`
+    and `deleted_project_ids` to drop. `reset` is set instead when the token
+    is ahead of the log (e.g. the database was replaced) or older than the
+    rows it still holds (see `prune_changes`), and the client must reload
+    everything.
+    """
+    limit = getattr(settings, 'SYNC_PAGE_SIZE', SYNC_PAGE_SIZE)
+    bounds = ChangeLog.objects.aggregate(oldest=Min('id'), latest=Max('id'))
+    if bounds['oldest'] is not None and since < bounds['oldest'] - 1:
+        return {'token': bounds['latest'], 'reset': True}
+    entries = list(
+        ChangeLog.objects.filter(id__gt=since).order_by('id')
+        .values_list('id', 'model', 'object_id', 'action')[:limit]
+    )
+    if not entries:
+        token = current_token()
+        if since > token:
+            return {'token': token, 'reset': True}
+        return {
+            'token': since, 'more': False, 'tasks': [], 'projects': [],
+            'deleted_task_ids': [], 'deleted_project_ids': [],
+        }
+
+    changed = {'task': set(), 'project': set()}
+    touched = {'task': set(), 'project': set()}
+    member_changes = set()
+    for _, model, object_id, action in entries:
+        touched[model].add(object_id)
+        if action != 'delete':
+            changed[model].add(object_id)
+        if action == 'members':
+            member_changes.add(object_id)
+
+    # A membership change resends the project's tasks. They are selected by
+    # project rather than by id, so the query stays the same size however
+    # many tasks the project holds.
+    tasks = list(
+        visible_tasks(user).filter(Q(pk__in=changed['task']) | Q(project_id__in=member_changes)).for_list()
+    )
+    projects = list(visible_projects(user).filter(pk__in=changed['project']).for_list())
+    # Ids only: anything touched that the user cannot see (any more) is gone
+    # as far as they are concerned, whether or not they ever held it.
+    deleted_task_ids = touched['task'] - {task.pk for task in tasks}
+    if member_changes:
+        deleted_task_ids.update(
+            Task.objects.filter(project_id__in=member_changes)
+            .exclude(pk__in=visible_tasks(user).values('pk')).values_list('pk', flat=True)
+        )
+    return {
+        'token': entries[-1][0],
+        'more': len(entries) == limit,
+        'tasks': tasks,
+        'projects': projects,
+        'deleted_task_ids': sorted(deleted_task_ids),
+        'deleted_project_ids': sorted(touched['project'] - {project.pk for project in projects}),
+    }
@@ -0,0 +1,144 @@
+"""
+Synthetic dataset generation for benchmarks.
+
+Everything is written with bulk inserts (including the M2M through tables) so
+that datasets with hundreds of thousands of rows can be built in seconds.
+
+With `skew` > 0 the volumes follow the long tails real boards have, in place
+of uniform ones:
+- user activity and project size follow a Zipf law with that exponent, so a
+  few users sit in many projects and a few projects hold most of the tasks;
+- member counts are heavy-tailed around members_per_project;
+- assignee counts vary around assignees_per_task;
+- tasks are created by members of their project, and some have no project;
+- most tasks are done.
+"""
+import itertools
+import random
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Task, Project
+
+# Task status mix (TODO, IN_PROGRESS, DONE) and the share of tasks without a
+# project, for skewed datasets.
+SKEWED_STATUS_WEIGHTS = (30, 15, 55)
+SKEWED_UNFILED_SHARE = 0.05
+
+
+def _zipf_cum_weights(count, skew):
+    return list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def _weighted_sample(rng, population, cum_weights, k):
+    """`k` distinct items drawn by weight; the tail is filled uniformly if draws keep colliding."""
+    k = min(k, len(population))
+    chosen = set()
+    for _ in range(5):
+        if len(chosen) >= k:
+            break
+        chosen.update(rng.choices(population, cum_weights=cum_weights, k=k - len(chosen)))
+    if len(chosen) < k:
+        rest = [item for item in population if item not in chosen]
+        chosen.update(rng.sample(rest, k - len(chosen)))
+    return list(chosen)
+
+
+def generate_dataset(users=5000, projects=1000, tasks=100000, members_per_project=10,
+                     assignees_per_task=2, seed=0, batch_size=5000, skew=0):
+    rng = random.Random(seed)
+    prefix = f'bench{seed}_'
+    skewed = skew > 0
+
+    with transaction.atomic():
+        User.objects.bulk_create(
+            (User(username=f'{prefix}user{i}', password='!') for i in range(users)),
+            batch_size=batch_size,
+        )
+        user_ids = list(
+            User.objects.filter(username__startswith=prefix).values_list('id', flat=True)
+        )
+        if skewed:
+            # Popularity rank follows a shuffled order, not the id order.
+            rng.shuffle(user_ids)
+            user_weights = _zipf_cum_weights(len(user_ids), skew)
+
+        if skewed:
+            owners = rng.choices(user_ids, cum_weights=user_weights, k=projects)
+        else:
+            owners = [rng.choice(user_ids) for _ in range(projects)]
+        Project.objects.bulk_create(
+            (Project(name=f'{prefix}project{i}', created_by_id=owner) for i, owner in enumerate(owners)),
+            batch_size=batch_size,
+        )
+        project_rows = list(
+            Project.objects.filter(name__startswith=prefix).values_list('id', 'created_by_id')
+        )
+
+        Membership = Project.members.through
+        memberships = []
+        project_members = {}
+        for project_id, owner_id in project_rows:
+            if skewed:
+                # Pareto(1.5) has mean 3: sizes average members_per_project.
+                size = max(1, round(members_per_project * rng.paretovariate(1.5) / 3))
+                members = {owner_id, *_weighted_sample(rng, user_ids, user_weights, size)}
+            else:
+                members = {owner_id, *rng.sample(user_ids, min(members_per_project, len(user_ids)))}
+            project_members[project_id] = list(members)
+            memberships.extend(Membership(project_id=project_id, user_id=m) for m in members)
+        Membership.objects.bulk_create(memberships, batch_size=batch_size)
+
+        project_ids = [project_id for project_id, _ in project_rows]
+        if skewed:
+            rng.shuffle(project_ids)
+            project_weights = _zipf_cum_weights(len(project_ids), skew)
+
+        def task(i):
+            if not skewed:
+                return Task(
+                    title=f'{prefix}task{i}',
+                    status=rng.choice(Task.STATUS_CHOICES)[0],
+                    priority=rng.choice(Task.PRIORITY_CHOICES)[0],
+                    created_by_id=rng.choice(user_ids),
+                    project_id=rng.choice(project_rows)[0],
+                )
+            if rng.random() < SKEWED_UNFILED_SHARE:
+                project_id = None
+                created_by_id = rng.choices(user_ids, cum_weights=user_weights)[0]
+            else:
+                project_id = rng.choices(project_ids, cum_weights=project_weights)[0]
+                created_by_id = rng.choice(project_members[project_id])
+            return Task(
+                title=f'{prefix}task{i}',
+                status=rng.choices([value for value, _ in Task.STATUS_CHOICES], SKEWED_STATUS_WEIGHTS)[0],
+                priority=rng.choice(Task.PRIORITY_CHOICES)[0],
+                created_by_id=created_by_id,
+                project_id=project_id,
+            )
+
+        Task.objects.bulk_create((task(i) for i in range(tasks)), batch_size=batch_size)
+
+        Assignment = Task.assignees.through
+        assignments = []
+        assignment_count = 0
+        task_rows = Task.objects.filter(title__startswith=prefix).values_list('id', 'project_id', 'created_by_id')
+        for task_id, project_id, created_by_id in task_rows.iterator(chunk_size=batch_size):
+            candidates = project_members[project_id] if project_id is not None else [created_by_id]
+            count = rng.randint(0, 2 * assignees_per_task) if skewed else assignees_per_task
+            for user_id in rng.sample(candidates, min(count, len(candidates))):
+                assignments.append(Assignment(task_id=task_id, user_id=user_id))
+                assignment_count += 1
+            if len(assignments) >= batch_size:
+                Assignment.objects.bulk_create(assignments)
+                assignments = []
+        Assignment.objects.bulk_create(assignments)
+
+    return {
+        'users': len(user_ids),
+        'projects': len(project_rows),
+        'memberships': len(memberships),
+        'tasks': tasks,
+        'assignments': assignment_count,
+    }
@@ -1,3 +1,1444 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import inspect
+import json
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+from contextlib import closing
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import socketio
+import uvicorn
+from engineio import packet as eio_packet
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import auth
+from .auth import authenticate_token, token_cache
+from .bulk import bulk_update_tasks
+from .deadlines import DeadlineScheduler, due_tasks, scan_deadlines
+from .dispatch import NotificationDispatcher, enqueue
+from . import fast_serializers
+from .metrics import render_metrics
+from .models import ChangeLog, Task, Project
+from . import notifications
+from .notifications import (
+    DEADLINE, PROJECT_UPDATED, TASK_ASSIGNED, TASK_UPDATED, SessionRegistry, build_notifications, notify_users, sio,
+)
+from .outbound import BufferedAsyncServer
+from .socket_managers import AsyncSQLiteManager
+from .sync import current_token, record_changes
+from .visibility import visible_projects, visible_tasks
+
+
+def clear_caches():
+    # Ids are reused once a test's transaction rolls back, so cached bodies
+    # and version counters from an earlier test must not leak into the next.
+    for backend in caches.all():
+        backend.clear()
+
+
+class ListQueryCountTests(TestCase):
+    """List endpoints must issue the same number of queries regardless of row count."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('owner', 'owner@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _populate(self, count):
+        start = Project.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(start, start + count):
+                member = User.objects.create_user(f'member{i}')
+                project = Project.objects.create(name=f'Project {i}', created_by=self.user)
+                project.members.add(self.user, member)
+                task = Task.objects.create(title=f'Task {i}', created_by=self.user, project=project)
+                task.assignees.add(self.user, member)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_task_list_query_count_is_constant(self):
+        self._populate(2)
+        small, data = self._count_queries('/api/tasks/')
+        self.assertEqual(len(data), 2)
+        self._populate(10)
+        large, data = self._count_queries('/api/tasks/')
+        self.assertEqual(len(data), 12)
+        self.assertEqual(small, large)
+        self.assertEqual(len(data[0]['assignee_details']), 2)
+
+    def test_project_list_query_count_is_constant(self):
+        self._populate(2)
+        small, data = self._count_queries('/api/projects/')
+        self.assertEqual(len(data), 2)
+        self._populate(10)
+        large, data = self._count_queries('/api/projects/')
+        self.assertEqual(len(data), 12)
+        self.assertEqual(small, large)
+        self.assertEqual(data[0]['member_count'], 2)
+        self.assertEqual(data[0]['task_count'], 1)
+        self.assertEqual(data[0]['created_by_username'], 'owner')
+
+
+class VisibilityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('viewer')
+        self.other = User.objects.create_user('other')
+        self.project = Project.objects.create(name='Shared', created_by=self.other)
+        self.project.members.add(self.user, self.other)
+        self.private = Project.objects.create(name='Private', created_by=self.other)
+
+    def test_visible_tasks_covers_each_rule_once(self):
+        created = Task.objects.create(title='created', created_by=self.user, project=self.project)
+        created.assignees.add(self.user)
+        assigned = Task.objects.create(title='assigned', created_by=self.other, project=self.private)
+        assigned.assignees.add(self.user)
+        via_project = Task.objects.create(title='via project', created_by=self.other, project=self.project)
+        Task.objects.create(title='hidden', created_by=self.other, project=self.private)
+
+        visible = list(visible_tasks(self.user).values_list('title', flat=True))
+        self.assertCountEqual(visible, [created.title, assigned.title, via_project.title])
+
+    def test_visible_projects(self):
+        own = Project.objects.create(name='Own', created_by=self.user)
+        own.members.add(self.user)
+        visible = list(visible_projects(self.user).values_list('name', flat=True))
+        self.assertCountEqual(visible, ['Shared', 'Own'])
+
+
+class PaginationAndFieldsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('pager')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(name='Paged', created_by=self.user)
+        self.project.members.add(self.user)
+        # Identical created_at values force the id tie-breaker to do its job.
+        tasks = Task.objects.bulk_create(
+            Task(title=f'Task {i}', created_by=self.user, project=self.project) for i in range(7)
+        )
+        Task.objects.filter(pk__in=[t.pk for t in tasks]).update(created_at=tasks[0].created_at)
+
+    def test_cursor_walk_returns_every_row_once(self):
+        seen = []
+        url = '/api/tasks/?page_size=3'
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 3)
+            seen.extend(row['id'] for row in data['results'])
+            url = data['next']
+        self.assertEqual(seen, sorted(Task.objects.values_list('id', flat=True), reverse=True))
+
+    def test_unpaginated_by_default(self):
+        data = self.client.get('/api/tasks/').json()
+        self.assertIsInstance(data, list)
+        self.assertEqual(len(data), 7)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/tasks/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_cursor_positions(self):
+        for position in ([None, 1], [[1], 1], ['2024-01-01T00:00:00+00:00', {'id': 1}], ['1e999999', 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get(f'/api/tasks/?page_size=3&cursor={cursor}')
+            self.assertEqual(response.status_code, 404, position)
+
+    def test_sparse_fieldset(self):
+        data = self.client.get('/api/tasks/?fields=id,title&page_size=2').json()
+        self.assertEqual(set(data['results'][0]), {'id', 'title'})
+        data = self.client.get(f'/api/projects/{self.project.id}/tasks/?fields=id,status').json()
+        self.assertEqual(set(data[0]), {'id', 'status'})
+        data = self.client.get('/api/projects/?fields=id,name,task_count').json()
+        self.assertEqual(data, [{'id': self.project.id, 'name': 'Paged', 'task_count': 7}])
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.owner = User.objects.create_user('owner')
+        self.member = User.objects.create_user('member')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.project = Project.objects.create(name='Cached', created_by=self.owner)
+        self.project.members.add(self.owner, self.member)
+        self.task = Task.objects.create(title='First', created_by=self.owner, project=self.project)
+
+    def test_hit_skips_the_database(self):
+        # The project task list still checks that the project is visible.
+        for url, queries in (('/api/tasks/', 0), ('/api/projects/', 0), (f'/api/projects/{self.project.id}/tasks/', 1)):
+            first = self.client.get(url).json()
+            with self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(url).json(), first)
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get('/api/tasks/?fields=id')
+        data = self.client.get('/api/tasks/?fields=id,title').json()
+        self.assertEqual(data, [{'id': self.task.id, 'title': 'First'}])
+
+    def test_task_change_invalidates_user_and_project_entries(self):
+        url = f'/api/projects/{self.project.id}/tasks/'
+        self.client.get('/api/tasks/')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Second', created_by=self.member, project=self.project)
+        self.assertEqual(len(self.client.get('/api/tasks/').json()), 2)
+        self.assertEqual(len(self.client.get(url).json()), 2)
+
+    def test_project_tasks_are_shared_between_members_but_still_checked(self):
+        url = f'/api/projects/{self.project.id}/tasks/'
+        self.client.get(url)
+        self.client.force_authenticate(self.member)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.client.get(url).json()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.members.remove(self.member)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+    def test_project_rename_reaches_assignees_outside_the_project(self):
+        outsider = User.objects.create_user('outsider')
+        self.task.assignees.add(outsider)
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get('/api/tasks/').json()[0]['project_name'], 'Cached')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.name = 'Renamed'
+            self.project.save()
+        self.assertEqual(self.client.get('/api/tasks/').json()[0]['project_name'], 'Renamed')
+
+    def test_username_change_reaches_shared_lists(self):
+        self.task.assignees.add(self.member)
+        url = f'/api/projects/{self.project.id}/tasks/'
+        for path in ('/api/tasks/', url):
+            self.assertEqual(self.client.get(path).json()[0]['assignee_details'][0]['username'], 'member')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.username = 'renamed'
+            self.member.save()
+        for path in ('/api/tasks/', url):
+            self.assertEqual(self.client.get(path).json()[0]['assignee_details'][0]['username'], 'renamed')
+
+    def test_reverse_clear_invalidates_the_tasks(self):
+        outsider = User.objects.create_user('outsider')
+        self.task.assignees.add(outsider)
+        self.client.get(f'/api/projects/{self.project.id}/tasks/')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(len(self.client.get('/api/tasks/').json()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            outsider.assigned_tasks.clear()
+        self.assertEqual(self.client.get('/api/tasks/').json(), [])
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.get(f'/api/projects/{self.project.id}/tasks/').json()[0]['assignee_details'], [])
+
+    def test_if_none_match_returns_304_until_something_changes(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.assertNotEqual(etag, self.client.get('/api/tasks/?fields=id')['ETag'])
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.status = 'DONE'
+            self.task.save()
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['status'], 'DONE')
+
+        # A project renamed under a user who only sees it through an assignment.
+        outsider = User.objects.create_user('outsider')
+        self.task.assignees.add(outsider)
+        self.client.force_authenticate(outsider)
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.assertEqual(self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.name = 'Renamed'
+            self.project.save()
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['project_name'], 'Renamed')
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.member = User.objects.create_user('member')
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+        self.project = Project.objects.create(name='Synced', created_by=self.owner)
+        self.project.members.add(self.owner, self.member)
+        self.task = Task.objects.create(title='Existing', created_by=self.owner, project=self.project)
+        self.token = self.client.get('/api/sync/').json()['token']
+
+    def _sync(self):
+        data = self.client.get(f'/api/sync/?since={self.token}').json()
+        self.token = data['token']
+        return data
+
+    def test_returns_only_rows_changed_since_the_token(self):
+        self.assertEqual(self._sync()['tasks'], {'updated': [], 'deleted': []})
+        added = Task.objects.create(title='New', created_by=self.owner, project=self.project)
+        self.task.status = 'DONE'
+        self.task.save()
+        Task.objects.create(title='Private', created_by=self.owner)
+
+        data = self._sync()
+        self.assertCountEqual([row['id'] for row in data['tasks']['updated']], [added.id, self.task.id])
+        self.assertFalse(data['more'])
+        self.assertEqual(self._sync()['tasks']['updated'], [])
+
+    def test_deletes_and_lost_access_become_tombstones(self):
+        kept = Task.objects.create(title='Kept', created_by=self.owner, project=self.project)
+        self._sync()
+        task_id = self.task.id
+        self.task.delete()
+        data = self._sync()
+        self.assertEqual(data['tasks']['deleted'], [task_id])
+
+        self.project.members.remove(self.member)
+        data = self._sync()
+        self.assertEqual(data['projects'], {'updated': [], 'deleted': [self.project.id]})
+        self.assertEqual(data['tasks']['deleted'], [kept.id])
+
+        self.project.members.add(self.member)
+        data = self._sync()
+        self.assertEqual([row['id'] for row in data['tasks']['updated']], [kept.id])
+
+    def test_bulk_writes_are_logged(self):
+        self.client.force_authenticate(self.owner)
+        self.client.post('/api/tasks/bulk_delete/', {'ids': [self.task.id]}, format='json')
+        self.assertEqual(self._sync()['tasks']['deleted'], [self.task.id])
+
+    def test_bad_tokens(self):
+        self.assertEqual(self.client.get('/api/sync/?since=abc').status_code, 400)
+        data = self.client.get(f'/api/sync/?since={self.token + 100}').json()
+        self.assertEqual(data, {'token': self.token, 'reset': True})
+
+    def test_pruned_tokens_reset(self):
+        stale = self.token
+        for title in ('a', 'b'):
+            Task.objects.create(title=title, created_by=self.owner, project=self.project)
+        self._sync()
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(days=60))
+        out = StringIO()
+        call_command('prune_changelog', '--days', '30', stdout=out)
+        self.assertEqual(ChangeLog.objects.count(), 1)
+        self.assertEqual(self.client.get(f'/api/sync/?since={stale}').json(), {'token': self.token, 'reset': True})
+        # The newest row survives, so an up-to-date token keeps working.
+        self.assertEqual(self._sync()['tasks'], {'updated': [], 'deleted': []})
+
+    def test_membership_changes_select_tasks_by_project(self):
+        for i in range(30):
+            Task.objects.create(title=f'Bulk {i}', created_by=self.owner, project=self.project)
+        self._sync()
+        self.project.members.remove(self.member)
+        with CaptureQueriesContext(connection) as queries:
+            data = self._sync()
+        self.assertEqual(len(data['tasks']['deleted']), 31)
+        # No query lists the project's task ids.
+        self.assertFalse([query for query in queries if str(self.task.id + 29) in query['sql']])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+@skipUnless(connection.vendor == 'postgresql', 'commit ordering relies on PostgreSQL advisory locks')
+class ChangeLogOrderingTests(TransactionTestCase):
+    def test_interleaved_writers_cannot_skip_a_row(self):
+        user = User.objects.create_user('writer')
+        before = current_token()
+        logged, release = threading.Event(), threading.Event()
+
+        def first():
+            try:
+                with transaction.atomic():
+                    Task.objects.create(title='first', created_by=user)
+                    logged.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        def second():
+            try:
+                # Autocommit, like a save() outside the API's views.
+                Task.objects.create(title='second', created_by=user)
+            finally:
+                connection.close()
+
+        writers = [threading.Thread(target=first), threading.Thread(target=second)]
+        writers[0].start()
+        self.assertTrue(logged.wait(10))
+        writers[1].start()
+        writers[1].join(0.5)
+        # The second writer waits for the first's lock rather than committing
+        # a larger id that a token could move past the first's pending row.
+        self.assertTrue(writers[1].is_alive())
+        self.assertEqual(current_token(), before)
+        release.set()
+        for writer in writers:
+            writer.join(10)
+        logged_ids = ChangeLog.objects.filter(id__gt=before, model='task').order_by('id').values_list('object_id', flat=True)
+        self.assertEqual([Task.objects.get(pk=pk).title for pk in logged_ids], ['first', 'second'])
+
+
+class QueryPlanTests(TestCase):
+    """The hot endpoint queries are answered from the indexes built for them."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('planner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(name='Planned', created_by=self.user)
+        self.project.members.add(self.user)
+
+    def _explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def assertEndpointUsesIndex(self, url, index, ordered=False):
+        """Some query `url` runs must use `index`; with `ordered`, without a sort step."""
+        clear_caches()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        plans = [self._explain(query['sql']) for query in ctx.captured_queries if query['sql'].startswith('SELECT')]
+        matching = [plan for plan in plans if index in plan]
+        self.assertTrue(matching, f'{index} not used by {url}:\n' + '\n\n'.join(plans))
+        if ordered:
+            self.assertNotIn('TEMP B-TREE', matching[0])
+
+    def test_project_task_lists_read_pages_off_the_index(self):
+        self.assertEndpointUsesIndex(f'/api/tasks/?project={self.project.id}&page_size=10', 'task_project_created_idx', ordered=True)
+        self.assertEndpointUsesIndex(
+            f'/api/tasks/?project={self.project.id}&status=TODO&page_size=10', 'task_project_status_idx', ordered=True,
+        )
+        self.assertEndpointUsesIndex(f'/api/projects/{self.project.id}/tasks/?page_size=10', 'task_project_created_idx', ordered=True)
+
+    def test_visibility_branches_are_indexed(self):
+        self.assertEndpointUsesIndex('/api/tasks/', 'task_creator_created_idx')
+        self.assertEndpointUsesIndex('/api/tasks/', 'tasks_task_assignees_user_task_idx')
+        self.assertEndpointUsesIndex('/api/projects/', 'project_creator_created_idx')
+        self.assertEndpointUsesIndex('/api/projects/', 'tasks_project_members_user_project_idx')
+        self.assertEndpointUsesIndex('/api/tasks/my_tasks/', 'tasks_task_assignees_user_task_idx')
+
+    def test_deadline_scan_uses_partial_index(self):
+        self.assertIn('task_open_due_date_idx', due_tasks(60, timezone.now()).explain())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('seeker')
+        self.other = User.objects.create_user('other')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(name='Migration board', description='Move the database', created_by=self.user)
+        self.title_hit = Task.objects.create(title='Database backup', created_by=self.user, project=self.project)
+        self.body_hit = Task.objects.create(
+            title='Weekly chores', description='rotate database credentials', created_by=self.user,
+        )
+        Task.objects.create(title='Database secrets', created_by=self.other)
+
+    def _search(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranked_prefix_search_over_visible_rows(self):
+        results = self._search('datab')['results']
+        self.assertEqual(
+            [(row['type'], row['id']) for row in results],
+            [('task', self.title_hit.id), ('project', self.project.id), ('task', self.body_hit.id)],
+        )
+        self.assertEqual(results[0]['data']['title'], 'Database backup')
+
+    def test_all_terms_must_match_and_operators_are_ignored(self):
+        results = self._search('"database" (rotate*')['results']
+        self.assertEqual([row['id'] for row in results], [self.body_hit.id])
+        self.assertEqual(self._search('  *  ')['results'], [])
+
+    def test_index_follows_writes(self):
+        Task.objects.filter(pk=self.body_hit.pk).update(title='Renamed', description='nothing here')
+        self.title_hit.delete()
+        Task.objects.bulk_create([Task(title='Database restore drill', created_by=self.user)])
+        titles = [row['data'].get('title') for row in self._search('database', type='task')['results']]
+        self.assertEqual(titles, ['Database restore drill'])
+
+    def test_pagination(self):
+        first = self._search('database', page_size=2)
+        self.assertEqual(len(first['results']), 2)
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('exporter')
+        self.mate = User.objects.create_user('mate')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(name='Export, "quoted"', created_by=self.user)
+        self.tasks = [
+            Task.objects.create(title=f'Task {i}', created_by=self.user, project=self.project) for i in range(5)
+        ]
+        self.tasks[0].assignees.add(self.user, self.mate)
+        Task.objects.create(title='Hidden', created_by=self.mate)
+
+    def _content(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response = self.client.get('/api/tasks/export/?format=csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.csv"')
+        rows = list(csv.DictReader(self._content(response).splitlines()))
+        self.assertEqual([row['title'] for row in rows], [f'Task {i}' for i in range(5)])
+        self.assertEqual(rows[0]['project_name'], 'Export, "quoted"')
+        self.assertEqual(rows[0]['assignees'], 'exporter;mate')
+        self.assertEqual(rows[0]['due_date'], '')
+
+    def test_ndjson_is_the_default_and_honours_filters(self):
+        Task.objects.filter(pk=self.tasks[1].pk).update(status='DONE')
+        response = self.client.get('/api/tasks/export/?status=DONE')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.tasks[1].id])
+        self.assertEqual(rows[0]['assignees'], [])
+
+    def test_queries_per_chunk(self):
+        with mock.patch('tasks.export.EXPORT_CHUNK_SIZE', 2):
+            with self.assertNumQueries(4):  # the row cursor plus one assignee lookup per chunk
+                self._content(self.client.get('/api/tasks/export/?format=csv'))
+
+    def test_project_export(self):
+        rows = [json.loads(line) for line in self._content(self.client.get('/api/projects/export/')).splitlines()]
+        self.assertEqual(rows, [dict(rows[0], name='Export, "quoted"', created_by='exporter')])
+
+    async def test_streams_from_an_async_iterator_under_asgi(self):
+        token = str(AccessToken.for_user(self.user))
+        response = await AsyncClient().get('/api/tasks/export/?format=csv', headers={'Authorization': f'Bearer {token}'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(content.splitlines()), 6)
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('importer')
+        self.mate = User.objects.create_user('mate')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(name='Board', created_by=self.user)
+        Project.objects.create(name='Elsewhere', created_by=self.mate)
+
+    def _upload(self, name, content, **data):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post('/api/tasks/import/', {'file': upload, **data}, format='multipart')
+
+    def test_csv_upload_reports_row_errors(self):
+        content = (
+            'title,status,priority,project_name,assignees,due_date\r\n'
+            'First,Done,high,Board,importer;mate,2030-01-02\r\n'
+            ',TODO,LOW,,,\r\n'
+            'Hidden project,TODO,LOW,Elsewhere,,\r\n'
+            '"Second, quoted",,,,ghost,someday\r\n'
+            'Third,,,,,\r\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._upload('board.csv', content)
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['error_count']), (2, 3))
+        self.assertEqual([error['row'] for error in body['errors']], [2, 3, 4])
+        self.assertEqual(set(body['errors'][2]['errors']), {'assignees', 'due_date'})
+        self.assertIn('Elsewhere', body['errors'][1]['errors']['project'][0])
+
+        first = Task.objects.get(title='First')
+        self.assertEqual((first.status, first.priority, first.project, first.created_by), ('DONE', 'HIGH', self.project, self.user))
+        self.assertEqual(set(first.assignees.values_list('username', flat=True)), {'importer', 'mate'})
+        self.assertEqual(first.due_date.date().isoformat(), '2030-01-02')
+        self.assertEqual(ChangeLog.objects.filter(model='task').count(), 2)
+        self.assertEqual(self.client.get('/api/tasks/').json()[0]['title'], 'Third')
+
+    def test_json_array_and_lines_in_chunks(self):
+        rows = [{'title': f'Card {i}', 'project': 'Board', 'assignees': ['mate']} for i in range(5)]
+        for content in (json.dumps(rows, indent=2), '\n'.join(json.dumps(row) for row in rows)):
+            # Visible projects and usernames up front, then per chunk: a
+            # savepoint, tasks, assignees, change log, project members, release.
+            with mock.patch('tasks.importer.IMPORT_CHUNK_SIZE', 2), mock.patch('tasks.importer._READ_SIZE', 7):
+                with self.assertNumQueries(2 + 3 * 6):
+                    response = self._upload('cards.json', content)
+            self.assertEqual(response.json()['created'], 5)
+        self.assertEqual(Task.assignees.through.objects.filter(user=self.mate).count(), 10)
+
+    def test_truncated_json_keeps_earlier_rows(self):
+        response = self._upload('cards.json', '[{"title": "ok"}, {"title": "cut')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'][0]['row'], 2)
+
+    def test_dry_run_writes_nothing(self):
+        response = self._upload('cards.csv', 'title\r\nA\r\nB\r\n', dry_run='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertFalse(Task.objects.exists())
+
+    def test_rejects_unknown_format(self):
+        self.assertEqual(self._upload('cards.xml', '<tasks/>').status_code, 400)
+
+    def test_inserts_stay_under_the_bind_parameter_limit(self):
+        # As on PostgreSQL, whose bulk_batch_size() sets no limit.
+        with mock.patch.object(connection.ops, 'bulk_batch_size', lambda fields, objs: len(objs)), \
+                mock.patch('tasks.inserts.MAX_QUERY_PARAMS', 20), \
+                CaptureQueriesContext(connection) as queries:
+            record_changes('task', range(1001, 1012))
+        self.assertEqual(ChangeLog.objects.filter(object_id__gt=1000).count(), 11)
+        # Four columns: five rows per INSERT.
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 3)
+
+    def test_export_round_trips_through_the_command(self):
+        task = Task.objects.create(title='Exported', created_by=self.user, project=self.project)
+        task.assignees.add(self.mate)
+        export = b''.join(self.client.get('/api/tasks/export/?format=csv').streaming_content)
+        with tempfile.NamedTemporaryFile(suffix='.csv') as file:
+            file.write(export)
+            file.flush()
+            out = StringIO()
+            call_command('import_tasks', file.name, user='importer', stdout=out)
+        self.assertIn('Created 1 tasks, 0 rows rejected', out.getvalue())
+        copy = Task.objects.exclude(pk=task.pk).get()
+        self.assertEqual((copy.title, copy.project_id), ('Exported', self.project.id))
+        self.assertEqual(list(copy.assignees.all()), [self.mate])
+
+
+class AsyncReadTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('reader', email='reader@example.com')
+        self.mate = User.objects.create_user('mate')
+        self.project = Project.objects.create(name='Board', created_by=self.user)
+        self.project.members.add(self.user, self.mate)
+        self.hidden = Project.objects.create(name='Hidden', created_by=self.mate)
+        for i in range(3):
+            task = Task.objects.create(title=f'Task {i}', created_by=self.mate, project=self.project)
+            task.assignees.add(self.user)
+        Task.objects.create(title='Hidden', created_by=self.mate, project=self.hidden)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def _get(self, url, **headers):
+        return await AsyncClient().get(url, headers={**self.headers, **headers})
+
+    async def test_bodies_match_the_sync_views(self):
+        sync_get = sync_to_async(lambda url: self.client.get(url).content)
+        for sync_url, async_url in [
+            ('/api/tasks/?status=TODO&fields=id,title,assignees', '/api/async/tasks/?status=TODO&fields=id,title,assignees'),
+            ('/api/tasks/', '/api/async/tasks/'),
+            ('/api/tasks/my_tasks/?page_size=2', '/api/async/tasks/my_tasks/?page_size=2'),
+            ('/api/projects/', '/api/async/projects/'),
+            (f'/api/projects/{self.project.id}/members/', f'/api/async/projects/{self.project.id}/members/'),
+            ('/api/users/?page_size=10', '/api/async/users/?page_size=10'),
+        ]:
+            response = await self._get(async_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            expected = (await sync_get(sync_url)).replace(b'/api/', b'/api/async/')
+            self.assertEqual(response.content, expected, async_url)
+
+    async def test_keyset_pages_and_conditional_requests(self):
+        first = await self._get('/api/async/tasks/?page_size=2')
+        page = json.loads(first.content)
+        self.assertEqual([task['title'] for task in page['results']], ['Task 2', 'Task 1'])
+        second = json.loads((await self._get(page['next'])).content)
+        self.assertEqual(([task['title'] for task in second['results']], second['next']), (['Task 0'], None))
+        response = await self._get('/api/async/tasks/?page_size=2', **{'If-None-Match': first['ETag']})
+        self.assertEqual((response.status_code, response.content), (304, b''))
+
+    async def test_cache_hits_stay_off_the_thread_sensitive_thread(self):
+        await self._get('/api/async/projects/')
+        threads = []
+        cached = auth._cached
+
+        def record(raw_token):
+            threads.append(threading.current_thread())
+            return cached(raw_token)
+
+        with mock.patch('tasks.auth._cached', record):
+            response = await self._get('/api/async/projects/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], await sync_to_async(threading.current_thread)())
+
+    async def test_errors(self):
+        response = await AsyncClient().get('/api/async/projects/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response = await AsyncClient().get('/api/async/projects/', headers={'Authorization': 'Bearer junk'})
+        self.assertEqual((response.status_code, json.loads(response.content)['code']), (401, 'token_not_valid'))
+        response = await self._get(f'/api/async/projects/{self.hidden.id}/members/')
+        self.assertEqual(response.status_code, 404)
+        response = await AsyncClient().post('/api/async/tasks/', headers=self.headers)
+        self.assertEqual(response.status_code, 405)
+
+
+class FastSerializationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('zoë', email='z@example.com', first_name='Zoë', last_name='"Q"')
+        self.mate = User.objects.create_user('mate')
+        self.project = Project.objects.create(
+            name='Board \u2028 ✓', description='line\nbreak', created_by=self.user,
+            start_date=timezone.now() - timedelta(days=3),
+        )
+        self.project.members.add(self.mate, self.user)
+        Project.objects.create(name='Empty', created_by=self.user)
+        task = Task.objects.create(
+            title='Ünïcode </script> \u2029', description='tab\t"quote"', created_by=self.mate,
+            project=self.project, due_date=timezone.now() + timedelta(days=1),
+        )
+        task.assignees.add(self.mate, self.user)
+        Task.objects.create(title='No project', created_by=self.user, status='DONE', priority='HIGH')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_only_reads_use_the_fast_renderer(self):
+        for url in ('/api/tasks/', f'/api/projects/{self.project.id}/', '/api/tasks/my_tasks/',
+                    f'/api/projects/{self.project.id}/tasks/'):
+            self.assertIsInstance(self.client.get(url).accepted_renderer, fast_serializers.FastJSONRenderer, url)
+        response = self.client.patch(f'/api/projects/{self.project.id}/', {'description': 'x'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIsInstance(response.accepted_renderer, fast_serializers.FastJSONRenderer)
+        self.assertNotIsInstance(self.client.get('/api/tasks/stats/').accepted_renderer, fast_serializers.FastJSONRenderer)
+
+    def _both(self, url):
+        """(DRF bytes, fast bytes) for `url`."""
+        bodies = []
+        for enabled in (False, True):
+            clear_caches()
+            with self.settings(FAST_SERIALIZATION=enabled):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            bodies.append(response.content)
+        return bodies
+
+    def test_bodies_match_the_drf_serializers(self):
+        task = Task.objects.get(project=self.project)
+        for url in [
+            '/api/tasks/',
+            '/api/tasks/?page_size=1',
+            '/api/tasks/?fields=id,project_name,assignee_details',
+            '/api/tasks/?fields=title,assignees&priority=HIGH',
+            f'/api/tasks/{task.id}/',
+            f'/api/tasks/{task.id}/?fields=id,due_date',
+            '/api/tasks/my_tasks/',
+            '/api/tasks/assigned/?page_size=5',
+            '/api/projects/',
+            '/api/projects/?fields=name,members,task_count',
+            f'/api/projects/{self.project.id}/',
+            f'/api/projects/{self.project.id}/tasks/',
+        ]:
+            drf, fast = self._both(url)
+            self.assertEqual(fast, drf, url)
+
+        page = json.loads(self._both('/api/tasks/?page_size=1')[1])
+        self.assertEqual(self._both(page['next'])[1], self._both(page['next'])[0])
+
+    def test_missing_rows(self):
+        hidden = Task.objects.create(title='Hidden', created_by=self.mate)
+        for url in (f'/api/tasks/{hidden.id}/', '/api/tasks/abc/', '/api/projects/0/'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for i in range(20):
+            Task.objects.create(title=f'Bulk {i}', created_by=self.user, project=self.project).assignees.add(self.mate)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/tasks/')
+        # The tasks, then their assignees.
+        self.assertEqual(len(queries), 2)
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'text': 'a\u2028b\u2029c "d" \\ é 😀 \x00', 'when': timezone.now(), 'day': timezone.now().date(),
+            'amount': Decimal('1.50'), 'nested': [None, True, 1, {'k': []}],
+        }
+        expected = JSONRenderer().render(data)
+        self.assertEqual(fast_serializers.FastJSONRenderer().render(data), expected)
+        with mock.patch.object(fast_serializers, 'orjson', None):
+            self.assertEqual(fast_serializers.FastJSONRenderer().render(data), expected)
+        indented = 'application/json; indent=2'
+        self.assertEqual(
+            fast_serializers.FastJSONRenderer().render(data, indented), JSONRenderer().render(data, indented),
+        )
+
+
+def metric_value(text, sample):
+    """Value of the exposition line starting with `sample`, or 0 if absent."""
+    for line in text.splitlines():
+        if line.startswith(sample + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('metered')
+        Task.objects.create(title='Counted', created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _metrics(self, address='127.0.0.1', **headers):
+        response = self.client.get('/metrics', headers=headers, REMOTE_ADDR=address)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode()
+
+    def test_server_timing_and_histograms(self):
+        sample = 'http_request_duration_seconds_count{view="task-list",method="GET"}'
+        before = metric_value(self._metrics(), sample)
+        response = self.client.get('/api/tasks/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, '
+                                 r'render;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertNotIn('desc="0 queries"', timing)
+
+        text = self._metrics()
+        self.assertEqual(metric_value(text, sample), before + 1)
+        self.assertIn('http_requests_total{view="task-list",method="GET",status="200"}', text)
+        self.assertIn('http_request_db_queries_bucket{view="task-list",le="+Inf"}', text)
+        self.assertIn('http_response_size_bytes_count{view="task-list"}', text)
+        self.assertGreater(metric_value(text, 'http_request_serialize_seconds_sum{view="task-list"}'), 0)
+        self.assertIn('# TYPE socketio_connected_sockets gauge', text)
+
+    async def test_async_views_are_timed(self):
+        headers = {'Authorization': f'Bearer {await sync_to_async(AccessToken.for_user)(self.user)}'}
+        response = await AsyncClient().get('/api/async/tasks/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.settings(SLOW_REQUEST_MS=0.001), self.assertLogs('tasks.performance', 'WARNING') as logs:
+            self.client.get('/api/projects/')
+        self.assertIn('Slow request: GET /api/projects/ (project-list) -> 200', logs.output[0])
+        self.assertIn('FROM "tasks_project"', logs.output[0])
+
+    def test_metrics_token(self):
+        with self.settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self._metrics(Authorization='Bearer s3cret')
+            self._metrics('93.184.216.34', Authorization='Bearer s3cret')
+
+    def test_metrics_without_a_token_are_internal_only(self):
+        for address in ('127.0.0.1', '::1', '10.1.2.3', '192.168.0.9'):
+            self._metrics(address)
+        response = self.client.get('/metrics', REMOTE_ADDR='93.184.216.34')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn(b'http_request', response.content)
+
+    def test_socket_emits(self):
+        sample = 'socketio_emits_total{type="TASK_UPDATED"}'
+        before = metric_value(self._metrics(), sample)
+        async_to_sync(notify_users)([self.user.id], {'type': 'TASK_UPDATED'})
+        text = self._metrics()
+        self.assertEqual(metric_value(text, sample), before + 1)
+        self.assertGreater(metric_value(text, 'socketio_emits_per_second'), 0)
+        self.assertGreater(metric_value(text, 'socketio_emit_duration_seconds_count'), 0)
+
+
+class SeedBenchmarkTests(TestCase):
+    def test_seeds_a_skewed_dataset(self):
+        out = StringIO()
+        call_command('seed_benchmark', users=60, projects=12, tasks=400, seed=7, password='pw', stdout=out)
+        self.assertIn('60 users, 12 projects', out.getvalue())
+        users = User.objects.filter(username__startswith='bench7_')
+        self.assertEqual(users.count(), 60)
+        self.assertTrue(users.first().check_password('pw'))
+
+        tasks = Task.objects.filter(title__startswith='bench7_')
+        self.assertEqual(tasks.count(), 400)
+        # Creators belong to their task's project; a few tasks have none.
+        filed = tasks.exclude(project=None)
+        self.assertFalse(filed.exclude(project__members=F('created_by')).exists())
+        self.assertLess(filed.count(), 400)
+        # The busiest project holds far more than an even share of the tasks.
+        busiest = filed.values('project').annotate(n=Count('id')).order_by('-n').first()['n']
+        self.assertGreater(busiest, 3 * 400 / 12)
+
+        with self.assertRaisesMessage(CommandError, 'bench7_* already exist'):
+            call_command('seed_benchmark', users=5, projects=1, tasks=1, seed=7, stdout=out)
+
+
+class AuthCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        token_cache.clear()
+        self.user = User.objects.create_user('cached')
+        self.token = str(AccessToken.for_user(self.user))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_repeat_requests_skip_the_user_query(self):
+        self.assertEqual(self.client.get('/api/tasks/stats/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/tasks/stats/').status_code, 200)
+        self.assertFalse([query for query in queries if 'auth_user' in query['sql']])
+
+    def test_deactivation_and_blacklisting_drop_cached_tokens(self):
+        authenticate_token(self.token)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            self.user.refresh_from_db()
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            authenticate_token(self.token)
+
+        self.user.is_active = True
+        self.user.save()
+        authenticate_token(self.token)
+        with self.assertNumQueries(0):
+            authenticate_token(self.token)
+        with self.captureOnCommitCallbacks(execute=True):
+            RefreshToken.for_user(self.user).blacklist()
+        with self.assertNumQueries(1):
+            authenticate_token(self.token)
+
+    def test_refresh_rotates_the_refresh_token(self):
+        # The client must keep the refresh token each refresh returns.
+        refresh = str(RefreshToken.for_user(self.user))
+        client = APIClient()
+        response = client.post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], refresh)
+        self.assertEqual(client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+        self.assertEqual(client.post('/api/token/refresh/', {'refresh': response.data['refresh']}).status_code, 200)
+
+    def test_cached_user_is_a_copy(self):
+        user, _ = authenticate_token(self.token)
+        user.username = 'changed'
+        self.assertEqual(authenticate_token(self.token)[0].username, 'cached')
+
+    def test_socket_connect_rejects_refresh_tokens(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        with mock.patch.object(sio, 'enter_room', mock.AsyncMock()):
+            self.assertFalse(async_to_sync(notifications.connect)('sid', {}, {'token': refresh}))
+            self.assertTrue(async_to_sync(notifications.connect)('sid', {}, {'token': self.token}))
+        notifications.sessions.remove('sid')
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('stats')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(name='Stats', created_by=self.user)
+        self.project.members.add(self.user)
+        yesterday = timezone.now() - timedelta(days=1)
+        Task.objects.create(title='a', created_by=self.user, project=self.project, status='DONE')
+        Task.objects.create(title='b', created_by=self.user, project=self.project, priority='HIGH', due_date=yesterday)
+        Task.objects.create(title='c', created_by=self.user, status='IN_PROGRESS')
+
+    def test_stats(self):
+        data = self.client.get('/api/tasks/stats/').json()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(data['by_status'], {'TODO': 1, 'IN_PROGRESS': 1, 'DONE': 1})
+        self.assertEqual(data['by_priority'], {'LOW': 0, 'MEDIUM': 2, 'HIGH': 1})
+        self.assertEqual(data['overdue'], 1)
+        self.assertEqual(data['completion_rate'], 33)
+        self.assertEqual(data['projects'], [{
+            'id': self.project.id, 'name': 'Stats', 'total': 2, 'done': 1,
+            'overdue': 1, 'completion_rate': 50,
+        }])
+
+    def test_stats_are_cached_until_a_task_changes(self):
+        self.client.get('/api/tasks/stats/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/tasks/stats/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.filter(title='c').get().delete()
+        self.assertEqual(self.client.get('/api/tasks/stats/').json()['total'], 2)
+
+
+class NotificationDispatchTests(TransactionTestCase):
+    def setUp(self):
+        self.actor = User.objects.create_user('actor')
+        self.assignee = User.objects.create_user('assignee')
+        self.project = Project.objects.create(name='Notify', created_by=self.actor)
+        self.project.members.add(self.actor, self.assignee)
+        self.task = Task.objects.create(title='Ship it', created_by=self.actor, project=self.project)
+        self.task.assignees.add(self.assignee)
+
+    def test_build_notifications_loads_batch_in_one_query_per_model(self):
+        other = Task.objects.create(title='Other', created_by=self.actor)
+        events = [
+            (TASK_ASSIGNED, self.task.id, self.actor.id),
+            (TASK_UPDATED, other.id, self.actor.id),
+            (PROJECT_UPDATED, self.project.id, self.actor.id),
+            (TASK_UPDATED, 0, self.actor.id),
+        ]
+        # One query per model plus the sync token.
+        with self.assertNumQueries(3):
+            built = build_notifications(events)
+        self.assertEqual([payload['type'] for _, payload in built], [TASK_ASSIGNED, TASK_UPDATED, PROJECT_UPDATED])
+        self.assertEqual(built[0][1]['sync_token'], ChangeLog.objects.latest('id').id)
+        self.assertEqual(built[0][0], [self.assignee.id])
+        self.assertEqual(built[1][0], [self.actor.id])
+        self.assertCountEqual(built[2][0], [self.actor.id, self.assignee.id])
+        self.assertEqual(built[0][1]['message'], 'You have been assigned to task: Ship it')
+
+    def test_views_enqueue_and_worker_delivers(self):
+        delivered = []
+
+        async def fake_notify_users(user_ids, payload):
+            delivered.append((user_ids, payload['type']))
+
+        async def run():
+            dispatcher = NotificationDispatcher(flush_interval=0.01)
+            await dispatcher.start()
+            dispatcher.submit((TASK_UPDATED, self.task.id, self.actor.id))
+            dispatcher.submit((TASK_ASSIGNED, self.task.id, self.actor.id))
+            await asyncio.sleep(0.2)
+            await dispatcher.stop()
+
+        with mock.patch('tasks.notifications.notify_users', fake_notify_users):
+            asyncio.run(run())
+        self.assertEqual(delivered, [
+            ([self.assignee.id, self.actor.id], TASK_UPDATED),
+            ([self.assignee.id], TASK_ASSIGNED),
+        ])
+
+    def test_bulk_update_sends_one_digest_per_recipient(self):
+        # More tasks than the dispatcher's batch size.
+        tasks = Task.objects.bulk_create(
+            Task(title=f'Bulk {i}', created_by=self.actor, project=self.project) for i in range(250)
+        )
+        Task.assignees.through.objects.bulk_create(
+            Task.assignees.through(task=task, user=self.assignee) for task in tasks
+        )
+        delivered = []
+
+        async def fake_notify_users(user_ids, payload):
+            delivered.extend(user_ids)
+
+        async def run():
+            dispatcher = NotificationDispatcher(flush_interval=0.01)
+            await dispatcher.start()
+            with mock.patch('tasks.dispatch.dispatcher', dispatcher):
+                await sync_to_async(bulk_update_tasks)(
+                    self.actor, [{'id': task.id, 'status': 'DONE'} for task in tasks],
+                )
+            await asyncio.sleep(0.2)
+            await dispatcher.stop()
+
+        self.assertLess(NotificationDispatcher().batch_size, len(tasks))
+        with mock.patch('tasks.notifications.notify_users', fake_notify_users):
+            asyncio.run(run())
+        self.assertCountEqual(delivered, [self.actor.id, self.assignee.id])
+
+    def test_enqueue_waits_for_commit(self):
+        with mock.patch('tasks.dispatch.dispatcher.submit') as submit:
+            with transaction.atomic():
+                enqueue(TASK_UPDATED, self.task.id, self.actor.id)
+                submit.assert_not_called()
+        submit.assert_called_once_with((TASK_UPDATED, self.task.id, self.actor.id))
+
+
+class SessionRegistryTests(TestCase):
+    def test_connect_and_disconnect_keep_both_indexes_in_step(self):
+        registry = SessionRegistry()
+        registry.add('a', 1)
+        registry.add('b', 1)
+        registry.add('c', 2)
+        self.assertEqual(registry.sids_for(1), {'a', 'b'})
+        self.assertEqual((registry.active_users, registry.active_sockets), (2, 3))
+
+        self.assertEqual(registry.remove('a'), 1)
+        self.assertIsNone(registry.remove('a'))
+        registry.remove('b')
+        self.assertFalse(registry.is_online(1))
+        self.assertEqual((registry.active_users, registry.active_sockets), (1, 1))
+        self.assertEqual((registry.connects, registry.disconnects), (3, 2))
+
+    def test_socket_handlers_join_user_room_and_clean_up(self):
+        user = User.objects.create_user('socket')
+        token = str(AccessToken.for_user(user))
+        registry = SessionRegistry()
+
+        async def run():
+            with mock.patch('tasks.notifications.sessions', registry), \
+                    mock.patch.object(sio, 'enter_room', mock.AsyncMock()) as enter_room:
+                self.assertTrue(await notifications.connect('sid1', {}, {'token': token}))
+                self.assertFalse(await notifications.connect('sid2', {}, {'token': 'bogus'}))
+                enter_room.assert_awaited_once_with('sid1', f'user:{user.id}')
+                self.assertEqual(registry.sids_for(user.id), {'sid1'})
+                await notifications.disconnect('sid1')
+                self.assertEqual(registry.active_sockets, 0)
+
+        # async_to_sync keeps the handler's user lookup on this test's connection.
+        async_to_sync(run)()
+
+    def test_notify_users_emits_once_to_user_rooms(self):
+        with mock.patch.object(sio, 'emit', mock.AsyncMock()) as emit:
+            asyncio.run(notify_users([1, 2, 2], {'type': TASK_UPDATED}))
+        emit.assert_awaited_once()
+        self.assertCountEqual(emit.await_args.kwargs['room'], ['user:1', 'user:2'])
+
+
+class StalledEngineIOSocket:
+    """An Engine.IO socket whose writer only takes packets when `read()` is called."""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.closed = False
+        self.close_kwargs = None
+
+    async def send(self, pkt):
+        await self.queue.put(pkt)
+
+    async def close(self, **kwargs):
+        self.closed = True
+        self.close_kwargs = kwargs
+
+    def read(self):
+        messages = []
+        while not self.queue.empty():
+            messages.append(json.loads(self.queue.get_nowait().data[1:])[1]['message'])
+            self.queue.task_done()
+        return messages
+
+
+class OutboundQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.socket = StalledEngineIOSocket()
+
+    def server(self, **kwargs):
+        server = BufferedAsyncServer(async_mode='asgi', coalesce=notifications._replaces_pending, **kwargs)
+        server.eio.sockets['eio'] = self.socket
+        return server
+
+    async def emit(self, server, event_type, message, **data):
+        payload = {'type': event_type, 'message': message, 'data': data}
+        encoded = socketio.packet.Packet(socketio.packet.EVENT, data=['notification', payload]).encode()
+        await server._send_eio_packet('eio', eio_packet.Packet(eio_packet.MESSAGE, encoded))
+
+    def test_slow_consumer_queue_is_bounded_and_coalesced(self):
+        before = render_metrics()
+        server = self.server(max_queue=3)
+
+        async def run():
+            await self.emit(server, TASK_UPDATED, 'first', task_id=1)
+            await asyncio.sleep(0)
+            # The writer has not taken 'first' yet, so the rest wait in the queue.
+            await self.emit(server, TASK_ASSIGNED, 'assigned 2', task_id=2)
+            await self.emit(server, TASK_UPDATED, 'second', task_id=1)
+            await self.emit(server, TASK_UPDATED, 'third', task_id=1)
+            await self.emit(server, TASK_ASSIGNED, 'assigned 3', task_id=3)
+            await self.emit(server, TASK_ASSIGNED, 'assigned 4', task_id=4)
+            self.assertEqual(server.outbound_depths(), [3])
+            first = self.socket.read()
+            for _ in range(5):
+                await asyncio.sleep(0)
+            return first, self.socket.read()
+
+        first, rest = asyncio.run(run())
+        self.assertEqual(first, ['first'])
+        # 'third' replaced 'second', and 'assigned 4' pushed out the oldest.
+        self.assertEqual(rest, ['third', 'assigned 3', 'assigned 4'])
+        self.assertEqual(server.outbound_depths(), [0])
+        after = render_metrics()
+        for outcome, added in (('coalesced', 1), ('dropped', 1), ('sent', 4)):
+            sample = f'socketio_outbound_packets_total{{outcome="{outcome}"}}'
+            self.assertEqual(metric_value(after, sample) - metric_value(before, sample), added)
+        sample = 'socketio_outbound_delivery_seconds_count'
+        self.assertGreater(metric_value(after, sample), metric_value(before, sample))
+
+    def test_stuck_consumer_is_disconnected(self):
+        server = self.server(send_timeout=0.05)
+
+        async def run():
+            await self.emit(server, TASK_UPDATED, 'first', task_id=1)
+            await asyncio.sleep(0.2)
+            await self.emit(server, TASK_UPDATED, 'after close', task_id=1)
+
+        with self.assertLogs('tasks.outbound', 'WARNING'):
+            asyncio.run(run())
+        self.assertTrue(self.socket.closed)
+        self.assertEqual(self.socket.close_kwargs['abort'], True)
+        self.assertEqual(self.socket.read(), ['first'])
+        self.assertEqual(server.outbound_depths(), [0])
+
+    def test_digests_and_other_events_are_not_coalesced(self):
+        self.assertIsNone(notifications._replaces_pending('notification', {
+            'type': TASK_UPDATED, 'data': {'project_id': 1, 'task_ids': [1, 2]},
+        }))
+        self.assertIsNone(notifications._replaces_pending('other', {'type': TASK_UPDATED, 'data': {'task_id': 1}}))
+        self.assertEqual(
+            notifications._replaces_pending('notification', {'type': PROJECT_UPDATED, 'data': {'project_id': 5}}),
+            (PROJECT_UPDATED, 5),
+        )
+
+
+class OutboundHooksTests(SimpleTestCase):
+    """The socketio/engineio internals BufferedAsyncServer relies on are still there."""
+
+    def test_private_hooks_exist(self):
+        from engineio.async_socket import AsyncSocket
+        from socketio.async_manager import AsyncManager
+
+        # Emits without callbacks reach each recipient through _send_eio_packet.
+        self.assertIn('_send_eio_packet', inspect.getsource(AsyncManager.emit))
+        self.assertTrue(callable(getattr(socketio.AsyncServer, '_handle_eio_disconnect', None)))
+        # The writer marks packets done as it takes them, which queue.join() waits for.
+        self.assertIn('task_done', inspect.getsource(AsyncSocket.poll))
+        self.assertTrue({'wait', 'abort', 'reason'} <= set(inspect.signature(AsyncSocket.close).parameters))
+        server = BufferedAsyncServer(async_mode='asgi')
+        self.assertTrue(server.eio.reason.SERVER_DISCONNECT)
+        self.assertTrue(callable(AsyncSocket(server.eio, 'sid').queue.join))
+
+
+class MultiProcessFanoutTests(SimpleTestCase):
+    """An emit on one worker process reaches a socket held by another one."""
+
+    EMITTER = (
+        'import asyncio, sys\n'
+        'from tasks.socket_managers import AsyncSQLiteManager\n'
+        'manager = AsyncSQLiteManager(sys.argv[1], write_only=True)\n'
+        "asyncio.run(manager.emit('notification', {'type': 'TASK_UPDATED'}, room='user:7'))\n"
+    )
+
+    def test_sqlite_backend_crosses_process_boundary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f'sqlite:///{tmp}/bus.sqlite3'
+            received = asyncio.run(self._run(url))
+        self.assertEqual(received, [{'type': 'TASK_UPDATED'}])
+
+    async def _run(self, url):
+        server = socketio.AsyncServer(client_manager=AsyncSQLiteManager(url, poll_interval=0.01), async_mode='asgi')
+
+        @server.event
+        async def connect(sid, environ, auth):
+            await server.enter_room(sid, 'user:7')
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        web = uvicorn.Server(uvicorn.Config(socketio.ASGIApp(server), port=port, log_level='error', lifespan='off'))
+        serving = asyncio.create_task(web.serve())
+        while not web.started:
+            await asyncio.sleep(0.01)
+
+        received = []
+        client = socketio.AsyncClient()
+        client.on('notification', lambda data: received.append(data))
+        try:
+            await client.connect(f'http://127.0.0.1:{port}', transports=['websocket'])
+            await asyncio.sleep(0.2)
+            emitter = await asyncio.create_subprocess_exec(
+                sys.executable, '-c', self.EMITTER, url, cwd=settings.BASE_DIR,
+            )
+            self.assertEqual(await emitter.wait(), 0)
+            for _ in range(100):
+                if received:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await client.disconnect()
+            web.should_exit = True
+            await serving
+        return received
+
+
+class NotificationCoalescingTests(TransactionTestCase):
+    def setUp(self):
+        self.actor = User.objects.create_user('editor')
+        self.watcher = User.objects.create_user('watcher')
+        self.project = Project.objects.create(name='Board', created_by=self.actor)
+        self.tasks = [
+            Task.objects.create(title=f'Card {i}', created_by=self.actor, project=self.project)
+            for i in range(5)
+        ]
+        for task in self.tasks:
+            task.assignees.add(self.watcher)
+
+    def test_burst_becomes_one_digest_per_audience(self):
+        events = [(TASK_UPDATED, task.id, self.actor.id) for task in self.tasks]
+        events.append((TASK_UPDATED, self.tasks[0].id, self.actor.id))
+        with self.assertNumQueries(2):
+            built = build_notifications(events, coalesce=True)
+        self.assertEqual(len(built), 1)
+        user_ids, payload = built[0]
+        self.assertCountEqual(user_ids, [self.actor.id, self.watcher.id])
+        self.assertEqual(payload['message'], '5 tasks updated in Board')
+        self.assertEqual(payload['data']['task_ids'], sorted(task.id for task in self.tasks))
+
+    def test_repeated_events_for_one_task_collapse(self):
+        events = [(TASK_UPDATED, self.tasks[0].id, self.actor.id)] * 3
+        built = build_notifications(events, coalesce=True)
+        self.assertEqual(len(built), 1)
+        self.assertEqual(built[0][1]['message'], 'Task updated: Card 0')
+
+    def test_notify_helpers_run_the_orm_off_the_event_loop(self):
+        with mock.patch('tasks.notifications.notify_users', mock.AsyncMock()) as notify:
+            asyncio.run(notifications.notify_task_assigned(self.tasks[0].id, self.actor.id))
+        notify.assert_awaited_once()
+        self.assertEqual(notify.await_args.args[0], [self.watcher.id])
+
+
+class DeadlineScanTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('due')
+        now = timezone.now()
+        self.soon = [
+            Task.objects.create(title=f'soon {i}', created_by=self.user, due_date=now + timedelta(minutes=30))
+            for i in range(5)
+        ]
+        self.tomorrow = Task.objects.create(title='tomorrow', created_by=self.user, due_date=now + timedelta(hours=20))
+        Task.objects.create(title='done', created_by=self.user, status='DONE', due_date=now + timedelta(minutes=30))
+        Task.objects.create(title='later', created_by=self.user, due_date=now + timedelta(days=3))
+        Task.objects.create(title='past', created_by=self.user, due_date=now - timedelta(hours=1))
+        for task in Task.objects.all():
+            task.assignees.add(self.user)
+
+    def _scan(self, **kwargs):
+        batches = []
+        sent = scan_deadlines(send=batches.append, windows=[60, 24 * 60], **kwargs)
+        return sent, batches
+
+    def test_each_task_fires_once_per_window_in_chunks(self):
+        sent, batches = self._scan(chunk_size=2)
+        self.assertEqual(sent, 6)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1, 1])
+        fired = [task_id for batch in batches for _, task_id, _ in batch]
+        self.assertCountEqual(fired, [task.id for task in self.soon] + [self.tomorrow.id])
+
+        self.assertEqual(self._scan(), (0, []))
+
+    def test_overlapping_scans_send_each_reminder_once(self):
+        now = timezone.now()
+        # What a second scan's query found before the first recorded anything.
+        found = {
+            window: Task.objects.filter(pk__in=list(due_tasks(window, now, after).values_list('pk', flat=True)))
+            for window, after in ((60, 0), (24 * 60, 60))
+        }
+        self.assertEqual(self._scan(now=now)[0], 6)
+        with mock.patch('tasks.deadlines.due_tasks', lambda window, now, after_minutes=0: found[window]):
+            self.assertEqual(self._scan(now=now), (0, []))
+
+    def test_scheduler_awaits_delivery_instead_of_queueing(self):
+        dispatcher = mock.Mock(deliver=mock.AsyncMock())
+        scheduler = DeadlineScheduler(dispatcher)
+        self.assertEqual(scan_deadlines(send=scheduler._submit, windows=[60, 24 * 60], chunk_size=2), 6)
+        self.assertEqual([len(call.args[0]) for call in dispatcher.deliver.await_args_list], [2, 2, 1, 1])
+        dispatcher.submit.assert_not_called()
+
+    def test_rescheduled_task_is_reminded_again(self):
+        self._scan()
+        self.tomorrow.due_date += timedelta(hours=1)
+        self.tomorrow.save()
+        sent, batches = self._scan()
+        self.assertEqual(batches, [[(DEADLINE, self.tomorrow.id, None)]])
+
+    def test_command_publishes_through_message_queue(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f'sqlite:///{tmp}/bus.sqlite3'
+            out = StringIO()
+            with self.settings(SOCKETIO_MESSAGE_QUEUE=url):
+                call_command('scan_deadlines', stdout=out)
+            self.assertIn('Sent 6 deadline reminders', out.getvalue())
+            with closing(sqlite3.connect(f'{tmp}/bus.sqlite3')) as conn:
+                published = conn.execute('SELECT COUNT(*) FROM socketio_messages').fetchone()[0]
+        # Five reminders in the 60 minute band collapse into one digest.
+        self.assertEqual(published, 2)
+
+
+class BulkTaskTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bulk')
+        self.mate = User.objects.create_user('mate')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(name='Board', created_by=self.user)
+        self.project.members.add(self.user, self.mate)
+        self.other = Project.objects.create(name='Other', created_by=self.user)
+
+    def test_bulk_create(self):
+        payload = [
+            {'title': f'Card {i}', 'project': self.project.id, 'assignees': [self.mate.id]}
+            for i in range(20)
+        ]
+        with mock.patch('tasks.bulk.enqueue_many') as enqueue_many:
+            with self.assertNumQueries(12):
+                response = self.client.post('/api/tasks/bulk_create/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 20)
+        self.assertEqual(response.json()[0]['assignee_details'][0]['username'], 'mate')
+        self.assertEqual(Task.assignees.through.objects.count(), 20)
+        [events], _ = enqueue_many.call_args
+        self.assertEqual(len(events), 20)
+
+    def test_bulk_create_rejects_unknown_ids_without_writing(self):
+        payload = [{'title': 'ok'}, {'title': 'bad', 'assignees': [9999]}]
+        response = self.client.post('/api/tasks/bulk_create/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('assignees', response.json())
+        self.assertFalse(Task.objects.exists())
+
+    def test_bulk_update(self):
+        tasks = [Task.objects.create(title=f'Card {i}', created_by=self.user, project=self.project) for i in range(5)]
+        self.client.get('/api/tasks/stats/')
+        changes = [{'id': task.id, 'status': 'DONE', 'project': self.other.id} for task in tasks]
+        changes[0]['assignees'] = [self.mate.id]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/tasks/bulk_update/', changes, format='json')
+        self.assertEqual(response.json(), {'updated': 5})
+        self.assertEqual(Task.objects.filter(status='DONE', project=self.other).count(), 5)
+        self.assertEqual(list(tasks[0].assignees.all()), [self.mate])
+        # Bulk writes bypass signals, so the cached dashboard must be invalidated explicitly.
+        self.assertEqual(self.client.get('/api/tasks/stats/').json()['by_status']['DONE'], 5)
+
+    def test_bulk_update_rejects_invisible_tasks(self):
+        hidden = Task.objects.create(title='hidden', created_by=self.mate)
+        response = self.client.patch('/api/tasks/bulk_update/', [{'id': hidden.id, 'status': 'DONE'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        hidden.refresh_from_db()
+        self.assertEqual(hidden.status, 'TODO')
+
+    def test_bulk_delete(self):
+        tasks = [Task.objects.create(title=f'Card {i}', created_by=self.user) for i in range(3)]
+        hidden = Task.objects.create(title='hidden', created_by=self.mate)
+        ids = [task.id for task in tasks] + [hidden.id]
+        response = self.client.post('/api/tasks/bulk_delete/', {'ids': ids}, format='json')
+        self.assertEqual(response.json(), {'deleted': 3})
+        self.assertEqual(list(Task.objects.all()), [hidden])
@@ -1,13 +1,38 @@
+from abc import ABC, abstractmethod
+
+from django.db import transaction
 from django.shortcuts import render
-from rest_framework import viewsets, status, generics
+from rest_framework import viewsets, status, generics, serializers
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.generics import get_object_or_404
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.response import Response
 from django.contrib.auth.models import User
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import Task, Project
-from .serializers import TaskSerializer, ProjectSerializer, UserSerializer, RegisterSerializer
-from .notifications import notify_task_assigned, notify_task_updated, notify_project_updated
+from .serializers import (
+    TaskSerializer, ProjectSerializer, UserSerializer, RegisterSerializer, requested_fields,
+    BulkTaskCreateSerializer, BulkTaskUpdateSerializer,
+)
+from .bulk import bulk_create_tasks, bulk_update_tasks, bulk_delete_tasks
+from .pagination import KeysetPagination
+from .notifications import TASK_ASSIGNED, TASK_UPDATED, PROJECT_UPDATED
+from .dispatch import enqueue
+from .visibility import visible_projects, visible_tasks
+from .dashboard import task_stats
+from .cache import project_cache_key, user_cache_key
+from .response_cache import cached_response
+from .sync import changes_since, current_token
+from .search import search
+from .export import EXPORT_RENDERERS, PROJECT_COLUMNS, TASK_COLUMNS, export_response
+from .importer import IMPORT_FORMATS, import_tasks
+from .fast_serializers import FAST_SERIALIZERS, FastJSONRenderer, fast_serialization_enabled
+
+# For reads of float-free task and project data (see FastJSONRenderer).
+FAST_RENDERERS = [FastJSONRenderer, BrowsableAPIRenderer]
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -26,21 +51,91 @@ class RegisterView(generics.CreateAPIView):
             })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProjectViewSet(viewsets.ModelViewSet):
+def paginated_response(view, queryset, serializer_class):
+    """Serialize `queryset` through the view's paginator, like ListModelMixin.list."""
+    context = view.get_serializer_context()
+    page = view.paginate_queryset(queryset)
+    if page is not None:
+        serializer = serializer_class(page, many=True, context=context)
+        return view.get_paginated_response(serializer.data)
+    serializer = serializer_class(queryset, many=True, context=context)
+    return Response(serializer.data)
+
+class FastReadMixin(ABC):
+    """
+    Reads through the fast serializers (fast_serializers.py) while
+    settings.FAST_SERIALIZATION is on, through for_list() and the DRF
+    serializers otherwise. Subclasses define base_queryset(): the rows the
+    user may read, before for_list().
+
+    Only list and retrieve render with FastJSONRenderer; other read actions
+    built on list_response() opt in with `renderer_classes=FAST_RENDERERS`.
+    Writes keep the default renderers.
+    """
+
+    @abstractmethod
+    def base_queryset(self):
+        """The rows the user may read."""
+
+    def get_renderers(self):
+        if self.action in ('list', 'retrieve'):
+            return [renderer() for renderer in FAST_RENDERERS]
+        return super().get_renderers()
+
+    def get_queryset(self):
+        return self.base_queryset().for_list(requested_fields(self.request))
+
+    def list_response(self, queryset, serializer_class):
+        """paginated_response() for `queryset`, which is not for_list()-ed yet."""
+        if not fast_serialization_enabled():
+            return paginated_response(self, queryset.for_list(requested_fields(self.request)), serializer_class)
+        serializer = FAST_SERIALIZERS[serializer_class](self.request)
+        rows = serializer.values(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(list(rows)))
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.base_queryset(), self.get_serializer_class())
+
+    def retrieve(self, request, *args, **kwargs):
+        if not fast_serialization_enabled():
+            return super().retrieve(request, *args, **kwargs)
+        serializer = FAST_SERIALIZERS[self.get_serializer_class()](request)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            serializer.values(self.base_queryset()), **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+        )
+        return Response(serializer.serialize([row])[0])
+
+class ProjectViewSet(FastReadMixin, viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
-    def get_queryset(self):
-        return Project.objects.filter(members=self.request.user) | Project.objects.filter(created_by=self.request.user)
+    def base_queryset(self):
+        return visible_projects(self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, user_cache_key('project-list', request.user.pk),
+            lambda: super(ProjectViewSet, self).list(request, *args, **kwargs),
+        )
 
+    # Single-object writes run in one transaction, so the change-log rows
+    # their signals append commit with them (see sync.py).
+    @transaction.atomic
     def perform_create(self, serializer):
         project = serializer.save(created_by=self.request.user)
         project.members.add(self.request.user)
 
+    @transaction.atomic
     def perform_update(self, serializer):
         project = serializer.save()
-        notify_project_updated(project.id, self.request.user.id)
+        enqueue(PROJECT_UPDATED, project.id, self.request.user.id)
 
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -50,6 +145,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def add_member(self, request, pk=None):
         project = self.get_object()
         user_id = request.data.get('user_id')
@@ -57,13 +153,14 @@ class ProjectViewSet(viewsets.ModelViewSet):
             try:
                 user = User.objects.get(id=user_id)
                 project.members.add(user)
-                notify_project_updated(project.id, self.request.user.id)
+                enqueue(PROJECT_UPDATED, project.id, self.request.user.id)
                 return Response({'status': 'member added'})
             except User.DoesNotExist:
                 return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'error': 'user_id required'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def remove_member(self, request, pk=None):
         project = self.get_object()
         user_id = request.data.get('user_id')
@@ -76,69 +173,85 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 project.members.remove(user)
-                notify_project_updated(project.id, self.request.user.id)
+                enqueue(PROJECT_UPDATED, project.id, self.request.user.id)
                 return Response({'status': 'member removed'})
             except User.DoesNotExist:
                 return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'error': 'user_id required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        return export_response(request, visible_projects(request.user), PROJECT_COLUMNS, 'projects')
+
     @action(detail=True, methods=['get'])
     def members(self, request, pk=None):
         project = self.get_object()
-        members = project.members.all()
+        members = project.members.only('id', 'username', 'email', 'first_name', 'last_name')
         serializer = UserSerializer(members, many=True)
         return Response(serializer.data)
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], renderer_classes=FAST_RENDERERS)
     def tasks(self, request, pk=None):
-        project = self.get_object()
-        tasks = project.tasks.all()
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+        # Every member sees the same task list, so it is cached per project.
+        project_id = get_object_or_404(visible_projects(request.user).values_list('pk', flat=True), pk=pk)
+        tasks = Task.objects.filter(project_id=project_id)
+        return cached_response(
+            request, project_cache_key('project-tasks', project_id),
+            lambda: self.list_response(tasks, TaskSerializer),
+        )
+
+def filter_tasks(queryset, params):
+    """Apply the task list's ?project=, ?status= and ?priority= filters."""
+    project_id = params.get('project', None)
+    status_param = params.get('status', None)
+    priority = params.get('priority', None)
 
-class TaskViewSet(viewsets.ModelViewSet):
+    if project_id:
+        queryset = queryset.filter(project_id=project_id)
+    if status_param:
+        queryset = queryset.filter(status=status_param)
+    if priority:
+        queryset = queryset.filter(priority=priority)
+
+    return queryset
+
+class TaskViewSet(FastReadMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
-    def get_queryset(self):
-        queryset = Task.objects.filter(
-            assignees=self.request.user
-        ) | Task.objects.filter(
-            created_by=self.request.user
-        ) | Task.objects.filter(
-            project__members=self.request.user
+    def base_queryset(self):
+        return self.filter_by_params(visible_tasks(self.request.user))
+
+    def filter_by_params(self, queryset):
+        return filter_tasks(queryset, self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, user_cache_key('task-list', request.user.pk),
+            lambda: super(TaskViewSet, self).list(request, *args, **kwargs),
         )
-        
-        project_id = self.request.query_params.get('project', None)
-        status_param = self.request.query_params.get('status', None)
-        priority = self.request.query_params.get('priority', None)
-
-        if project_id:
-            queryset = queryset.filter(project_id=project_id)
-        if status_param:
-            queryset = queryset.filter(status=status_param)
-        if priority:
-            queryset = queryset.filter(priority=priority)
-            
-        return queryset.distinct()
 
+    @transaction.atomic
     def perform_create(self, serializer):
         try:
             task = serializer.save(created_by=self.request.user)
             if task.assignees.exists():
-                notify_task_assigned(task.id, self.request.user.id)
+                enqueue(TASK_ASSIGNED, task.id, self.request.user.id)
             return Response(TaskSerializer(task).data, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @transaction.atomic
     def perform_update(self, serializer):
         try:
             task = serializer.save()
-            notify_task_updated(task.id, self.request.user.id)
+            enqueue(TASK_UPDATED, task.id, self.request.user.id)
             return Response(TaskSerializer(task).data)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -148,6 +261,7 @@ class TaskViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def assign(self, request, pk=None):
         task = self.get_object()
         user_id = request.data.get('user_id')
@@ -155,13 +269,14 @@ class TaskViewSet(viewsets.ModelViewSet):
             try:
                 user = User.objects.get(id=user_id)
                 task.assignees.add(user)
-                notify_task_assigned(task.id, self.request.user.id)
+                enqueue(TASK_ASSIGNED, task.id, self.request.user.id)
                 return Response({'status': 'assignee added'})
             except User.DoesNotExist:
                 return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'error': 'user_id required'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def remove_assignee(self, request, pk=None):
         task = self.get_object()
         user_id = request.data.get('user_id')
@@ -169,20 +284,152 @@ class TaskViewSet(viewsets.ModelViewSet):
             try:
                 user = User.objects.get(id=user_id)
                 task.assignees.remove(user)
-                notify_task_updated(task.id, self.request.user.id)
+                enqueue(TASK_UPDATED, task.id, self.request.user.id)
                 return Response({'status': 'assignee removed'})
             except User.DoesNotExist:
                 return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'error': 'user_id required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        serializer = BulkTaskCreateSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        task_ids = bulk_create_tasks(request.user, serializer.validated_data)
+        tasks = Task.objects.filter(pk__in=task_ids).for_list()
+        return Response(self.get_serializer(tasks, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk_update(self, request):
+        serializer = BulkTaskUpdateSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        updated = bulk_update_tasks(request.user, serializer.validated_data)
+        return Response({'updated': updated})
+
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        ids = request.data.get('ids') if hasattr(request.data, 'get') else None
+        ids = serializers.ListField(child=serializers.IntegerField()).run_validation(ids)
+        deleted = bulk_delete_tasks(request.user, ids)
+        return Response({'deleted': deleted})
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file required'}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        fmt = 'json' if fmt in ('ndjson', 'jsonl') else fmt
+        if fmt not in IMPORT_FORMATS:
+            return Response({'error': 'format must be csv or json'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = request.data.get('dry_run') in ('1', 'true', 'True')
+        result = import_tasks(request.user, upload.file, fmt, dry_run=dry_run)
+        if result.error_count and not result.created:
+            code = status.HTTP_400_BAD_REQUEST
+        else:
+            code = status.HTTP_200_OK if dry_run or not result.created else status.HTTP_201_CREATED
+        return Response(dict(result.as_dict(), dry_run=dry_run), status=code)
+
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        tasks = self.filter_by_params(visible_tasks(request.user))
+        return export_response(request, tasks, TASK_COLUMNS, 'tasks', with_assignees=True)
+
     @action(detail=False, methods=['get'])
+    def stats(self, request):
+        return Response(task_stats(request.user))
+
+    @action(detail=False, methods=['get'], renderer_classes=FAST_RENDERERS)
     def my_tasks(self, request):
-        tasks = Task.objects.filter(assignees=request.user)
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        return self.list_response(Task.objects.filter(assignees=request.user), TaskSerializer)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=FAST_RENDERERS)
     def assigned(self, request):
-        tasks = Task.objects.filter(assignees=request.user)
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        return self.list_response(Task.objects.filter(assignees=request.user), TaskSerializer)
+
+
+class SyncView(generics.GenericAPIView):
+    """
+    Rows changed since a sync token: `GET /api/sync/` returns the current
+    token, `GET /api/sync/?since=<token>` the changes after it and a new one.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'token': current_token()})
+        try:
+            since = int(since)
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'since must be a sync token'}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = changes_since(request.user, since)
+        if changes.get('reset'):
+            return Response({'token': changes['token'], 'reset': True})
+        return Response({
+            'token': changes['token'],
+            'more': changes['more'],
+            'tasks': {
+                'updated': TaskSerializer(changes['tasks'], many=True).data,
+                'deleted': changes['deleted_task_ids'],
+            },
+            'projects': {
+                'updated': ProjectSerializer(changes['projects'], many=True).data,
+                'deleted': changes['deleted_project_ids'],
+            },
+        })
+
+
+class SearchView(generics.GenericAPIView):
+    """
+    `GET /api/search/?q=<words>` over the user's visible tasks and projects.
+
+    Every word must match (as a prefix); results are ranked best first and
+    paged with `page_size` and `offset`. `type=task` or `type=project`
+    restricts the search to one kind.
+    """
+    permission_classes = [IsAuthenticated]
+    page_size = 20
+    max_page_size = 100
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            page_size = max(1, min(int(params.get('page_size', self.page_size)), self.max_page_size))
+            offset = max(0, int(params.get('offset', 0)))
+        except ValueError:
+            return Response({'error': 'page_size and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        types = ('task', 'project')
+        if params.get('type'):
+            if params['type'] not in types:
+                return Response({'error': 'type must be task or project'}, status=status.HTTP_400_BAD_REQUEST)
+            types = (params['type'],)
+
+        hits = search(request.user, params.get('q', ''), limit=page_size, offset=offset, types=types)
+        next_link = None
+        if len(hits) > page_size:
+            hits = hits[:page_size]
+            next_link = replace_query_param(request.build_absolute_uri(), 'offset', offset + page_size)
+
+        ids = {'task': [], 'project': []}
+        for kind, pk, _ in hits:
+            ids[kind].append(pk)
+        data = {
+            'task': {
+                row['id']: row for row in
+                TaskSerializer(Task.objects.filter(pk__in=ids['task']).for_list(), many=True).data
+            },
+            'project': {
+                row['id']: row for row in
+                ProjectSerializer(Project.objects.filter(pk__in=ids['project']).for_list(), many=True).data
+            },
+        }
+        return Response({
+            'next': next_link,
+            'results': [
+                {'type': kind, 'id': pk, 'score': score, 'data': data[kind][pk]}
+                for kind, pk, score in hits if pk in data[kind]
+            ],
+        })
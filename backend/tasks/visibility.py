@@ -0,0 +1,85 @@
+"""
+Row-level visibility rules for tasks and projects.
+
+A task is visible to a user who created it, is assigned to it, or is a member
+of its project; a project is visible to its creator and its members. Each rule
+is expressed as an indexed predicate (the creator FK, or an uncorrelated
+`IN (SELECT ...)` over the M2M through table keyed by user_id) so the database
+can answer the OR without joining the through tables into the outer query and
+without a DISTINCT pass over the result.
+"""
+from django.db.models import Q
+
+from .models import Task, Project
+
+
+def project_ids_for_member(user):
+    return Project.members.through.objects.filter(user_id=user.pk).values('project_id')
+
+
+def task_ids_for_assignee(user):
+    return Task.assignees.through.objects.filter(user_id=user.pk).values('task_id')
+
+
+def visible_projects_q(user):
+    return Q(created_by_id=user.pk) | Q(pk__in=project_ids_for_member(user))
+
+
+def visible_tasks_q(user):
+    return (
+        Q(created_by_id=user.pk)
+        | Q(pk__in=task_ids_for_assignee(user))
+        | Q(project_id__in=project_ids_for_member(user))
+    )
+
+
+def visible_projects(user, queryset=None):
+    if queryset is None:
+        queryset = Project.objects.all()
+    return queryset.filter(visible_projects_q(user))
+
+
+def visible_tasks(user, queryset=None):
+    if queryset is None:
+        queryset = Task.objects.all()
+    return queryset.filter(visible_tasks_q(user))
+
+
+def project_audience(project_id):
+    """Ids of every user who can see the project or the tasks filed under it."""
+    if project_id is None:
+        return set()
+    user_ids = set(
+        Project.members.through.objects.filter(project_id=project_id).values_list('user_id', flat=True)
+    )
+    user_ids.update(Project.objects.filter(pk=project_id).values_list('created_by_id', flat=True))
+    return user_ids
+
+
+def task_audience(task):
+    """Ids of every user who can see `task`."""
+    user_ids = set(
+        Task.assignees.through.objects.filter(task_id=task.pk).values_list('user_id', flat=True)
+    )
+    user_ids.add(task.created_by_id)
+    if task.project_id is not None:
+        user_ids.update(
+            Project.members.through.objects.filter(project_id=task.project_id).values_list('user_id', flat=True)
+        )
+    return user_ids
+
+
+def tasks_audience(task_ids):
+    """Ids of every user who can see any of `task_ids`, in three queries."""
+    user_ids = set(
+        Task.assignees.through.objects.filter(task_id__in=task_ids).values_list('user_id', flat=True)
+    )
+    project_ids = set()
+    for created_by_id, project_id in Task.objects.filter(pk__in=task_ids).values_list('created_by_id', 'project_id'):
+        user_ids.add(created_by_id)
+        if project_id is not None:
+            project_ids.add(project_id)
+    user_ids.update(
+        Project.members.through.objects.filter(project_id__in=project_ids).values_list('user_id', flat=True)
+    )
+    return user_ids
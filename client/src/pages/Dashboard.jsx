@@ -4,9 +4,15 @@ import { taskService } from '../services/taskService';
 import NotificationCenter from '../components/NotificationCenter';
 import ErrorMessage from '../components/ErrorMessage';
 
+const PROJECT_FIELDS = 'id,name,description,status,priority,member_count,task_count';
+const TASK_FIELDS = 'id,title,status,priority,project,project_name,due_date,assignee_details';
+const RECENT_PROJECTS = 3;
+const RECENT_TASKS = 5;
+
 export default function Dashboard() {
     const [projects, setProjects] = useState([]);
     const [tasks, setTasks] = useState([]);
+    const [stats, setStats] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
@@ -16,13 +22,17 @@ export default function Dashboard() {
 
     const fetchDashboardData = async () => {
         try {
-            const [projectsResponse, tasksResponse] = await Promise.all([
-                projectService.getAll(),
-                taskService.getAll()
+            // Counters come pre-aggregated from the server; only the handful
+            // of rows shown in the "recent" sections are fetched in full.
+            const [statsResponse, projectsResponse, tasksResponse] = await Promise.all([
+                taskService.getStats(),
+                projectService.getAll({ fields: PROJECT_FIELDS, page_size: RECENT_PROJECTS }),
+                taskService.getAll({ fields: TASK_FIELDS, page_size: RECENT_TASKS })
             ]);
-            
-            setProjects(projectsResponse.data);
-            setTasks(tasksResponse.data);
+
+            setStats(statsResponse.data);
+            setProjects(projectsResponse.data.results);
+            setTasks(tasksResponse.data.results);
             setLoading(false);
         } catch (err) {
             setError('Failed to fetch dashboard data');
@@ -30,21 +40,8 @@ export default function Dashboard() {
         }
     };
 
-    const calculateTaskStats = () => {
-        const stats = tasks.reduce((acc, task) => {
-            acc[task.status] = (acc[task.status] || 0) + 1;
-            acc.total++;
-            return acc;
-        }, { total: 0 });
-
-        return {
-            todo: stats['TODO'] || 0,
-            inProgress: stats['IN_PROGRESS'] || 0,
-            completed: stats['DONE'] || 0,
-            total: stats.total,
-            completionRate: stats.total ? Math.round((stats['DONE'] || 0) / stats.total * 100) : 0
-        };
-    };
+    const projectCompletionRate = (projectId) =>
+        stats.projects.find(p => p.id === projectId)?.completion_rate || 0;
 
     if (loading) {
         return (
@@ -68,7 +65,13 @@ export default function Dashboard() {
         );
     }
 
-    const taskStats = calculateTaskStats();
+    const taskStats = {
+        todo: stats.by_status.TODO,
+        inProgress: stats.by_status.IN_PROGRESS,
+        completed: stats.by_status.DONE,
+        total: stats.total,
+        completionRate: stats.completion_rate
+    };
 
     return (
         <div className="dashboard-wrapper">
@@ -147,7 +150,7 @@ export default function Dashboard() {
                     </a>
                 </div>
                 <div className="dashboard-grid">
-                    {projects.slice(0, 3).map(project => (
+                    {projects.map(project => (
                         <div key={project.id} className="project-card" data-priority={project.priority?.toLowerCase()}>
                             <div className="project-card-content">
                                 <div className="project-header">
@@ -172,12 +175,7 @@ export default function Dashboard() {
                                         <div 
                                             className="progress-bar"
                                             style={{ 
-                                                width: `${(tasks.filter(t => 
-                                                    t.project === project.id && 
-                                                    t.status === 'DONE'
-                                                ).length / (tasks.filter(t => 
-                                                    t.project === project.id
-                                                ).length || 1)) * 100}%` 
+                                                width: `${projectCompletionRate(project.id)}%`
                                             }}
                                         ></div>
                                     </div>
@@ -200,7 +198,7 @@ export default function Dashboard() {
                     </a>
                 </div>
                 <div className="tasks-list">
-                    {tasks.slice(0, 5).map(task => (
+                    {tasks.map(task => (
                         <div key={task.id} className="task-item" data-priority={task.priority?.toLowerCase()}>
                             <div className="task-content">
                                 <div className="task-title">
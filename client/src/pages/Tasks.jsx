@@ -3,6 +3,10 @@ import { taskService } from '../services/taskService';
 import { projectService } from '../services/projectService';
 import TaskModal from '../components/TaskModal';
 
+// Only the columns this page and TaskModal render.
+const TASK_FIELDS = 'id,title,description,status,priority,project,due_date,assignees';
+const PROJECT_FIELDS = 'id,name';
+
 export default function Tasks() {
     const [tasks, setTasks] = useState([]);
     const [projects, setProjects] = useState([]);
@@ -19,8 +23,8 @@ export default function Tasks() {
     const fetchData = async () => {
         try {
             const [tasksResponse, projectsResponse] = await Promise.all([
-                taskService.getAll(),
-                projectService.getAll()
+                taskService.getAll({ fields: TASK_FIELDS }),
+                projectService.getAll({ fields: PROJECT_FIELDS })
             ]);
             setTasks(tasksResponse.data);
             setProjects(projectsResponse.data);
@@ -70,4 +70,32 @@ api.interceptors.response.use(
     }
 );
 
+// Last ETag and body per list URL, so polling revalidates with If-None-Match
+// and reuses the previous body when the server answers 304 Not Modified.
+const CONDITIONAL_CACHE_SIZE = 50;
+const conditionalCache = new Map();
+
+export const getConditional = async (url, config = {}) => {
+    const key = api.getUri({ url, params: config.params });
+    const cached = conditionalCache.get(key);
+    const response = await api.get(url, {
+        ...config,
+        headers: { ...config.headers, ...(cached && { 'If-None-Match': cached.etag }) },
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+    });
+    if (response.status === 304 && cached) {
+        return { ...response, status: 200, data: cached.data };
+    }
+
+    conditionalCache.delete(key);
+    const etag = response.headers.etag;
+    if (etag) {
+        conditionalCache.set(key, { etag, data: response.data });
+        if (conditionalCache.size > CONDITIONAL_CACHE_SIZE) {
+            conditionalCache.delete(conditionalCache.keys().next().value);
+        }
+    }
+    return response;
+};
+
 export default api;
\ No newline at end of file
@@ -28,6 +28,10 @@ export const authService = {
                 const response = await api.post('/api/token/refresh/', { refresh });
                 if (response.data.access) {
                     localStorage.setItem('token', response.data.access);
+                    // Refresh tokens rotate: the one just used is now blacklisted
+                    if (response.data.refresh) {
+                        localStorage.setItem('refresh_token', response.data.refresh);
+                    }
                     // Update the authorization header
                     api.defaults.headers.common['Authorization'] = `Bearer ${response.data.access}`;
                     return response.data.access;
@@ -1,4 +1,4 @@
-import api from './api';
+import api, { getConditional } from './api';
 
 const handleError = (error) => {
     if (error.response?.data) {
@@ -8,9 +8,9 @@ const handleError = (error) => {
 };
 
 export const projectService = {
-    getAll: async () => {
+    getAll: async (params = {}) => {
         try {
-            return await api.get('/api/projects/');
+            return await getConditional('/api/projects/', { params });
         } catch (error) {
             throw handleError(error);
         }
@@ -66,7 +66,7 @@ export const projectService = {
 
     getProjectTasks: async (projectId) => {
         try {
-            return await api.get(`/api/tasks/?project=${projectId}`);
+            return await getConditional('/api/tasks/', { params: { project: projectId } });
         } catch (error) {
             throw handleError(error);
         }
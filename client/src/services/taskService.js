@@ -1,4 +1,4 @@
-import api from './api';
+import api, { getConditional } from './api';
 
 const handleError = (error) => {
     if (error.response?.data) {
@@ -8,9 +8,11 @@ const handleError = (error) => {
 };
 
 export const taskService = {
-    getAll: async () => {
+    // `params` may carry `fields` (comma-separated sparse fieldset),
+    // `page_size` and `cursor` for keyset pagination.
+    getAll: async (params = {}) => {
         try {
-            return await api.get('/api/tasks/');
+            return await getConditional('/api/tasks/', { params });
         } catch (error) {
             throw handleError(error);
         }
@@ -50,7 +52,7 @@ export const taskService = {
 
     getByProject: async (projectId) => {
         try {
-            return await api.get(`/api/tasks/?project=${projectId}`);
+            return await getConditional('/api/tasks/', { params: { project: projectId } });
         } catch (error) {
             throw handleError(error);
         }
@@ -88,6 +90,51 @@ export const taskService = {
         }
     },
 
+    // Bulk endpoints: one round trip and one transaction for many tasks.
+    bulkCreate: async (tasks) => {
+        try {
+            return await api.post('/api/tasks/bulk_create/', tasks);
+        } catch (error) {
+            throw handleError(error);
+        }
+    },
+
+    // `changes` is a list of { id, status?, priority?, project?, assignees? }
+    bulkUpdate: async (changes) => {
+        try {
+            return await api.patch('/api/tasks/bulk_update/', changes);
+        } catch (error) {
+            throw handleError(error);
+        }
+    },
+
+    bulkDelete: async (ids) => {
+        try {
+            return await api.post('/api/tasks/bulk_delete/', { ids });
+        } catch (error) {
+            throw handleError(error);
+        }
+    },
+
+    // Delta sync: without `since` returns just the current token; with it,
+    // the tasks/projects updated or deleted since then plus a new token.
+    // Notifications carry the latest token as `sync_token`.
+    getChanges: async (since) => {
+        try {
+            return await api.get('/api/sync/', { params: since == null ? {} : { since } });
+        } catch (error) {
+            throw handleError(error);
+        }
+    },
+
+    getStats: async () => {
+        try {
+            return await api.get('/api/tasks/stats/');
+        } catch (error) {
+            throw handleError(error);
+        }
+    },
+
     getMyTasks: async () => {
         try {
             return await api.get('/api/tasks/my_tasks/');